@@ -3,6 +3,7 @@
  * * 主な機能：
  * 1. logシートのマスタCSVによる初期化（上書き）
  * 2. logシートへのマスタ情報付与（Enrich）
+ *    2b. Python（2.py）で付与した結果の反映（変更セルのみ）
  * 3. 'calendar'シートへの出力 (指定フォーマット最終版 - 全カレンダー表示)
  * 4. シートのソート
  * 5. 内部ヘルパー関数
@@ -213,6 +214,37 @@ function enrichLogSheetFromMasters() {
   }
 }
 
+
+/**
+ * ========= 2b. Python で付与したマスタ情報の反映（変更セルのみ） =========
+ * 2.py（ENRICH_LOG = True）がマスタフォルダに出力した log_changes.json を読み、
+ * 変わったセルの範囲だけを log シートに書き込む（シート全体は書き換えない）。
+ * 件数の多い log で enrichLogSheetFromMasters が実行時間の上限を超える場合に使う。
+ */
+function applyLogChangesFromPython() {
+  try {
+    LOG.info('logシートへの変更反映（Python） 開始');
+    const ss = SpreadsheetApp.openById(CONFIG.targetSpreadsheetId);
+    const fileName = CONFIG.MASTER_FILES.LOG_CHANGES;
+    const file = findFileByNameInFolder_(fileName, CONFIG.MASTER_FOLDER_ID); // csv.gs の関数
+    if (!file) {
+      throw new Error(`マスタフォルダ(ID:${CONFIG.MASTER_FOLDER_ID})内に ${fileName} が見つかりません。`);
+    }
+
+    const payload = JSON.parse(file.getBlob().getDataAsString('UTF-8'));
+    const sheet = getOrCreateSheet_(ss, payload.sheet || 'log'); // csv.gs の関数
+    const updates = payload.updates || [];
+    // 各要素は { range: 'I2:R5', values: [[...], ...] }（A1形式、1行目がヘッダー）
+    updates.forEach(u => sheet.getRange(u.range).setValues(u.values));
+
+    LOG.info(`logシートへの変更反映 完了（${updates.length}範囲）`);
+    SpreadsheetApp.getUi().alert(`log シートに ${updates.length} 範囲の変更を反映しました。`);
+  } catch (e) {
+    LOG.error(`applyLogChangesFromPython: ${e.message}\n${e.stack}`);
+    SpreadsheetApp.getUi().alert('エラー: ' + e.message);
+  }
+}
+
 // [LogFrom.gs の outputToCalendar 関数 (source: 235-251) を以下に置き換え]
 
 /**
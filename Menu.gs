@@ -15,6 +15,7 @@ function onOpen() {
   // ── 2. シート・カレンダー ───────────────────────────
   const viewMenu = ui.createMenu('🔄 2. シート・カレンダー')
     .addItem('✨ logシートにマスタ情報を付与', 'enrichLogSheetFromMasters') // LogFrom.gs
+    .addItem('📥 Pythonの付与結果をlogシートに反映', 'applyLogChangesFromPython') // LogFrom.gs
     .addItem('📝 商品情報を "calendar" シートに出力', 'outputToCalendar') ;
 
   // ── 3. Python連携 ──────────────────────────────────
@@ -0,0 +1,274 @@
+"""合成マスタで各処理段の所要時間を計り、JSON に保存する
+
+    python benchmarks/run_benchmarks.py --size 10k
+    python benchmarks/run_benchmarks.py --size 1k --repeat 5 --output bench --compare bench/bench_1k_....json
+
+1. dp_scheduler.synthetic で <workdir> に合成マスタを作る（同じ件数・seed なら再利用）
+2. 1.py・2.py の関数（dp_scheduler.update_sheets のマスタ整形・dp_scheduler.planner の計画と統合）で
+   各段を repeat 回実行し、最短・中央値の秒数と行数を記録する（各段の表示は抑える）
+   （シート出力は FakeSpreadsheet にクォータ待ちなしで書き込み、本文の構築と差分計算を計る）
+3. 2.py を DP_SCHEDULER_ROOT=<workdir> で実行し、トレースからステージごとの秒数を記録する
+結果は --output のフォルダ（既定: 一時フォルダの dp_scheduler_bench）に bench_<size>_YYYYMMDD_HHMMSS.json。
+--compare で前回との比を表示する。
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from contextlib import redirect_stdout
+from glob import glob
+
+import numpy as np
+import pandas as pd
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from dp_scheduler.synthetic import SIZES, CALENDAR_START, master_dir, write_fixture  # noqa: E402
+from dp_scheduler.forecast import combine_forecasts  # noqa: E402
+from dp_scheduler.basestats import stream_base_stats  # noqa: E402
+from dp_scheduler.monthly import build_product_frame, month_slices  # noqa: E402
+from dp_scheduler.sheet_sync import sync_month_sheet  # noqa: E402
+from dp_scheduler.quota import RequestScheduler  # noqa: E402
+from dp_scheduler.fake_sheets import FakeSpreadsheet  # noqa: E402
+from dp_scheduler import planner, update_sheets  # noqa: E402
+
+RESULTS_DIR = os.path.join(tempfile.gettempdir(), "dp_scheduler_bench")
+CALENDAR_YEAR = pd.Timestamp(CALENDAR_START).year
+STAGES_2PY = ["log", "material", "material_info", "calendar", "plan", "scheduler", "capacity", "ai_format"]
+
+
+# --- 各段（ctx に結果を入れ、処理した行数を返す） ---
+
+def parse(ctx, key):
+    """1.py と同じマスタの整形（update_sheets.MASTER_PARSERS）"""
+    path = ctx["paths"][key]
+    return update_sheets.MASTER_PARSERS[key](path, {"name": os.path.basename(path)})
+
+
+def stage_ingest_product(ctx):
+    ctx["product"] = parse(ctx, "product")
+    return len(ctx["product"])
+
+
+def stage_ingest_zaiko(ctx):
+    ctx["zaiko"] = parse(ctx, "zaiko")
+    return len(ctx["zaiko"])
+
+
+def stage_ingest_forecast(ctx):
+    ctx["forecast"] = {key: parse(ctx, key) for key in update_sheets.FORECAST_KEYS}
+    return sum(len(df) for df in ctx["forecast"].values())
+
+
+def stage_calendar(ctx):
+    ctx["workday"] = parse(ctx, "workday")
+    ctx["calendar"] = update_sheets.load_work_calendar(ctx["workday"], ctx["today"])
+    return len(ctx["calendar"].days)
+
+
+def stage_forecast_combine(ctx):
+    labels = ctx["window_labels"]
+    frames = [df.reindex(columns=["品番"] + labels) for df in ctx["forecast"].values()]
+    df = combine_forecasts(frames, labels)
+    workdays = update_sheets.month_workdays(ctx["workday"], ctx["calendar"], ctx["today"], labels)
+    for m in labels:
+        df[f"{m}日割"] = df[m] / workdays[m] if workdays[m] else np.nan
+    ctx["need"] = df
+    return len(df)
+
+
+def stage_base_stats(ctx):
+    start = ctx["today"] - pd.DateOffset(months=update_sheets.BASE_WINDOW_MONTHS)
+    ctx["stats"] = stream_base_stats(ctx["paths"]["base"], start)
+    return ctx["params"]["base_rows"]
+
+
+def stage_product_frame(ctx):
+    joined = build_product_frame(ctx["product"], ctx["zaiko"], ctx["need"], ctx["stats"], ctx["window_labels"])
+    ctx["months"] = month_slices(joined, ctx["window_labels"])
+    return len(joined)
+
+
+def stage_sheet_payload(ctx):
+    sh = FakeSpreadsheet()
+    scheduler = RequestScheduler(read_per_minute=1e9, write_per_minute=1e9, burst=10 ** 9)
+    rows = 0
+    for label, df in ctx["months"].items():
+        ws = sh.add_worksheet(label, rows=len(df) * 2 + 10, cols=20)
+        sync_month_sheet(ws, df, scheduler=scheduler)
+        rows += len(df)
+    return rows
+
+
+def stage_deadlines(ctx):
+    """2.py と同じく log.csv・material_master.csv から計画行（L/T・釜容量・仕込希望日・デッドライン）を作る"""
+    material_info = planner.get_material_info(ctx["paths"]["material"])
+    df_log = planner.safe_read_csv(ctx["paths"]["log"])
+    # 合成マスタの log は CALENDAR_START からの期間なので、カレンダーの年もそこに合わせる
+    calendar = planner.get_working_days(ctx["paths"]["workday"], start_year=CALENDAR_YEAR)
+    plan = planner.build_plan(df_log, material_info, calendar)
+    ctx["schedulable"] = plan.dropna(subset=["最終仕込デッドライン"]).sort_values(
+        by=["最終仕込デッドライン", "標準仕込希望日", "Recipe"])
+    return len(plan)
+
+
+def stage_consolidate(ctx):
+    return len(planner.consolidate_batches_advanced(ctx["schedulable"]))
+
+
+STAGES = [
+    ("ingest.product", stage_ingest_product),
+    ("ingest.zaiko", stage_ingest_zaiko),
+    ("ingest.forecast", stage_ingest_forecast),
+    ("calendar", stage_calendar),
+    ("forecast.combine", stage_forecast_combine),
+    ("stats.base", stage_base_stats),
+    ("stats.product_frame", stage_product_frame),
+    ("sheets.payload", stage_sheet_payload),
+    ("plan.deadlines", stage_deadlines),
+    ("consolidate", stage_consolidate),
+]
+
+
+# --- 実行 ---
+
+def prepare_fixture(workdir: str, params: dict, seed: int) -> dict:
+    """件数・seed が同じ合成マスタがあれば再利用する"""
+    marker = os.path.join(workdir, "fixture.json")
+    spec = dict(params, seed=seed)
+    if os.path.exists(marker):
+        with open(marker, encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("spec") == spec:
+            print(f"  ✓ 合成マスタを再利用: {master_dir(workdir)}")
+            return saved["paths"]
+    t0 = time.perf_counter()
+    paths = write_fixture(workdir, seed=seed, **params)
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump({"spec": spec, "paths": paths}, f, ensure_ascii=False, indent=1)
+    print(f"  ✓ 合成マスタを作成: {master_dir(workdir)} ({time.perf_counter() - t0:.1f}秒)")
+    return paths
+
+
+def run_stages(paths: dict, params: dict, repeat: int) -> dict:
+    today = pd.Timestamp.now().normalize()
+    fy = update_sheets.FY_ORDER
+    labels = [fy[(fy.index(f"{today.month}月") + k) % 12] for k in range(4)]
+    ctx = {"paths": paths, "params": params, "today": today, "window_labels": labels}
+    results = {}
+    for name, func in STAGES:
+        runs, rows = [], None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            with redirect_stdout(io.StringIO()):
+                rows = func(ctx)
+            runs.append(time.perf_counter() - t0)
+        results[name] = {"best": min(runs), "median": statistics.median(runs), "runs": runs, "rows": rows}
+        print(f"  ✓ {name:20s} {min(runs):8.3f}秒  ({rows:,}行)")
+    return results
+
+
+def run_script_2(workdir: str) -> dict:
+    """2.py を合成マスタで実行し、トレースからステージごとの秒数を返す"""
+    # 前回の統合状態・log の月別保存を残すと差分実行になるため、毎回空の Output から実行する
+    out_dir = os.path.join(workdir, "dp_Scheduler", "Output")
+    shutil.rmtree(out_dir, ignore_errors=True)
+    env = dict(os.environ, DP_SCHEDULER_ROOT=workdir, DP_SCHEDULER_CALENDAR_START_YEAR=str(CALENDAR_YEAR))
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, os.path.join(REPO, "2.py")], cwd=REPO, env=env,
+                          capture_output=True, text=True)
+    wall = time.perf_counter() - t0
+    if proc.returncode != 0:
+        print(proc.stdout[-2000:], proc.stderr[-2000:])
+        raise RuntimeError("2.py の実行に失敗しました")
+    traces = sorted(glob(os.path.join(out_dir, "trace_scheduler_*.json")))
+    if not traces:
+        return {"wall": wall}
+    with open(traces[-1], encoding="utf-8") as f:
+        trace = json.load(f)
+    stages = {}
+    for span in trace["spans"]:
+        if span["parent"] is not None and span["name"] in STAGES_2PY:
+            stages[span["name"]] = stages.get(span["name"], 0.0) + span["duration"]
+    for name, seconds in stages.items():
+        print(f"  ✓ 2.py {name:15s} {seconds:8.3f}秒")
+    return {"wall": wall, "duration": trace["duration"], "peak_rss_mb": trace["peak_rss_mb"], "stages": stages}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(result: dict, path: str):
+    with open(path, encoding="utf-8") as f:
+        old = json.load(f)
+    print(f"\n前回との比較: {path} ({old.get('commit', '')} → {result['commit']})")
+    pairs = [(n, old["stages"].get(n, {}).get("best"), r["best"]) for n, r in result["stages"].items()]
+    old_2, new_2 = old.get("script_2", {}).get("stages", {}), result.get("script_2", {}).get("stages", {})
+    pairs += [(f"2.py {n}", old_2.get(n), s) for n, s in new_2.items()]
+    for name, before, after in pairs:
+        ratio = f"{after / before:6.2f}x" if before else "     -"
+        before_text = f"{before:8.3f}" if before is not None else "       -"
+        print(f"  {name:22s} {before_text} → {after:8.3f}秒 {ratio}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="合成マスタで各処理段の所要時間を計る")
+    parser.add_argument("--size", choices=sorted(SIZES), default="1k")
+    parser.add_argument("--skus", type=int, help="SKU 数（--size の値を上書き）")
+    parser.add_argument("--base-rows", type=int, help="Base の行数（--size の値を上書き）")
+    parser.add_argument("--log-rows", type=int, help="log の行数（--size の値を上書き）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workdir", help="合成マスタの出力先（既定: ~/.cache/dp_scheduler/bench_<size>）")
+    parser.add_argument("--skip-script", action="store_true", help="2.py の実行を省略")
+    parser.add_argument("--compare", help="比較する前回の結果 JSON")
+    parser.add_argument("--output", default=RESULTS_DIR, help="結果 JSON の出力先（既定: 一時フォルダの dp_scheduler_bench）")
+    args = parser.parse_args(argv)
+
+    params = dict(SIZES[args.size])
+    for key in ("skus", "base_rows", "log_rows"):
+        if getattr(args, key) is not None:
+            params[key] = getattr(args, key)
+    workdir = args.workdir or os.path.expanduser(f"~/.cache/dp_scheduler/bench_{args.size}")
+
+    print(f"ベンチマーク: {args.size} {params}")
+    paths = prepare_fixture(workdir, params, args.seed)
+    result = {
+        "size": args.size,
+        "params": params,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "commit": git_commit(),
+        "started_at": pd.Timestamp.now().isoformat(timespec="seconds"),
+        "environment": {"python": platform.python_version(), "pandas": pd.__version__,
+                        "numpy": np.__version__, "machine": platform.machine(), "cpus": os.cpu_count()},
+        "stages": run_stages(paths, params, args.repeat),
+    }
+    if not args.skip_script:
+        result["script_2"] = run_script_2(workdir)
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"bench_{args.size}_{pd.Timestamp.now():%Y%m%d_%H%M%S}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=1)
+    print(f"✅ 出力: {path}")
+    if args.compare:
+        compare(result, args.compare)
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -163,7 +163,11 @@ function updateCalendar() {
   // --- 2) 在庫予測計算 ---
   Logger.log('\n--- 2. 在庫予測計算 開始 ---');
   try {
-    calculateInventory();
+    if (CONFIG.inventoryFromPython) {
+      Logger.log('在庫予測は Python（1.py）が値で書き込むため数式設定をスキップ');
+    } else {
+      calculateInventory();
+    }
     Logger.log('✓ 在庫予測計算 完了');
   } catch (e) {
     Logger.log(`!!! 在庫予測計算エラー: ${e.message}\n${e.stack}`);
@@ -249,11 +253,12 @@ function _drawCalendar(sheet, startDate, endDate, isFirstSheet, today, tz) {
   let workingDaysForCsv = []; // 稼働日(Date)リスト
 
   try {
-    // G列以降クリア
+    // G列以降クリア（Python が在庫推移を書き込む場合はヘッダー3行のみ）
     Logger.log(`${sheet.getName()}: G列以降クリア開始`);
     const lastCol = sheet.getLastColumn();
     if (lastCol >= CONFIG.calendarStartCol) {
-      sheet.getRange(1, CONFIG.calendarStartCol, sheet.getMaxRows(), lastCol - CONFIG.calendarStartCol + 1)
+      const clearRows = CONFIG.inventoryFromPython ? 3 : sheet.getMaxRows();
+      sheet.getRange(1, CONFIG.calendarStartCol, clearRows, lastCol - CONFIG.calendarStartCol + 1)
            .clear({ contentsOnly: true, formatOnly: false }); // 値のみクリア
       Logger.log(`${sheet.getName()}: G列～${lastCol}列 クリア完了`);
     }
@@ -363,8 +368,8 @@ function _drawCalendar(sheet, startDate, endDate, isFirstSheet, today, tz) {
       Logger.log(`${sheet.getName()}: 書式・固定設定 完了`);
     }
 
-    // 今日列の4行目に "=C4" を設定（最初のシートのみ）
-    if (todayColIndex !== -1) {
+    // 今日列の4行目に "=C4" を設定（最初のシートのみ。Python が在庫推移を書き込む場合は不要）
+    if (todayColIndex !== -1 && !CONFIG.inventoryFromPython) {
       try {
         const targetCol = todayColIndex + CONFIG.calendarStartCol;
         const targetRow = 4; // C4セルを参照
@@ -16,6 +16,12 @@ const CONFIG = {
   monthsAhead: 3,               // 今月 + 3ヶ月先まで
   calendarOutputFolderId: '13EoohP_R4zZXt5uMu_EgVR9ES8iwzBtc', // workday.csv を出力する先
   calendarOutputFileName: 'workday.csv',
+  // 在庫推移を月シートに書く側の切り替え。dp_scheduler/update_sheets.py の INVENTORY_PROJECTION と必ず同じ値にする
+  // （片方だけ true だと、数式と値が互いに上書きし合う／どちらも書かない）
+  // true: 在庫推移は Python（1.py）が値で書き込むため、
+  //       calculateInventory の数式設定と、G列以降のデータ行のクリアを行わない
+  // false（既定）: 従来どおり calculateInventory の数式で在庫推移を求める（1.py は欠品予測の計算にだけ使う）
+  inventoryFromPython: false,
 
   // --- 2. 'log' シートから 'calendar' シートへの出力設定 ---
   logFromStartCol: 2,           // B列開始
@@ -42,7 +48,8 @@ const CONFIG = {
   MASTER_FILES: {
     FORMULATION: 'formulation.csv', // 配合マスタ
     MACHINE: 'machine.csv',         // 設備マスタ
-    MATERIAL: 'material_master.csv' // 2.py で使われているファイル
+    MATERIAL: 'material_master.csv', // 2.py で使われているファイル
+    LOG_CHANGES: 'log_changes.json'  // 2.py のマスタ情報付与で変わったセル（applyLogChangesFromPython 用）
   }
 };
 
@@ -0,0 +1 @@
+"""dp_Scheduler 共通ライブラリ（1.py / 2.py・scheduler コマンドから利用）"""
@@ -0,0 +1,5 @@
+import sys
+
+from dp_scheduler.cli import main
+
+sys.exit(main())
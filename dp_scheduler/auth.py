@@ -0,0 +1,73 @@
+"""Google API の認証（Colab・サービスアカウント・アプリケーションのデフォルト認証情報）
+
+Google のクライアントライブラリは認証が必要になったときに初めて import する
+（ローカルフォルダ・代替シートだけで実行する場合は読み込まない）。
+- colab: google.colab の authenticate_user（ノートブックで1回だけ確認が出る）
+- service_account: 鍵ファイル（key_file / DP_SCHEDULER_SERVICE_ACCOUNT / GOOGLE_APPLICATION_CREDENTIALS）
+- default: google.auth.default（gcloud auth application-default login・GCE のメタデータなど）
+省略時（auto）は Colab 上なら colab、鍵ファイルの指定があれば service_account、それ以外は default。
+サービスアカウントにはマスターフォルダとスプレッドシートを共有しておくこと。
+"""
+import os
+import importlib.util
+from typing import Optional, Tuple
+
+AUTH_MODES = ("auto", "colab", "service_account", "default")
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive.readonly",
+]
+KEY_FILE_ENV = ("DP_SCHEDULER_SERVICE_ACCOUNT", "GOOGLE_APPLICATION_CREDENTIALS")
+
+
+def in_colab() -> bool:
+    try:
+        return importlib.util.find_spec("google.colab") is not None
+    except ModuleNotFoundError:  # google パッケージ自体が無い
+        return False
+
+
+def key_file_from_env() -> Optional[str]:
+    for name in KEY_FILE_ENV:
+        if os.environ.get(name):
+            return os.environ[name]
+    return None
+
+
+def resolve_mode(mode: Optional[str] = None, key_file: Optional[str] = None) -> str:
+    mode = (mode or os.environ.get("DP_SCHEDULER_AUTH") or "auto").replace("-", "_")
+    if mode not in AUTH_MODES:
+        raise ValueError(f"未対応の認証方法です: {mode}（{', '.join(AUTH_MODES)}）")
+    if mode != "auto":
+        return mode
+    if in_colab():
+        return "colab"
+    return "service_account" if (key_file or key_file_from_env()) else "default"
+
+
+def get_credentials(mode: Optional[str] = None, key_file: Optional[str] = None):
+    """認証情報を取得（mode は AUTH_MODES のいずれか。省略時は DP_SCHEDULER_AUTH または auto）"""
+    mode = resolve_mode(mode, key_file)
+    if mode == "colab":
+        from google.colab import auth
+        from google.auth import default
+        auth.authenticate_user()
+        creds, _ = default()
+    elif mode == "service_account":
+        from google.oauth2 import service_account
+        path = key_file or key_file_from_env()
+        if not path or not os.path.exists(path):
+            raise FileNotFoundError(f"サービスアカウントの鍵ファイルが見つかりません: {path}")
+        creds = service_account.Credentials.from_service_account_file(path, scopes=SCOPES)
+    else:
+        from google.auth import default
+        creds, _ = default(scopes=SCOPES)
+    print(f"  ✓ Google認証完了（{mode}）")
+    return creds
+
+
+def open_spreadsheet(creds, key: str) -> Tuple[object, type, type]:
+    """gspread でスプレッドシートを開き、(スプレッドシート, WorksheetNotFound 例外, APIError 例外) を返す"""
+    import gspread
+    gc = gspread.authorize(creds)
+    return gc.open_by_key(key), gspread.exceptions.WorksheetNotFound, gspread.exceptions.APIError
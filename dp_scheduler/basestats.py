@@ -0,0 +1,183 @@
+"""Base ファイル（使用実績）の品番別統計を、全件を DataFrame にせず分割読込で求める
+
+A列=日付, B列=品番, S列=使用量 の3列だけを読み、期間外の行は分割ごとに捨てて
+品番ごとの 件数・平均・偏差平方和 を Welford / Chan の方法で合算する。
+メモリ使用量は行数ではなく品番数に比例する。
+"""
+import io
+import csv
+import warnings
+from typing import Iterable, Iterator, Optional, Union
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+from dp_scheduler.ingest import read_csv_flexible, sniff_source
+
+DATE_POS, CODE_POS, USAGE_POS = 0, 1, 18  # A列・B列・S列
+CHUNK_ROWS = 200_000
+MOMENT_COLUMNS = ["n", "mean", "m2"]
+MISSING_CODE = "\0"  # 品番が空欄の行（全件読込と同じく1つの品番として扱う）
+
+
+def empty_moments() -> pd.DataFrame:
+    return pd.DataFrame({"n": pd.Series(dtype="int64"), "mean": pd.Series(dtype=float),
+                         "m2": pd.Series(dtype=float)})
+
+
+def chunk_moments(keys: pd.Series, values: pd.Series) -> pd.DataFrame:
+    """キーごとの 件数・平均・偏差平方和（値が全て欠損のキーも n=0 で残す）"""
+    g = pd.DataFrame({"k": keys.to_numpy(), "v": values.to_numpy(dtype=float)}).groupby("k", sort=False)["v"]
+    n = g.count()
+    out = pd.DataFrame({"n": n.astype("int64"), "mean": g.mean(), "m2": (g.var(ddof=0) * n).fillna(0.0)})
+    out.index.name = None
+    return out
+
+
+def merge_moments(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    """2つの集計を合算（Chan らの並列分散の式。a を先、b を後として結果は順序によらない）"""
+    if a.empty:
+        return b.copy()
+    if b.empty:
+        return a.copy()
+    idx = a.index.union(b.index, sort=False)
+    a = a.reindex(idx)
+    b = b.reindex(idx)
+    na = a["n"].fillna(0).to_numpy(dtype=float)
+    nb = b["n"].fillna(0).to_numpy(dtype=float)
+    ma = a["mean"].to_numpy(dtype=float)
+    mb = b["mean"].to_numpy(dtype=float)
+    n = na + nb
+    with np.errstate(invalid="ignore", divide="ignore"):
+        delta = mb - ma
+        mean = np.where(nb == 0, ma, np.where(na == 0, mb, ma + delta * nb / n))
+        m2 = (a["m2"].fillna(0).to_numpy() + b["m2"].fillna(0).to_numpy()
+              + np.where((na > 0) & (nb > 0), delta * delta * na * nb / n, 0.0))
+    return pd.DataFrame({"n": n.astype("int64"), "mean": mean, "m2": m2}, index=idx)
+
+
+def combine_moments(moments: pd.DataFrame, labels) -> pd.DataFrame:
+    """labels が同じ行の集計をまとめる（merge_moments を多数の組に一度に行う）"""
+    frame = moments.assign(_label=np.asarray(labels, dtype=object))
+    frame["_sum"] = frame["n"] * frame["mean"].fillna(0)
+    g = frame.groupby("_label", sort=False)
+    n = g["n"].sum()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (g["_sum"].sum() / n).where(n > 0)
+    dev = frame["mean"].fillna(0) - mean.reindex(frame["_label"]).fillna(0).to_numpy()
+    frame["_m2"] = frame["m2"] + np.where(frame["n"] > 0, frame["n"] * dev * dev, 0.0)
+    out = pd.DataFrame({"n": n.astype("int64"), "mean": mean, "m2": frame.groupby("_label", sort=False)["_m2"].sum()})
+    out.index.name = None
+    return out
+
+
+def finalize_moments(moments: pd.DataFrame, key_name: str = "品番") -> pd.DataFrame:
+    """集計を 品番・移動平均・使用量標準偏差 の表にする（標準偏差は不偏、1件以下は 0）"""
+    n = moments["n"].to_numpy(dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        std = np.sqrt(moments["m2"].to_numpy(dtype=float) / (n - 1))
+    out = pd.DataFrame({
+        key_name: moments.index.to_numpy(),
+        "移動平均": np.where(n > 0, moments["mean"].to_numpy(dtype=float), np.nan),
+        "使用量標準偏差": np.where(n > 1, std, np.nan),
+    })
+    out["使用量標準偏差"] = out["使用量標準偏差"].fillna(0)
+    return out.sort_values(key_name, kind="stable").reset_index(drop=True)
+
+
+def canonical_codes(raw: pd.Index) -> pd.Series:
+    """文字列のまま読んだ品番を、全件を read_csv したときと同じ文字列にする
+
+    全件読込では列全体の型推定（数値なら "007" → "7"）の後に astype(str).str.strip() していた。
+    推定は値の種類だけで決まるため、重複を除いた値だけを同じ読込関数に通して再現する。
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(["品番"])
+    for v in raw:
+        writer.writerow(["" if v == MISSING_CODE else v])
+    inferred = read_csv_flexible(io.BytesIO(buf.getvalue().encode("utf-8")))["品番"]
+    codes = inferred.astype(str).str.strip()
+    return pd.Series(codes.to_numpy(), index=raw)
+
+
+def iter_base_chunks(src: Union[str, io.IOBase, bytes], start: Optional[pd.Timestamp] = None,
+                     chunksize: int = CHUNK_ROWS, seen_codes: Optional[set] = None,
+                     date_format: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """日付・品番（文字列のまま）・使用量の3列を分割して読み、start より前の行を除いて返す
+
+    seen_codes を渡すと、期間外の行も含めて現れた品番をそこに加える。
+    date_format を省略すると最初の日付から推定する。
+    """
+    if isinstance(src, bytes):
+        src = io.BytesIO(src)
+    encoding, sep = sniff_source(src)
+    if hasattr(src, "seek"):
+        src.seek(0)
+    reader = pd.read_csv(src, encoding=encoding, sep=sep, usecols=[DATE_POS, CODE_POS, USAGE_POS],
+                         dtype={CODE_POS: str}, chunksize=chunksize)
+    guessed = date_format is not None
+    for chunk in reader:
+        # usecols は列の並び順で返るため、位置で取り出す
+        date_col, code_col, usage_col = chunk.columns
+        if not guessed and chunk[date_col].notna().any():
+            # 全件を to_datetime したときと同じく、最初の値から書式を決めて全分割で使う
+            date_format = guess_datetime_format(str(chunk[date_col].dropna().iloc[0]))
+            guessed = True
+        codes = chunk[code_col].fillna(MISSING_CODE)
+        if seen_codes is not None:
+            seen_codes.update(codes.unique().tolist())
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)  # 書式が決まらない場合の警告（分割ごとに出るため）
+            dates = pd.to_datetime(chunk[date_col], errors="coerce", format=date_format)
+        keep = (dates >= start) if start is not None else pd.Series(True, index=chunk.index)
+        if not keep.any():
+            continue
+        yield pd.DataFrame({
+            "日付": dates[keep].to_numpy(),
+            "品番": codes[keep].to_numpy(dtype=object),
+            "使用量": pd.to_numeric(chunk.loc[keep, usage_col], errors="coerce").to_numpy(dtype=float),
+        })
+
+
+def canonicalize_moments(moments: pd.DataFrame, seen_codes: Iterable) -> pd.DataFrame:
+    """読込時の表記ごとの集計を、全件読込と同じ品番の表記ごとにまとめる（"007" と "7" など）"""
+    if moments.empty:
+        return moments[MOMENT_COLUMNS]
+    codes = canonical_codes(pd.Index(sorted(seen_codes))).reindex(moments.index)
+    valid = codes.notna().to_numpy()
+    return combine_moments(moments.loc[valid, MOMENT_COLUMNS], codes[valid].to_numpy())
+
+
+def stream_base_moments(src: Union[str, io.IOBase, bytes], start: Optional[pd.Timestamp] = None,
+                        chunksize: int = CHUNK_ROWS, label: str = "base") -> pd.DataFrame:
+    """start 以降の品番別 件数・平均・偏差平方和（index は品番）"""
+    moments = empty_moments()
+    rows, seen = 0, set()
+    for chunk in iter_base_chunks(src, start, chunksize, seen_codes=seen):
+        rows += len(chunk)
+        moments = merge_moments(moments, chunk_moments(chunk["品番"], chunk["使用量"]))
+
+    moments = canonicalize_moments(moments, seen)
+    print(f"    集計: {label} ({rows:,}行 → {len(moments):,}品番)")
+    return moments
+
+
+def stream_base_stats(src: Union[str, io.IOBase, bytes], start: Optional[pd.Timestamp] = None,
+                      chunksize: int = CHUNK_ROWS, label: str = "base") -> pd.DataFrame:
+    """start 以降の品番別 移動平均・使用量標準偏差（全件読込 + groupby mean/std と同じ値）"""
+    return finalize_moments(stream_base_moments(src, start, chunksize, label))
+
+
+def moments_to_frame(moments: pd.DataFrame, key_name: str = "品番") -> pd.DataFrame:
+    """index の品番を列にした表（キャッシュ・プロセス間の受け渡し用）"""
+    out = moments[MOMENT_COLUMNS].copy()
+    out.insert(0, key_name, out.index.to_numpy())
+    return out.reset_index(drop=True)
+
+
+def frame_to_moments(frame: pd.DataFrame, key_name: str = "品番") -> pd.DataFrame:
+    out = frame.set_index(key_name)[MOMENT_COLUMNS]
+    out.index.name = None
+    return out
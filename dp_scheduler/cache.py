@@ -0,0 +1,79 @@
+"""整形済みマスタDataFrameのディスクキャッシュ（Parquet / LRU）"""
+import os
+import hashlib
+import importlib.util
+from typing import Optional
+
+import pandas as pd
+
+
+class ParseCache:
+    """ファイルの内容（Drive の md5Checksum / modifiedTime、ローカルはファイルハッシュ）を
+    キーに、整形済みDataFrameをParquetで保存する。
+
+    合計サイズが max_bytes を超えたら、最後に使われた時刻が古いものから削除する。
+    pyarrow が無い環境では何もしない。
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = importlib.util.find_spec("pyarrow") is not None
+        if not self.enabled:
+            print("    ℹ️ pyarrow が無いため、読込キャッシュは無効です")
+            return
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(name: str, file_info: dict, version: int = 1) -> str:
+        """キャッシュキー（同じ内容のファイルなら同じキー）"""
+        stamp = file_info.get('md5Checksum') or f"{file_info['id']}@{file_info.get('modifiedTime', '')}"
+        return hashlib.sha1(f"{name}|{stamp}|v{version}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            df = pd.read_parquet(path)
+        except Exception as e:
+            print(f"    キャッシュ読込エラー（再作成します）: {e}")
+            os.remove(path)
+            return None
+        os.utime(path)  # LRU用に最終利用時刻を更新
+        return df
+
+    def put(self, key: str, df: pd.DataFrame):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        tmp = path + ".tmp"
+        try:
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f"    キャッシュ保存スキップ: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self.evict()
+
+    def evict(self):
+        """合計サイズが上限を超えた分を古い順に削除"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".parquet"):
+                p = os.path.join(self.cache_dir, name)
+                st = os.stat(p)
+                entries.append((st.st_mtime, st.st_size, p))
+        total = sum(e[1] for e in entries)
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(p)
+            total -= size
@@ -0,0 +1,230 @@
+"""釜・充填ラインの有限能力スケジューラ
+
+統合済みバッチ（scheduler_list）を最終仕込デッドラインの早い順に優先度付きキュー（heapq）から
+取り出し、仕込を釜に、各製品の充填を充填ラインに稼働日単位で割り付ける。
+- 仕込: 標準仕込希望日（デッドラインより後ならデッドライン）以前で空きのある最も遅い稼働日。
+  容量が必要素地量以上の釜の候補を (日が遅い順, 容量の小さい順) のキューで試す。
+- 充填: 希望充填日以前かつ 仕込日 + L/T 稼働日以降で、ラインに空きのある最も遅い稼働日。
+  同じ製品・希望充填日の充填（分割されたバッチ）は1枠として扱う。
+- 資源ごとの「d 以前で空きのある最も遅い日」は、満杯の日を前日へ併合する union-find で求める。
+割り付けられないバッチは理由付きで返す。
+"""
+import heapq
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from dp_scheduler.workcalendar import WorkCalendar
+
+LINE_SLOTS_PER_DAY = 4      # config.gs の logFromMaxItems（1ライン1日あたりの充填数）
+KETTLE_BATCHES_PER_DAY = 1  # 1釜1日あたりの仕込回数
+NO_LINE = ""                # ライン未設定の製品（充填枠の制約なし）
+
+STATUS_OK = "割付済"
+STATUS_NG = "割付不可"
+REASON_NO_KETTLE = "容量の合う釜なし"
+REASON_KETTLE_FULL = "最終仕込デッドラインまでに釜の空きなし"
+REASON_LINE_FULL = "充填ラインの空きなし"
+REASON_OUT_OF_RANGE = "日付がカレンダー範囲外"
+
+
+class SlotCalendar:
+    """1資源の稼働日ごとの空き枠（d 以前で空きのある最も遅い日を union-find で求める）"""
+
+    def __init__(self, num_days: int, slots: int):
+        # 位置 0 は「空きなし」の番兵、稼働日 i は位置 i + 1
+        self.parent = list(range(num_days + 1))
+        self.used = [0] * (num_days + 1)
+        self.slots = slots
+
+    def _find(self, x: int) -> int:
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def latest_free(self, day: int) -> int:
+        """day 以前で空きのある最も遅い稼働日（無ければ -1）"""
+        if day < 0:
+            return -1
+        return self._find(min(day, len(self.parent) - 2) + 1) - 1
+
+    def room(self, day: int) -> int:
+        return self.slots - self.used[day + 1]
+
+    def book(self, day: int):
+        self.used[day + 1] += 1
+        if self.used[day + 1] >= self.slots:
+            self.parent[day + 1] = day
+
+
+def default_kettles(max_batch: Dict[str, float]) -> Dict[str, float]:
+    """material_master の 油脂仕込み量１ の値ごとに1釜（釜名は "釜<容量>"）"""
+    caps = sorted({float(v) for v in max_batch.values() if pd.notna(v) and float(v) > 0})
+    return {f"釜{cap:g}": cap for cap in caps}
+
+
+def code_key(values) -> pd.Series:
+    """品番の比較用文字列（数値なら整数表記）"""
+    s = pd.Series(values, dtype=object)
+    num = pd.to_numeric(s, errors="coerce")
+    text = s.astype(str).str.strip()
+    ints = num.dropna()
+    text[ints.index] = ints.astype(np.int64).astype(str)
+    return text
+
+
+def _product_fields(df_lots: pd.DataFrame) -> List[int]:
+    n = 1
+    while f"製品({n})_コード" in df_lots.columns:
+        n += 1
+    return list(range(1, n))
+
+
+class CapacityScheduler:
+    """釜と充填ラインの空き枠を持ち、バッチを1件ずつ割り付ける"""
+
+    def __init__(self, days: pd.DatetimeIndex, kettles: Dict[str, float], lines: List[str],
+                 line_slots: int = LINE_SLOTS_PER_DAY, kettle_slots: int = KETTLE_BATCHES_PER_DAY):
+        self.days = pd.DatetimeIndex(days)
+        self.kettles = {name: (cap, SlotCalendar(len(days), kettle_slots)) for name, cap in kettles.items()}
+        self.lines = {line: SlotCalendar(len(days), line_slots) for line in lines if line != NO_LINE}
+        self.filled: Dict[Tuple[str, int], int] = {}  # (品番, 希望充填日) → 割付済みの充填日
+
+    def index_on_or_before(self, dates) -> np.ndarray:
+        """各日付以前で最も遅い稼働日の位置（範囲より前・欠損は -1）"""
+        values = pd.DatetimeIndex(pd.to_datetime(pd.Series(dates), errors="coerce")).normalize()
+        pos = self.days.searchsorted(values, side="right") - 1
+        return np.where(values.isna(), -1, pos)
+
+    def _place_fills(self, fills: List[Tuple[str, str, int]], lo: int) -> Optional[List[int]]:
+        """lo 以降で各充填の日を決める（仮置き。入らなければ None）"""
+        pending, out = Counter(), []
+        for code, line, want in fills:
+            booked = self.filled.get((code, want))
+            if booked is not None:
+                if booked < lo:
+                    return None
+                out.append(booked)
+                continue
+            slot = self.lines.get(line)
+            if slot is None:
+                if want < lo:
+                    return None
+                out.append(want)
+                continue
+            day = slot.latest_free(want)
+            while day >= lo and slot.room(day) - pending[(line, day)] <= 0:
+                day = slot.latest_free(day - 1)
+            if day < lo:
+                return None
+            pending[(line, day)] += 1
+            out.append(day)
+        return out
+
+    def place(self, amount: float, target: int, lead: int,
+              fills: List[Tuple[str, str, int]]) -> Tuple[Optional[str], int, List[int], str]:
+        """(釜, 仕込日, 充填日の一覧, 理由) を返す。割り付けられなければ釜は None"""
+        queue = []
+        for name, (cap, slot) in self.kettles.items():
+            if cap >= amount:
+                day = slot.latest_free(target)
+                if day >= 0:
+                    heapq.heappush(queue, (-day, cap, name))
+        if not any(cap >= amount for cap, _ in self.kettles.values()):
+            return None, -1, [], REASON_NO_KETTLE
+        if not queue:
+            return None, -1, [], REASON_KETTLE_FULL
+
+        while queue:
+            neg_day, cap, name = heapq.heappop(queue)
+            day = -neg_day
+            placed = self._place_fills(fills, day + lead)
+            if placed is not None:
+                self.kettles[name][1].book(day)
+                for (code, line, want), fill_day in zip(fills, placed):
+                    if (code, want) in self.filled:
+                        continue
+                    self.filled[(code, want)] = fill_day
+                    if line in self.lines:
+                        self.lines[line].book(fill_day)
+                return name, day, placed, ""
+            # 仕込を前倒しすると充填できる範囲が広がる
+            earlier = self.kettles[name][1].latest_free(day - 1)
+            if earlier >= 0:
+                heapq.heappush(queue, (-earlier, cap, name))
+        return None, -1, [], REASON_LINE_FULL
+
+
+def schedule_capacity(df_lots: pd.DataFrame, calendar: WorkCalendar, lead_times: Dict[str, int],
+                      line_of: Dict[str, str], kettles: Dict[str, float],
+                      default_lead: int = 3, line_slots: int = LINE_SLOTS_PER_DAY,
+                      kettle_slots: int = KETTLE_BATCHES_PER_DAY) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """統合済みバッチを割り付け、(バッチごとの結果, 充填ごとの結果) を返す
+
+    line_of は 品番（code_key の表記）→ ライン名。
+    """
+    lot_columns = ["Recipe", "必要素地量", "標準仕込希望日", "最終仕込デッドライン", "釜", "仕込日",
+                   "仕込前倒し日数", "状態", "理由"]
+    fill_columns = ["Recipe", "釜", "仕込日", "ライン", "コード", "商品名", "個数", "希望充填日", "充填日", "充填前倒し日数"]
+    if df_lots is None or df_lots.empty:
+        return pd.DataFrame(columns=lot_columns), pd.DataFrame(columns=fill_columns)
+
+    days = calendar.index.normalize()
+    fields = _product_fields(df_lots)
+    lines = sorted(set(line_of.values()))
+    sched = CapacityScheduler(days, kettles, lines, line_slots, kettle_slots)
+
+    lots = df_lots.reset_index(drop=True)
+    pref = sched.index_on_or_before(lots["標準仕込希望日"])
+    deadline = sched.index_on_or_before(lots["最終仕込デッドライン"])
+    target = np.where(pref < 0, deadline, np.minimum(pref, deadline))
+    amounts = pd.to_numeric(lots["必要素地量"], errors="coerce").fillna(0).to_numpy(dtype=float)
+    leads = lots["Recipe"].map(lead_times).fillna(default_lead).astype(int).to_numpy()
+
+    # 製品欄ごとの 品番・ライン・希望充填日の位置・商品名・個数・有無
+    products = []
+    for i in fields:
+        codes = code_key(lots[f"製品({i})_コード"])
+        products.append({
+            "code": codes.to_numpy(),
+            "line": codes.map(line_of).fillna(NO_LINE).to_numpy(),
+            "want": sched.index_on_or_before(lots[f"製品({i})_充填日"].replace("", None)),
+            "name": lots[f"製品({i})_商品名"].to_numpy(),
+            "qty": lots[f"製品({i})_個数"].to_numpy(),
+            "present": lots[f"製品({i})_コード"].astype(str).str.strip().ne("").to_numpy(),
+        })
+    recipes = lots["Recipe"].to_numpy()
+    pref_dates = lots["標準仕込希望日"].to_numpy()
+    deadline_dates = lots["最終仕込デッドライン"].to_numpy()
+
+    # 期限の早い順（同じなら希望日・元の順）に取り出す
+    heap = [(deadline[k], pref[k], k) for k in range(len(lots))]
+    heapq.heapify(heap)
+
+    lot_rows, fill_rows = [None] * len(lots), []
+    while heap:
+        _, _, k = heapq.heappop(heap)
+        items = [p for p in products if p["present"][k]]
+        fills = [(p["code"][k], p["line"][k], int(p["want"][k])) for p in items]
+        if target[k] < 0 or any(f[2] < 0 for f in fills):
+            kettle, day, placed, reason = None, -1, [], REASON_OUT_OF_RANGE
+        else:
+            kettle, day, placed, reason = sched.place(amounts[k], int(target[k]), int(leads[k]), fills)
+
+        planned = days[day] if kettle else pd.NaT
+        lot_rows[k] = [recipes[k], amounts[k], pref_dates[k], deadline_dates[k], kettle or "",
+                       planned, int(target[k] - day) if kettle else np.nan,
+                       STATUS_OK if kettle else STATUS_NG, reason]
+        for p, (code, line, want), fill_day in zip(items, fills, placed):
+            fill_rows.append([recipes[k], kettle, planned, line, code, p["name"][k], p["qty"][k],
+                              days[want], days[fill_day], want - fill_day])
+
+    df_lot = pd.DataFrame(lot_rows, columns=lot_columns)
+    df_fill = pd.DataFrame(fill_rows, columns=fill_columns).sort_values(
+        ["充填日", "ライン", "コード"], kind="stable").reset_index(drop=True)
+    return df_lot, df_fill
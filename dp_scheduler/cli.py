@@ -0,0 +1,108 @@
+"""コマンドライン（scheduler <処理>・python -m dp_scheduler <処理>）
+
+- sync-sheets: マスターから月シートを更新（1.py と同じ。dp_scheduler.update_sheets）
+- plan: 仕込計画・釜/ラインへの割付を出力（dp_scheduler.planner の scheduler・capacity）
+- ai-export: AIscheduler_YYYYMMDD.csv を出力（dp_scheduler.planner の ai_format）
+- watch: 常駐して Input/Master の変更ごとに plan・ai-export をやり直す（dp_scheduler.watch）
+処理のモジュール（pandas など）は実行する処理が決まってから import する（--help はすぐ返る）。
+cron などから実行する場合は --auth service_account --key-file <鍵> を使う。
+"""
+import argparse
+import sys
+from typing import List, Optional
+
+from dp_scheduler.auth import AUTH_MODES
+
+
+def sync_sheets(args) -> int:
+    from dp_scheduler import update_sheets
+    update_sheets.run(data_source=args.source, master_dir=args.master_dir, output_dir=args.output_dir,
+                      cache_dir=args.cache_dir, sheets_mode=args.sheets, auth_mode=args.auth, key_file=args.key_file)
+    return 0
+
+
+def _planner(args):
+    """期間などの指定を planner の設定に反映して返す"""
+    from dp_scheduler import planner
+    if args.start:
+        planner.FILTER_START_DATE = args.start
+    if args.end:
+        planner.FILTER_END_DATE = args.end
+    if args.mount:
+        planner.mount_drive()
+    planner.configure(args.root)
+    return planner
+
+
+def _plan_steps(planner, args) -> List[str]:
+    steps = (["enrich"] if args.enrich or planner.ENRICH_LOG else []) + ["scheduler"]
+    if planner.CAPACITY_MODE and not args.no_capacity:
+        steps.append("capacity")
+    return steps
+
+
+def plan(args) -> int:
+    planner = _planner(args)
+    planner.run(_plan_steps(planner, args))
+    return 0
+
+
+def ai_export(args) -> int:
+    _planner(args).run(["ai_format"])
+    return 0
+
+
+def watch(args) -> int:
+    from dp_scheduler.watch import watch as watch_folder
+    planner = _planner(args)
+    watch_folder(args.root, _plan_steps(planner, args) + ["ai_format"], interval=args.interval, settle=args.settle,
+                 source=args.source, auth_mode=args.auth, key_file=args.key_file, max_runs=args.max_runs,
+                 trace_runs=args.trace)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="scheduler", description="dp_Scheduler の各処理を実行する")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("sync-sheets", help="マスターから月シート（yyyy/mm）を更新")
+    p.add_argument("--source", choices=["drive", "local"], help="マスターの読込元（既定: DP_SCHEDULER_SOURCE または drive）")
+    p.add_argument("--master-dir", help="--source local のマスターフォルダ")
+    p.add_argument("--output-dir", help="shortage_list.csv・トレースの出力先")
+    p.add_argument("--cache-dir", help="読込キャッシュ・使用量ストアの保存先")
+    p.add_argument("--sheets", choices=["on", "off", "fake"], help="スプレッドシートへの出力（fake: ローカルの代替シート）")
+    p.add_argument("--auth", choices=AUTH_MODES, help="Google の認証方法（既定: DP_SCHEDULER_AUTH または auto）")
+    p.add_argument("--key-file", help="サービスアカウントの鍵ファイル（--auth service_account）")
+    p.set_defaults(func=sync_sheets)
+
+    for name, func, text in [("plan", plan, "仕込計画（scheduler_list・shortage・capacity）を出力"),
+                             ("ai-export", ai_export, "AIscheduler_YYYYMMDD.csv を出力"),
+                             ("watch", watch, "常駐して Input/Master の変更ごとに plan・ai-export をやり直す")]:
+        p = commands.add_parser(name, help=text)
+        p.add_argument("--root", help="dp_Scheduler フォルダの親（既定: DP_SCHEDULER_ROOT または マイドライブ）")
+        p.add_argument("--start", help="計画期間の開始日（YYYY-MM-DD。既定: planner.FILTER_START_DATE）")
+        p.add_argument("--end", help="計画期間の終了日（YYYY-MM-DD。既定: planner.FILTER_END_DATE）")
+        p.add_argument("--mount", action="store_true", help="Colab で Google Drive をマウントしてから実行")
+        if name in ("plan", "watch"):
+            p.add_argument("--enrich", action="store_true", help="log.csv にマスタ情報を付与してから計画")
+            p.add_argument("--no-capacity", action="store_true", help="釜・ラインへの割付を行わない")
+        if name == "watch":
+            p.add_argument("--interval", type=float, default=2.0, help="変更を確認する間隔（秒）")
+            p.add_argument("--settle", type=float, default=1.0, help="更新が止まってから計画するまでの秒数")
+            p.add_argument("--source", choices=["local", "drive"], default="local",
+                           help="local: フォルダを確認 / drive: Drive の変更を確認して Input/Master へ複製")
+            p.add_argument("--auth", choices=AUTH_MODES, help="--source drive の認証方法")
+            p.add_argument("--key-file", help="サービスアカウントの鍵ファイル（--auth service_account）")
+            p.add_argument("--max-runs", type=int, help="この回数だけ計画し直したら終了")
+            p.add_argument("--trace", action="store_true", help="計画ごとにトレースを出力")
+        p.set_defaults(func=func)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+"""仕込みバッチ統合エンジン（素地ごとに釜容量へ製品を詰め合わせる）
+
+戦略:
+  greedy                 従来の consolidate_batches_advanced と同じ結果（期限順に先頭から詰め、
+                         入りきらない製品は残りを分割して次のバッチへ）
+  first_fit              期限順に、空きのある最初のバッチへ入れる
+  first_fit_decreasing   素地量の大きい順に first_fit
+
+素地ごとの計算は配列とセグメント木で O(n log n)。行数が多い場合は素地ごとにプロセスプールで並列に処理する。
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+STRATEGIES = ("greedy", "first_fit", "first_fit_decreasing")
+MAX_PRODUCTS_PER_BATCH = 4
+PARALLEL_MIN_ROWS = 200000  # これ未満の行数ならプロセスプールを使わない（起動コストの方が大きい）
+PRODUCT_FIELDS = ['コード', '商品名', '個数', '充填日', '素地量', '状態']
+
+
+class _MaxSegmentTree:
+    """各バッチの空き容量の最大値を持ち、空きが x 以上の最初のバッチを O(log n) で探す"""
+
+    def __init__(self, size: int):
+        self.n = 1
+        while self.n < max(1, size):
+            self.n *= 2
+        self.tree = [-np.inf] * (2 * self.n)
+
+    def update(self, i: int, value: float):
+        i += self.n
+        self.tree[i] = value
+        i //= 2
+        while i:
+            left, right = self.tree[2 * i], self.tree[2 * i + 1]
+            self.tree[i] = left if left >= right else right
+            i //= 2
+
+    def find_first(self, x: float) -> int:
+        if self.tree[1] < x:
+            return -1
+        i = 1
+        while i < self.n:
+            i = 2 * i if self.tree[2 * i] >= x else 2 * i + 1
+        return i - self.n
+
+
+class _Packing:
+    """詰め合わせ結果（バッチ単位とバッチ内の製品単位の配列）"""
+
+    def __init__(self):
+        self.batch_head = []     # 次の先頭位置（greedy のみ、無ければ -1）
+        self.batch_total = []    # バッチの素地量合計
+        self.entry_batch = []    # 製品が入ったバッチ番号
+        self.entry_pos = []      # 製品の位置（素地内の期限順）
+        self.entry_amount = []   # 入れた素地量
+        self.entry_partial = []  # 分割したか
+
+    def add(self, entries, total: float, head: int = -1):
+        b = len(self.batch_total)
+        self.batch_head.append(head)
+        self.batch_total.append(total)
+        for pos, amount, partial in entries:
+            self.entry_batch.append(b)
+            self.entry_pos.append(pos)
+            self.entry_amount.append(amount)
+            self.entry_partial.append(partial)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "batch_head": np.asarray(self.batch_head, dtype=np.int64),
+            "batch_total": np.asarray(self.batch_total, dtype=float),
+            "entry_batch": np.asarray(self.entry_batch, dtype=np.int64),
+            "entry_pos": np.asarray(self.entry_pos, dtype=np.int64),
+            "entry_amount": np.asarray(self.entry_amount, dtype=float),
+            "entry_partial": np.asarray(self.entry_partial, dtype=bool),
+        }
+
+
+def _pack_single(amounts: np.ndarray, out: _Packing):
+    """釜容量が0以下・不明の素地は統合せず1製品1バッチ（従来は無限ループになっていた）"""
+    for i, a in enumerate(amounts.tolist()):
+        out.add([(i, a, False)], a)
+
+
+def _pack_greedy(amounts: np.ndarray, capacity: float, max_products: int, out: _Packing):
+    """従来ロジック: キューの先頭から順に詰め、入りきらなければ残量を分割して次のバッチへ"""
+    remaining = amounts.tolist()
+    n = len(remaining)
+    head = 0
+    while head < n:
+        entries, cur = [], 0.0
+        while head < n and len(entries) < max_products:
+            remain = capacity - cur
+            if remain <= 0:
+                break
+            amount = remaining[head]
+            if amount <= remain:
+                cur += amount
+                entries.append((head, amount, False))
+                head += 1
+            else:
+                cur += remain
+                entries.append((head, remain, True))
+                remaining[head] -= remain
+                break
+        out.add(entries, cur, head if head < n else -1)
+
+
+def _split_units(amounts: List[float], order, capacity: float):
+    """釜容量を超える製品は容量ごとに分割した単位にする（分割したものは部分扱い）"""
+    for i in order:
+        amount = amounts[i]
+        if amount <= capacity:
+            yield i, amount, False
+            continue
+        while amount > 0:
+            part = min(capacity, amount)
+            yield i, part, True
+            amount -= part
+
+
+def _pack_first_fit(amounts: List[float], order, offset: int, capacity: float, max_products: int, out: _Packing):
+    """order の順に、空き容量が足りる最初のバッチへ入れる"""
+    units = list(_split_units(amounts, order, capacity))
+    tree = _MaxSegmentTree(len(units))
+    batches: List[list] = []
+    free: List[float] = []
+    for i, amount, partial in units:
+        b = tree.find_first(amount)
+        if b < 0:
+            b = len(batches)
+            batches.append([])
+            free.append(capacity)
+        batches[b].append((offset + int(i), amount, partial))
+        free[b] -= amount
+        tree.update(b, free[b] if len(batches[b]) < max_products else -np.inf)
+    for entries in batches:
+        total = 0.0
+        for _, amount, _ in entries:
+            total += amount
+        out.add(entries, total)
+
+
+def _windows(deadlines: np.ndarray, horizon_ns: Optional[int]) -> List[slice]:
+    """期限順の位置を、先頭の期限から horizon 以内ごとの区間に分ける"""
+    if horizon_ns is None or len(deadlines) == 0:
+        return [slice(0, len(deadlines))]
+    out, start = [], 0
+    for i in range(1, len(deadlines) + 1):
+        if i == len(deadlines) or deadlines[i] - deadlines[start] > horizon_ns:
+            out.append(slice(start, i))
+            start = i
+    return out
+
+
+def pack_recipe(args) -> Dict[str, np.ndarray]:
+    """1素地分を詰め合わせる（プロセスプールから呼ぶためタプル1つを受け取る）
+
+    args = (素地量配列, 期限配列[int64 ns], 釜容量, 戦略, 最大製品数, 期間幅[ns] or None)
+    配列は期限・希望日の順に並んでいること。
+    """
+    amounts, deadlines, capacity, strategy, max_products, horizon_ns = args
+    out = _Packing()
+    if not (capacity > 0):
+        _pack_single(amounts, out)
+    elif strategy == "greedy":
+        _pack_greedy(amounts, capacity, max_products, out)
+    else:
+        for w in _windows(deadlines, horizon_ns):
+            sub = amounts[w]
+            order = np.argsort(-sub, kind="stable") if strategy == "first_fit_decreasing" else range(len(sub))
+            _pack_first_fit(sub.tolist(), order, w.start, capacity, max_products, out)
+    return out.arrays()
+
+
+def consolidate(
+    df_schedulable: pd.DataFrame,
+    strategy: str = "greedy",
+    max_products: int = MAX_PRODUCTS_PER_BATCH,
+    horizon_days: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    infer_types: bool = True,
+) -> pd.DataFrame:
+    """素地ごとに製品を釜容量まで統合し、1バッチ1行の表を返す
+
+    greedy は従来と同じ結果。first_fit / first_fit_decreasing では、バッチの
+    標準仕込希望日・最終仕込デッドラインは含まれる製品の最も早い日付になる。
+    horizon_days を指定すると、期限がその日数以内の製品どうしだけを統合する（greedy 以外）。
+    infer_types=False なら列の型推定をせず object のまま返す（結果を後で連結する場合用）。
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"未対応の統合方法です: {strategy}（{', '.join(STRATEGIES)}）")
+    if df_schedulable.empty:
+        return df_schedulable
+
+    # 素地は元の出現順、素地内は期限・希望日の順（安定ソート）に並べ、素地ごとの区間に分ける
+    codes, recipes = pd.factorize(df_schedulable['Recipe'])
+    df = (df_schedulable.assign(_recipe=codes)
+          .sort_values(by=['_recipe', '最終仕込デッドライン', '標準仕込希望日'], kind='stable')
+          .reset_index(drop=True))
+    bounds = np.searchsorted(df['_recipe'].to_numpy(), np.arange(len(recipes) + 1))
+    horizon_ns = None if horizon_days is None else int(pd.Timedelta(days=horizon_days).value)
+
+    amounts = df['必要素地量'].to_numpy(dtype=float)
+    deadlines = df['最終仕込デッドライン'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    # 従来どおり容量は numpy の float64 のまま使う（分割量の丸め方を合わせるため）
+    capacities = df['釜最大容量'].to_numpy(dtype=float)
+    jobs = [(amounts[s:e], deadlines[s:e], capacities[s], strategy, max_products, horizon_ns)
+            for s, e in zip(bounds[:-1], bounds[1:])]
+
+    if max_workers != 1 and len(jobs) > 1 and len(df) >= PARALLEL_MIN_ROWS:
+        workers = max_workers or min(len(jobs), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(pack_recipe, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    else:
+        results = [pack_recipe(job) for job in jobs]
+
+    return _build_rows(df, bounds, results, strategy, max_products, infer_types)
+
+
+def _build_rows(df: pd.DataFrame, bounds: np.ndarray, results: List[Dict[str, np.ndarray]],
+                strategy: str, max_products: int, infer_types: bool = True) -> pd.DataFrame:
+    """バッチ結果を従来と同じ列構成の表にする（列ごとに配列でまとめて作る）"""
+    # 素地ごとの結果を、位置・バッチ番号を全体の通し番号にして連結
+    offsets = np.cumsum([0] + [len(r["batch_total"]) for r in results])
+    head = np.concatenate([np.where(r["batch_head"] >= 0, r["batch_head"] + s, -1)
+                           for r, s in zip(results, bounds[:-1])])
+    total = np.concatenate([r["batch_total"] for r in results])
+    e_batch = np.concatenate([r["entry_batch"] + o for r, o in zip(results, offsets[:-1])])
+    e_pos = np.concatenate([r["entry_pos"] + s for r, s in zip(results, bounds[:-1])])
+    e_amount = np.concatenate([r["entry_amount"] for r in results])
+    e_partial = np.concatenate([r["entry_partial"] for r in results])
+
+    n = len(total)
+    first = np.searchsorted(e_batch, np.arange(n))  # 各バッチ先頭の製品
+    count = np.diff(np.append(first, len(e_batch)))
+    slot = np.arange(len(e_batch)) - first[e_batch]
+    base = e_pos[first]
+
+    fill = df['充填日'].to_numpy()
+    preferred = df['標準仕込希望日'].to_numpy()
+    deadline = df['最終仕込デッドライン'].to_numpy()
+    capacity = df['釜最大容量'].to_numpy()[base]
+
+    if strategy == "greedy":
+        # 従来どおり、バッチ後に残ったキュー先頭の日付（残りが無ければ充填日）
+        has_next = head >= 0
+        pref = np.where(has_next, preferred[np.maximum(head, 0)], fill[base])
+        dl = np.where(has_next, deadline[np.maximum(head, 0)], fill[base])
+    else:
+        mins = pd.DataFrame({"b": e_batch, "p": preferred[e_pos], "d": deadline[e_pos]}).groupby("b").min()
+        pref, dl = mins["p"].to_numpy(), mins["d"].to_numpy()
+
+    out = {
+        'Recipe': df['Recipe'].to_numpy()[base],
+        '充填日': fill[base],
+        '標準仕込希望日': pref,
+        '最終仕込デッドライン': dl,
+        '必要素地量': total,
+        '釜最大容量': capacity,
+        '余剰液量': capacity - total,
+        '統合製品数': count,
+        '統合フラグ': np.where(count > 1, '統合済', '単独'),
+        '仕込回数削減': count - 1,
+    }
+
+    # 製品ごとの素地量の丸め: 元の量のままなら元の値（int / float）を Python の round で、
+    # 分割で変わった量は numpy の丸めで（従来の実装と同じ型・同じ値になるようにする）
+    original = df['必要素地量'].to_numpy(dtype=object)[e_pos]
+    untouched = ~e_partial & (e_amount == original.astype(float))
+    rounded = np.round(e_amount, 2).astype(object)
+    rounded[untouched] = [round(v, 2) for v in original[untouched].tolist()]
+
+    values = {
+        'コード': df['code'].to_numpy(dtype=object)[e_pos],
+        '商品名': df['productname'].to_numpy(dtype=object)[e_pos],
+        '個数': df['cell'].to_numpy(dtype=object)[e_pos],
+        '充填日': df['充填日'].dt.strftime('%Y-%m-%d').to_numpy(dtype=object)[e_pos],
+        '素地量': rounded,
+        '状態': np.where(e_partial, '部分', '全量').astype(object),
+    }
+    for idx in range(max_products):
+        mask = slot == idx
+        for field in PRODUCT_FIELDS:
+            col = np.full(n, '', dtype=object)
+            col[e_batch[mask]] = values[field][mask]
+            out[f'製品({idx + 1})_{field}'] = col
+
+    rows = pd.DataFrame(out)
+    return rows.infer_objects() if infer_types else rows.astype(object)
@@ -0,0 +1,315 @@
+"""マスターファイル取得元（Google Drive / ローカルフォルダ）の共通インターフェース"""
+import io
+import os
+import glob
+import json
+import hashlib
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from dp_scheduler import trace
+
+
+FOLDER_MIME = "application/vnd.google-apps.folder"
+
+
+def pick_file(candidates: List[dict], patterns: List[str]) -> Optional[dict]:
+    """候補からパターン順に1件選ぶ（完全一致 → 更新日時が新しい順）"""
+    for pattern in patterns:
+        needle = pattern.replace('*', '')
+        hits = [f for f in candidates if needle in f['name']]
+        if hits:
+            hits.sort(key=lambda f: f.get('modifiedTime', ''), reverse=True)
+            hits.sort(key=lambda f: f['name'] != needle)
+            return hits[0]
+    return None
+
+
+def file_md5(path: str, chunk_size: int = 1 << 20) -> str:
+    """ファイルのMD5（Drive の md5Checksum と同じ形式）"""
+    h = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Manifest:
+    """キー → ファイルID/更新日時 の対応をローカルJSONに保存する"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.data = {"folders": [], "files": {}}
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self.data.update(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"    マニフェスト読込エラー（無視します）: {e}")
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.data["files"].get(key)
+
+    def save(self, files: Dict[str, dict], folders: Optional[List[str]] = None):
+        """files の分を追加・更新して保存（resolve() と find_all() の記録は互いに消さない）"""
+        self.data["files"].update({
+            k: {f: v[f] for f in ("id", "name", "modifiedTime", "size", "md5Checksum") if f in v}
+            for k, v in files.items() if v
+        })
+        if folders is not None:
+            self.data["folders"] = sorted(set(folders))
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+
+class DataSource:
+    """マスターファイル取得元の基底クラス
+
+    resolve() / find() で見つけたファイル情報（id, name, modifiedTime を持つ dict）を
+    open() に渡すと中身を bytes で返す。
+    """
+
+    manifest: Optional[Manifest] = None
+
+    def find(self, patterns: List[str]) -> Optional[dict]:
+        """パターン順に探索し、最初に見つかったファイル情報を返す"""
+        raise NotImplementedError
+
+    def find_all(self, patterns: List[str]) -> List[dict]:
+        """いずれかのパターンを名前に含むファイルをすべて返す（拠点別の base_file_*.csv など）
+
+        マニフェストにはファイルIDをキーに記録し、resolve() と同じく changed・md5Checksum を付ける。
+        """
+        found = self._find_all(patterns)
+        self._track({info['id']: info for info in found})
+        return found
+
+    def _find_all(self, patterns: List[str]) -> List[dict]:
+        found = self.find(patterns)
+        return [found] if found else []
+
+    def _resolve(self, specs: Dict[str, List[str]]) -> Dict[str, dict]:
+        return {key: self.find(patterns) for key, patterns in specs.items()}
+
+    def resolve(self, specs: Dict[str, List[str]]) -> Dict[str, dict]:
+        """キーごとのパターンをまとめて解決する（changed・md5Checksum の付け方は _track）"""
+        found = {k: v for k, v in self._resolve(specs).items() if v}
+        self._track(found)
+        return found
+
+    def _track(self, found: Dict[str, dict]):
+        """前回のマニフェストと比べ、ID・modifiedTime・サイズのいずれかが変わったファイルには
+        changed=True を付ける。変わっていないファイルは前回の md5Checksum を引き継ぐため、
+        ローカルでも読み直さずに読込キャッシュ・使用量ストアのキーが決まり、ダウンロードを省ける。
+        """
+        for key, info in found.items():
+            prev = self.manifest.get(key) if self.manifest else None
+            info['changed'] = (
+                prev is None
+                or prev.get('id') != info['id']
+                or prev.get('modifiedTime') != info.get('modifiedTime')
+                or prev.get('size') != info.get('size')
+            )
+            if not info['changed'] and 'md5Checksum' not in info and prev.get('md5Checksum'):
+                info['md5Checksum'] = prev['md5Checksum']
+            if 'md5Checksum' not in info:
+                self.checksum(info)
+        if self.manifest:
+            self.manifest.save(found, getattr(self, "folders", None))
+
+    def checksum(self, file_info: dict):
+        """md5Checksum が無いファイル情報に付与する（取得元が内容のハッシュを返さない場合）"""
+
+    def open(self, file_info: dict) -> bytes:
+        """ファイルの中身を取得"""
+        raise NotImplementedError
+
+    def open_io(self, file_info: dict) -> io.BytesIO:
+        """ファイルの中身を BytesIO で取得"""
+        return io.BytesIO(self.open(file_info))
+
+
+class DriveDataSource(DataSource):
+    """Google Drive API を使う取得元
+
+    httplib2 はスレッドセーフでないため、Drive API接続はスレッドごとに作成する。
+    """
+
+    FIELDS = "nextPageToken, files(id, name, mimeType, modifiedTime, md5Checksum, parents)"
+
+    def __init__(self, credentials, folder_id: Optional[str] = None, manifest_path: Optional[str] = None):
+        self.credentials = credentials
+        self.folder_id = folder_id
+        self.manifest = Manifest(manifest_path)
+        # サブフォルダ（base/ など）はマニフェストに覚えておき、次回以降は1クエリで済ませる
+        self.folders = [folder_id] if folder_id else []
+        if folder_id:
+            self.folders += [f for f in self.manifest.data.get("folders", []) if f != folder_id]
+        self._local = threading.local()
+
+    @property
+    def service(self):
+        if not hasattr(self._local, "service"):
+            from googleapiclient.discovery import build
+            self._local.service = build('drive', 'v3', credentials=self.credentials, cache_discovery=False)
+        return self._local.service
+
+    def search(self, query: str) -> List[dict]:
+        """Google Drive APIでファイルを検索"""
+        try:
+            trace.count("drive.calls")
+            results = self.service.files().list(
+                q=query,
+                spaces='drive',
+                fields='files(id, name, mimeType)',
+                pageSize=10
+            ).execute()
+            return results.get('files', [])
+        except Exception as e:
+            print(f"    検索エラー: {e}")
+            return []
+
+    def find(self, patterns: List[str]) -> Optional[dict]:
+        for pattern in patterns:
+            query = f"name contains '{pattern.replace('*', '')}' and trashed=false"
+            results = self.search(query)
+            if results:
+                return results[0]
+        return None
+
+    def list_folders(self, folder_ids: List[str], patterns: List[str]) -> List[dict]:
+        """指定フォルダ直下から、いずれかのパターンを名前に含むファイルとサブフォルダを取得"""
+        def _q(v):
+            return v.replace("\\", "\\\\").replace("'", "\\'")
+
+        parents = " or ".join(f"'{_q(fid)}' in parents" for fid in folder_ids)
+        names = " or ".join(f"name contains '{_q(p.replace('*', ''))}'" for p in patterns)
+        query = f"({parents}) and trashed=false and ({names} or mimeType='{FOLDER_MIME}')"
+        files, token = [], None
+        while True:
+            trace.count("drive.calls")
+            results = self.service.files().list(
+                q=query,
+                spaces='drive',
+                fields=self.FIELDS,
+                pageSize=1000,
+                pageToken=token
+            ).execute()
+            files.extend(results.get('files', []))
+            token = results.get('nextPageToken')
+            if not token:
+                return files
+
+    def _list_candidates(self, patterns: List[str]) -> List[dict]:
+        listed = self.list_folders(self.folders, patterns)
+        # 未知のサブフォルダがあれば、その中身だけ追加で取得
+        new_folders = [f['id'] for f in listed if f['mimeType'] == FOLDER_MIME and f['id'] not in self.folders]
+        if new_folders:
+            self.folders += new_folders
+            listed += self.list_folders(new_folders, patterns)
+        return [f for f in listed if f['mimeType'] != FOLDER_MIME]
+
+    def _resolve(self, specs: Dict[str, List[str]]) -> Dict[str, dict]:
+        if not self.folder_id:
+            return super()._resolve(specs)
+
+        patterns = sorted({p for ps in specs.values() for p in ps})
+        candidates = self._list_candidates(patterns)
+        return {key: pick_file(candidates, ps) for key, ps in specs.items()}
+
+    def _find_all(self, patterns: List[str]) -> List[dict]:
+        if not self.folder_id:
+            return super()._find_all(patterns)
+        needles = [p.replace('*', '') for p in patterns]
+        return [f for f in self._list_candidates(patterns) if any(n in f['name'] for n in needles)]
+
+    def open(self, file_info: dict) -> bytes:
+        from googleapiclient.http import MediaIoBaseDownload
+        request = self.service.files().get_media(fileId=file_info['id'])
+        buf = io.BytesIO()
+        downloader = MediaIoBaseDownload(buf, request)
+        done = False
+        while not done:
+            trace.count("drive.calls")
+            _, done = downloader.next_chunk()
+        return buf.getvalue()
+
+
+class LocalDataSource(DataSource):
+    """ローカルフォルダ（dp_Scheduler/Input/Master と同じ構成）を使う取得元
+
+    ルート直下に加え、base/ などのサブフォルダも探索する。
+    """
+
+    def __init__(self, root: str, manifest_path: Optional[str] = None):
+        if not os.path.isdir(root):
+            raise FileNotFoundError(f"フォルダが見つかりません: {root}")
+        self.root = root
+        self.manifest = Manifest(manifest_path)
+
+    def list_files(self) -> List[str]:
+        """ルート直下と1階層下のファイル一覧"""
+        paths = glob.glob(os.path.join(self.root, "*")) + glob.glob(os.path.join(self.root, "*", "*"))
+        return sorted(p for p in paths if os.path.isfile(p))
+
+    def _file_info(self, path: str) -> dict:
+        st = os.stat(path)
+        mtime = datetime.fromtimestamp(st.st_mtime, tz=timezone.utc)
+        return {"id": path, "name": os.path.basename(path), "modifiedTime": mtime.isoformat(), "size": st.st_size}
+
+    def find(self, patterns: List[str]) -> Optional[dict]:
+        return pick_file([self._file_info(p) for p in self.list_files()], patterns)
+
+    def _find_all(self, patterns: List[str]) -> List[dict]:
+        needles = [p.replace('*', '') for p in patterns]
+        return [self._file_info(p) for p in self.list_files() if any(n in os.path.basename(p) for n in needles)]
+
+    def _resolve(self, specs: Dict[str, List[str]]) -> Dict[str, dict]:
+        # Drive 側の "name contains" と同じく部分一致
+        candidates = [self._file_info(p) for p in self.list_files()]
+        return {key: pick_file(candidates, ps) for key, ps in specs.items()}
+
+    def checksum(self, file_info: dict):
+        # Drive の md5Checksum に相当するハッシュ（前回から変わったファイルのみ計算される）
+        file_info['md5Checksum'] = file_md5(file_info['id'])
+
+    def open(self, file_info: dict) -> bytes:
+        with open(file_info['id'], "rb") as f:
+            return f.read()
+
+
+def _fetch_one(source: DataSource, key: str, info: dict) -> Optional[bytes]:
+    try:
+        with trace.span(f"download:{key}"):
+            content = source.open(info)
+            trace.count("download.files")
+            trace.count("download.bytes", len(content))
+        return content
+    except Exception as e:
+        print(f"    ダウンロードエラー ({key}): {e}")
+        return None
+
+
+def fetch_futures(source: DataSource, files: Dict[str, dict], executor: Executor) -> Dict[str, Future]:
+    """見つかったファイルのダウンロードを executor に投入し、{キー: Future} を返す
+
+    Future の結果はファイルの内容（失敗したら None）。届いたものから順に整形を始めるために使う。
+    """
+    return {key: executor.submit(_fetch_one, source, key, info) for key, info in files.items() if info}
+
+
+def fetch_all(source: DataSource, files: Dict[str, dict], max_workers: int = 6) -> Dict[str, bytes]:
+    """見つかったファイルをスレッドプールで並列取得（失敗したキーは含めない）"""
+    count = sum(1 for info in files.values() if info)
+    if not count:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, count))) as pool:
+        results = {key: future.result() for key, future in fetch_futures(source, files, pool).items()}
+    return {k: v for k, v in results.items() if v is not None}
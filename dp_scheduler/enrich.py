@@ -0,0 +1,130 @@
+"""log へのマスタ情報付与（LogFrom.gs の enrichLogSheetFromMasters と同じ結果を列単位で求める）
+
+log の基本情報（A～H列）に formulation.csv と machine.csv を品番で結合し、
+requiredmaterials = cell × 素地量、batchsize = cell × 仕込み量 を計算して
+log.csv と同じ 18 列にする。マスタに無い品番の行は I 列以降を空欄にする。
+- enrich_log(df_log, df_formulation, df_machine): 付与後の log
+- changes_payload(before, after): 付与前後で変わったセルだけの書込内容（log シートへの反映用）
+"""
+import os
+import json
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from dp_scheduler.ingest import read_csv_flexible
+from dp_scheduler.sheet_sync import diff_grid
+
+LOG_HEADERS = [
+    'Account', 'code', 'productname', 'cell', 'day', 'ID', 'Timestamp', 'CellPosition',
+    'Recipe', 'BulkRecipe', 'purelevel', 'preparation', 'batchsize/1', 'product/1',
+    'bulk', 'requiredmaterials', 'batchsize', 'line',
+]
+BASE_HEADERS = LOG_HEADERS[:8]  # A～H列（log シートに入力されている列）
+# log の列 ← formulation.csv の列
+FORMULATION_COLUMNS = {
+    'Recipe': '素地',
+    'BulkRecipe': 'バルク',
+    'purelevel': '製品石けん分',
+    'preparation': '素地石けん分',
+    'batchsize/1': '素地量',
+    'product/1': '仕込み量',
+    'bulk': 'バルク液量／個(kg)',
+}
+CODE_COLUMN = '品番'
+LINE_COLUMN = 'ライン名'
+
+
+def read_text_csv(path: str) -> pd.DataFrame:
+    """値を文字列のまま読む（シートに書かれた表記を変えないため。空欄は ""）"""
+    df = read_csv_flexible(path, label=os.path.basename(path), dtype=str, keep_default_na=False)
+    df.columns = [str(c).strip() for c in df.columns]
+    return df
+
+
+def _require(df: pd.DataFrame, columns: List[str], name: str):
+    for col in columns:
+        if col not in df.columns:
+            raise ValueError(f"{name} に '{col}' 列がありません。")
+
+
+def _text(s: pd.Series) -> pd.Series:
+    return s.fillna("").astype(str).str.strip()
+
+
+def _master_by_code(df: pd.DataFrame) -> pd.DataFrame:
+    """品番をキーにした表（空の品番は除き、重複は後の行を使う）"""
+    codes = _text(df[CODE_COLUMN])
+    out = df[codes != ""].set_axis(codes[codes != ""], axis=0)
+    return out[~out.index.duplicated(keep="last")]
+
+
+def _number(s: pd.Series) -> pd.Series:
+    """Number(v || 0) と同じ数値化（空欄は 0、数値にならない値は NaN）"""
+    text = _text(s)
+    return pd.to_numeric(text.mask(text == "", "0"), errors="coerce")
+
+
+def _cells(values: np.ndarray) -> np.ndarray:
+    """計算結果を書込用の値にする（整数値は int、NaN は空欄）"""
+    out = values.astype(object)
+    finite = np.isfinite(values)
+    integral = finite & (np.mod(values, 1, where=finite, out=np.ones_like(values)) == 0)
+    out[integral] = values[integral].astype(np.int64).tolist()
+    out[~finite] = ""
+    return out
+
+
+def enrich_log(df_log: pd.DataFrame, df_formulation: pd.DataFrame, df_machine: pd.DataFrame) -> pd.DataFrame:
+    """log（A～H列）にマスタ情報を付与した 18 列の表"""
+    _require(df_formulation, [CODE_COLUMN] + list(FORMULATION_COLUMNS.values()), "formulation.csv")
+    _require(df_machine, [CODE_COLUMN, LINE_COLUMN], "machine.csv")
+
+    log = df_log.copy()
+    log.columns = [str(c).strip() for c in log.columns]
+    # 全列が空の行は読まない（readSheetAsObjects_ と同じ）
+    filled = log.apply(lambda col: _text(col) != "").any(axis=1) if len(log.columns) else pd.Series(dtype=bool)
+    log = log[filled].reset_index(drop=True)
+
+    out = pd.DataFrame(index=log.index)
+    for col in BASE_HEADERS:
+        out[col] = log[col].fillna("").to_numpy(dtype=object) if col in log.columns else ""
+
+    codes = _text(out['code'])
+    master = _master_by_code(df_formulation)
+    hit = codes.isin(master.index).to_numpy()
+    formulation = master.reindex(codes.to_numpy())
+
+    for col, src in FORMULATION_COLUMNS.items():
+        values = formulation[src].fillna("").to_numpy(dtype=object)
+        out[col] = np.where(hit, values, "")
+
+    cell = _number(out['cell']).to_numpy(dtype=float)
+    batch1 = _number(formulation['素地量']).to_numpy(dtype=float)
+    product1 = _number(formulation['仕込み量']).to_numpy(dtype=float)
+    out['requiredmaterials'] = np.where(hit, _cells(cell * batch1), "")
+    out['batchsize'] = np.where(hit, _cells(cell * product1), "")
+
+    lines = _master_by_code(df_machine)[LINE_COLUMN].fillna("")
+    out['line'] = codes.map(lines).fillna("").to_numpy(dtype=object)
+    return out[LOG_HEADERS]
+
+
+def _grid(df: pd.DataFrame) -> List[list]:
+    return [list(df.columns)] + df.fillna("").values.tolist()
+
+
+def changes_payload(before: pd.DataFrame, after: pd.DataFrame) -> List[dict]:
+    """log シート（1行目がヘッダー）に書き込む、変わったセルだけの {"range", "values"} の一覧"""
+    old = before.reindex(columns=LOG_HEADERS)
+    old.columns = LOG_HEADERS
+    return diff_grid(_grid(old), _grid(after), len(LOG_HEADERS), first_row=1)
+
+
+def write_changes(path: str, changes: List[dict], sheet: str = "log"):
+    """changes_payload の結果を JSON で保存（LogFrom.gs の applyLogChangesFromPython で反映）"""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"sheet": sheet, "updates": changes}, f, ensure_ascii=False, default=str)
+    os.replace(tmp, path)
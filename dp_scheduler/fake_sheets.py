@@ -0,0 +1,230 @@
+"""オフライン確認用の Sheets 代替（gspread の Spreadsheet / Worksheet の一部を模倣）
+
+1.py で使う呼び出し（worksheet / duplicate_sheet / get / batch_update など）だけを実装し、
+内容はメモリ上（path 指定時は JSON ファイル）に保持する。
+fail_next() で 429/503 などの API エラーを発生させ、リトライ処理を確認できる。
+"""
+import os
+import re
+import json
+import threading
+from typing import Dict, List, Optional
+
+MAX_BODY_BYTES = 10 * 1024 * 1024  # これを超える batchUpdate 本文は 413 を返す
+
+
+class WorksheetNotFound(Exception):
+    pass
+
+
+class _FakeResponse:
+    def __init__(self, status_code: int, headers: Optional[dict] = None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeAPIError(Exception):
+    """gspread.exceptions.APIError と同じく .response にステータスを持つ"""
+
+    def __init__(self, status_code: int, retry_after: Optional[float] = None):
+        headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+        self.response = _FakeResponse(status_code, headers)
+        super().__init__(f"APIError: [{status_code}]")
+
+
+def _parse_a1(cell: str):
+    m = re.match(r'^([A-Z]+)(\d+)$', cell)
+    col = 0
+    for ch in m.group(1):
+        col = col * 26 + (ord(ch) - 64)
+    return int(m.group(2)), col
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet: "FakeSpreadsheet", sheet_id: int, title: str, rows: int = 1000, cols: int = 26):
+        self.spreadsheet = spreadsheet
+        self.id = sheet_id
+        self.title = title
+        self.row_count = rows
+        self.col_count = cols
+        self.cells: Dict[tuple, object] = {}
+        self.merges: List[tuple] = []  # (開始行, 終了行, 開始列, 終了列) 0始まり・終端含まず
+
+    @property
+    def index(self) -> int:
+        return self.spreadsheet._sheets.index(self)
+
+    def get(self, range_name: str, value_render_option=None) -> List[list]:
+        self.spreadsheet._request("read")
+        start, end = range_name.split(":")
+        r0, c0 = _parse_a1(start)
+        r1, c1 = _parse_a1(end)
+        rows = [[self.cells.get((r, c), "") for c in range(c0, c1 + 1)] for r in range(r0, min(r1, self.row_count) + 1)]
+        # Sheets API と同じく末尾の空行・空セルは返さない
+        rows = [list(r) for r in rows]
+        for r in rows:
+            while r and r[-1] == "":
+                r.pop()
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    def add_rows(self, rows: int):
+        self.spreadsheet._request("write")
+        self.row_count += rows
+
+    def batch_update(self, data: List[dict], value_input_option=None):
+        self.spreadsheet._request("write", data)
+        for d in data:
+            start, end = d["range"].split(":")
+            r0, c0 = _parse_a1(start)
+            for i, row in enumerate(d["values"]):
+                for j, v in enumerate(row):
+                    if r0 + i > self.row_count:
+                        raise FakeAPIError(400)
+                    if v is None:
+                        continue  # Sheets API と同じく null のセルは書き換えない
+                    self.cells[(r0 + i, c0 + j)] = v
+
+    def add_cols(self, cols: int):
+        self.spreadsheet._request("write")
+        self.col_count += cols
+
+    def clear_basic_filter(self):
+        self.spreadsheet._request("write")
+
+    def update_index(self, index: int):
+        self.spreadsheet._request("write")
+        self.spreadsheet._move(self, index)
+
+    def cell_values(self, first_row: int = 1) -> List[list]:
+        """確認用: first_row 以降の値を2次元リストで返す"""
+        last = max([r for r, _ in self.cells] + [first_row - 1])
+        return [[self.cells.get((r, c), "") for c in range(1, self.col_count + 1)]
+                for r in range(first_row, last + 1)]
+
+
+class FakeSpreadsheet:
+    """gspread.Spreadsheet の代替。calls に API 呼び出し回数を記録する"""
+
+    def __init__(self, path: Optional[str] = None, template_cols: int = 26):
+        self.path = path
+        self._sheets: List[FakeWorksheet] = []
+        self._next_id = 1
+        self._failures: List[FakeAPIError] = []
+        self._lock = threading.Lock()
+        self.calls = {"read": 0, "write": 0, "batch_update": 0}
+        if path and os.path.exists(path):
+            self._load(path)
+        if not self._sheets:
+            self.add_worksheet("format", rows=1000, cols=template_cols)
+            self.calls = {"read": 0, "write": 0, "batch_update": 0}
+
+    # --- エラー注入・記録 ---
+    def fail_next(self, status_code: int, retry_after: Optional[float] = None, times: int = 1):
+        """次の times 回の呼び出しを status_code のエラーにする"""
+        with self._lock:
+            self._failures.extend(FakeAPIError(status_code, retry_after) for _ in range(times))
+
+    def _request(self, kind: str, body=None):
+        with self._lock:
+            self.calls[kind] += 1
+            if self._failures:
+                raise self._failures.pop(0)
+        if body is not None and len(json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")) > MAX_BODY_BYTES:
+            raise FakeAPIError(413)
+
+    # --- gspread 互換 ---
+    def worksheets(self) -> List[FakeWorksheet]:
+        self._request("read")
+        return list(self._sheets)
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        self._request("read")
+        for ws in self._sheets:
+            if ws.title == title:
+                return ws
+        raise WorksheetNotFound(title)
+
+    def _get_by_id(self, sheet_id: int) -> FakeWorksheet:
+        for ws in self._sheets:
+            if ws.id == sheet_id:
+                return ws
+        raise FakeAPIError(400)
+
+    def add_worksheet(self, title: str, rows: int = 1000, cols: int = 26) -> FakeWorksheet:
+        self._request("write")
+        with self._lock:
+            ws = FakeWorksheet(self, self._next_id, title, rows, cols)
+            self._next_id += 1
+            self._sheets.append(ws)
+        return ws
+
+    def duplicate_sheet(self, source_sheet_id: int, new_sheet_name: str, insert_sheet_index: int = None) -> FakeWorksheet:
+        self._request("write")
+        src = self._get_by_id(source_sheet_id)
+        with self._lock:
+            ws = FakeWorksheet(self, self._next_id, new_sheet_name, src.row_count, src.col_count)
+            self._next_id += 1
+            ws.cells = dict(src.cells)
+            ws.merges = list(src.merges)
+            self._sheets.insert(len(self._sheets) if insert_sheet_index is None else insert_sheet_index, ws)
+        return ws
+
+    def batch_update(self, body: dict) -> dict:
+        self._request("write", body)
+        self.calls["batch_update"] += 1
+        for req in body["requests"]:
+            if "mergeCells" in req:
+                rng = req["mergeCells"]["range"]
+                ws = self._get_by_id(rng["sheetId"])
+                r0, r1, c0, c1 = rng["startRowIndex"], rng["endRowIndex"], rng["startColumnIndex"], rng["endColumnIndex"]
+                if req["mergeCells"].get("mergeType") == "MERGE_COLUMNS":
+                    ws.merges.extend((r0, r1, c, c + 1) for c in range(c0, c1))
+                else:
+                    ws.merges.append((r0, r1, c0, c1))
+            elif "unmergeCells" in req:
+                rng = req["unmergeCells"]["range"]
+                ws = self._get_by_id(rng["sheetId"])
+                r0, r1, c0, c1 = rng["startRowIndex"], rng["endRowIndex"], rng["startColumnIndex"], rng["endColumnIndex"]
+                ws.merges = [m for m in ws.merges
+                             if m[1] <= r0 or m[0] >= r1 or m[3] <= c0 or m[2] >= c1]
+            elif "updateSheetProperties" in req:
+                props = req["updateSheetProperties"]["properties"]
+                ws = self._get_by_id(props["sheetId"])
+                if "index" in props:
+                    self._move(ws, props["index"])
+                if "title" in props:
+                    ws.title = props["title"]
+            else:
+                raise FakeAPIError(400)
+        return {"replies": [{} for _ in body["requests"]]}
+
+    def _move(self, ws: FakeWorksheet, index: int):
+        with self._lock:
+            self._sheets.remove(ws)
+            self._sheets.insert(index, ws)
+
+    # --- 保存 ---
+    def save(self):
+        if not self.path:
+            return
+        data = {"next_id": self._next_id, "sheets": [{
+            "id": ws.id, "title": ws.title, "rows": ws.row_count, "cols": ws.col_count,
+            "cells": [[r, c, v] for (r, c), v in ws.cells.items()],
+            "merges": ws.merges,
+        } for ws in self._sheets]}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+        os.replace(tmp, self.path)
+
+    def _load(self, path: str):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        self._next_id = data["next_id"]
+        for s in data["sheets"]:
+            ws = FakeWorksheet(self, s["id"], s["title"], s["rows"], s["cols"])
+            ws.cells = {(r, c): v for r, c, v in s["cells"]}
+            ws.merges = [tuple(m) for m in s["merges"]]
+            self._sheets.append(ws)
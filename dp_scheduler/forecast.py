@@ -0,0 +1,66 @@
+"""需要予測データの正規化（全月列をまとめて数値化し、複数ファイルを合算）"""
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+NUMBER_PATTERN = r'\d+(?:\.\d+)?'
+
+
+def extract_last_numbers(frame: pd.DataFrame) -> pd.DataFrame:
+    """各セルの文字列から最後の数値を取り出す（全列を1回の文字列処理で行う）
+
+    "計 1,234" → 1234.0 のように、カンマを除いて最後に現れる数値を返す。
+    数値型の列は文字列化した場合と同じ結果（符号なし）になるよう絶対値を取る。
+    """
+    out = pd.DataFrame(index=frame.index)
+    text_cols = []
+    for c in frame.columns:
+        if pd.api.types.is_numeric_dtype(frame[c]) and not pd.api.types.is_bool_dtype(frame[c]):
+            out[c] = frame[c].abs().astype(float)
+        else:
+            text_cols.append(c)
+
+    if text_cols:
+        # 文字列列を縦に並べて一括で抽出し、元の形に戻す
+        n = len(frame)
+        flat = pd.Series(frame[text_cols].to_numpy(dtype=object).ravel(order="F"))
+        mask = flat.notna()
+        values = np.full(len(flat), np.nan)
+        if mask.any():
+            last = (flat[mask].astype(str)
+                    .str.replace(',', '', regex=False)
+                    .str.findall(NUMBER_PATTERN)
+                    .str[-1])
+            values[mask.to_numpy()] = pd.to_numeric(last, errors='coerce').to_numpy(dtype=float)
+        for i, c in enumerate(text_cols):
+            out[c] = values[i * n:(i + 1) * n]
+
+    return out[list(frame.columns)]
+
+
+def normalize_forecast(df: pd.DataFrame, months: List[str]) -> pd.DataFrame:
+    """需要予測1ファイル分を 品番 + 各月の数値 に整形"""
+    df_out = pd.DataFrame({"品番": df["品番"].astype(str).str.strip()})
+    months = [m for m in months if m in df.columns]
+    if months:
+        df_out[months] = extract_last_numbers(df[months])
+    return df_out
+
+
+def combine_forecasts(frames: List[pd.DataFrame], window_labels: List[str]) -> pd.DataFrame:
+    """N個の需要予測を品番ごとに合算（対象月が無いファイルは0扱い）"""
+    labels = list(window_labels)
+    parts = []
+    for df in frames:
+        if df is None or df.empty:
+            continue
+        part = df.reindex(columns=["品番"] + labels)
+        parts.append(part)
+
+    if not parts:
+        return pd.DataFrame({c: pd.Series(dtype=float if c != "品番" else object) for c in ["品番"] + labels})
+
+    combined = pd.concat(parts, ignore_index=True)
+    combined[labels] = combined[labels].astype(float)
+    return combined.groupby("品番", as_index=False, sort=True)[labels].sum()
@@ -0,0 +1,164 @@
+"""run_scheduler の差分再計算（前回の統合結果を素地単位で再利用する）
+
+log.csv の ID / Timestamp をキーに、統合対象の行を素地ごとの署名（行の並びと内容のハッシュ）に
+まとめて前回と比べる。署名が変わった素地（行の追加・変更・削除、期限やマスタの変化を含む）だけを
+統合し直し、それ以外は前回のバッチをそのまま使う。結果は全件計算と同じになる。
+"""
+import os
+import json
+import hashlib
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+STATE_VERSION = 2
+ID_COLUMN = "ID"
+
+# このプロセスで保存した状態（状態フォルダ → (meta.json の更新時刻, 設定, 状態)）
+# watch モードなどで続けて計画するときは pickle を読み直さない
+_memory: Dict[str, Tuple[int, dict, dict]] = {}
+
+# 統合結果に影響する列（この値が変わった行の素地を再計算する）
+FINGERPRINT_COLUMNS = [
+    'ID', 'Timestamp', 'Recipe', '充填日', '必要素地量', '釜最大容量', 'L/T',
+    '標準仕込希望日', '最終仕込デッドライン', 'code', 'productname', 'cell',
+]
+
+
+def row_fingerprints(df: pd.DataFrame) -> np.ndarray:
+    """行ごとのハッシュ（uint64）"""
+    cols = [c for c in FINGERPRINT_COLUMNS if c in df.columns]
+    part = df[cols].copy()
+    for c in cols:
+        if part[c].dtype == object:
+            part[c] = part[c].astype(str)
+    return pd.util.hash_pandas_object(part, index=False).to_numpy()
+
+
+def recipe_signatures(df_schedulable: pd.DataFrame, fps: np.ndarray) -> Dict[str, str]:
+    """素地ごとの署名（統合順に並んだ行ハッシュの列）"""
+    sigs = {}
+    codes, recipes = pd.factorize(df_schedulable['Recipe'])
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(recipes) + 1))
+    for k, recipe in enumerate(recipes):
+        rows = fps[order[bounds[k]:bounds[k + 1]]]
+        sigs[str(recipe)] = hashlib.sha1(rows.tobytes()).hexdigest()
+    return sigs
+
+
+class RescheduleState:
+    """前回の統合結果・署名・行ハッシュを保存する（settings が変われば使わない）"""
+
+    def __init__(self, state_dir: str, settings: dict):
+        self.dir = state_dir
+        self.settings = {"version": STATE_VERSION, **{k: str(v) for k, v in settings.items()}}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    def _meta_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self._path("meta.json")).st_mtime_ns
+        except OSError:
+            return None
+
+    def load(self) -> Optional[dict]:
+        cached = _memory.get(self.dir)
+        if cached and cached[0] == self._meta_mtime() and cached[1] == self.settings:
+            return cached[2]
+        try:
+            with open(self._path("meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("settings") != self.settings:
+                print("  ℹ️ 設定が前回と異なるため全件を再計算します")
+                return None
+            return {
+                "signatures": meta["signatures"],
+                "batches": pd.read_pickle(self._path("batches.pkl")),
+                "rows": pd.read_pickle(self._path("rows.pkl")),
+            }
+        except (OSError, ValueError, KeyError):
+            return None
+        except Exception as e:
+            print(f"  ℹ️ 前回の状態を読めないため全件を再計算します: {e}")
+            return None
+
+    def save(self, batches: pd.DataFrame, signatures: Dict[str, str], rows: pd.DataFrame):
+        os.makedirs(self.dir, exist_ok=True)
+        # メタ情報は最後に置き換え、途中で止まっても古い組み合わせを読まないようにする
+        meta_path = self._path("meta.json")
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        for name, df in [("batches.pkl", batches), ("rows.pkl", rows)]:
+            tmp = self._path(name + ".tmp")
+            df.to_pickle(tmp)
+            os.replace(tmp, self._path(name))
+        tmp = meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"settings": self.settings, "signatures": signatures}, f, ensure_ascii=False)
+        os.replace(tmp, meta_path)
+        _memory[self.dir] = (self._meta_mtime(), self.settings,
+                             {"signatures": signatures, "batches": batches, "rows": rows})
+
+
+def _row_changes(prev_rows: Optional[pd.DataFrame], ids: pd.Series, fps: np.ndarray) -> Tuple[int, int, int]:
+    """前回からの 追加・変更・削除 行数（ID 単位）"""
+    if prev_rows is None:
+        return len(ids), 0, 0
+    cur = pd.Series(fps, index=ids.astype(str).to_numpy())
+    cur = cur[~cur.index.duplicated()]
+    prev = prev_rows.set_index("ID")["fp"]
+    prev = prev[~prev.index.duplicated()]
+    common = cur.index.intersection(prev.index)
+    added = len(cur.index.difference(prev.index))
+    removed = len(prev.index.difference(cur.index))
+    changed = int((cur[common] != prev[common]).sum())
+    return added, changed, removed
+
+
+def consolidate_incremental(
+    df_schedulable: pd.DataFrame,
+    consolidate_fn: Callable[..., pd.DataFrame],
+    state: RescheduleState,
+) -> pd.DataFrame:
+    """署名が変わった素地だけ consolidate_fn で統合し、残りは前回のバッチを使う
+
+    df_schedulable は全件計算と同じ並び（期限・希望日・素地の順）で、ID 列を含むこと。
+    consolidate_fn は infer_types=False で型推定前（object）の表を返すこと。前回分もその形で保存し、
+    連結後に1回だけ型推定して全件計算と同じ列の型にする。
+    """
+    fps = row_fingerprints(df_schedulable)
+    sigs = recipe_signatures(df_schedulable, fps)
+    prev = state.load()
+
+    prev_sigs = prev["signatures"] if prev else {}
+    affected = [r for r, s in sigs.items() if prev_sigs.get(r) != s]
+    added, changed, removed = _row_changes(prev["rows"] if prev else None, df_schedulable[ID_COLUMN], fps)
+    print(f"  差分: 追加 {added:,}行 / 変更 {changed:,}行 / 削除 {removed:,}行 → "
+          f"再統合 {len(affected):,}/{len(sigs):,}素地")
+
+    keys = df_schedulable['Recipe'].astype(str)
+    if affected:
+        fresh = consolidate_fn(df_schedulable[keys.isin(affected).to_numpy()], infer_types=False)
+    else:
+        fresh = pd.DataFrame(columns=prev["batches"].columns)
+
+    # 全件計算と同じ素地の順（統合対象に最初に現れた順）でバッチをつなぐ
+    blocks = {}
+    if prev:
+        reused = prev["batches"]
+        for r, g in reused[~reused['Recipe'].astype(str).isin(affected)].groupby(reused['Recipe'].astype(str), sort=False):
+            blocks[r] = g
+    for r, g in fresh.groupby(fresh['Recipe'].astype(str), sort=False):
+        blocks[r] = g
+    ordered = [blocks[r] for r in pd.unique(keys) if r in blocks]
+    raw = pd.concat(ordered, ignore_index=True) if ordered else fresh.iloc[0:0]
+
+    state.save(
+        raw,
+        sigs,
+        pd.DataFrame({"ID": df_schedulable[ID_COLUMN].astype(str).to_numpy(), "fp": fps}),
+    )
+    return raw.infer_objects()
@@ -0,0 +1,163 @@
+"""CSV読込（エンコーディング・区切り文字を先頭バイトから判定して読む。先頭が ASCII だけなら読込後に確かめる）"""
+import io
+import os
+import time
+import codecs
+import importlib.util
+from typing import Callable, Optional, Tuple, Union
+
+import pandas as pd
+
+SNIFF_BYTES = 64 * 1024  # 判定に使う先頭バイト数
+
+# pyarrow エンジンが受け付けない read_csv の引数
+_PYARROW_UNSUPPORTED = {
+    "chunksize", "iterator", "nrows", "skipfooter", "comment", "thousands", "converters",
+    "low_memory", "memory_map", "on_bad_lines", "quoting", "lineterminator", "dialect",
+    "float_precision", "skipinitialspace", "dayfirst", "delim_whitespace",
+}
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+def detect_encoding(data: bytes) -> Optional[str]:
+    """バイト列からエンコーディングを判定（ASCII だけでは utf-8 / cp932 を区別できないため None）"""
+    if data.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if data.isascii():
+        return None
+    try:
+        # 途中で切れたマルチバイト文字は無視できるよう final=False で判定
+        codecs.getincrementaldecoder("utf-8")().decode(data, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp932"
+
+
+def sniff_csv(prefix: bytes) -> Tuple[str, str]:
+    """先頭バイトからエンコーディングと区切り文字を判定（ASCII だけなら utf-8 とみなす）"""
+    encoding = detect_encoding(prefix) or "utf-8"
+    text = prefix.decode(encoding, errors="replace")
+    header = text.splitlines()[0] if text else ""
+    sep = "\t" if ("," not in header and "\t" in header) else ","
+    return encoding, sep
+
+
+def _read_prefix(src) -> bytes:
+    if isinstance(src, bytes):
+        return src[:SNIFF_BYTES]
+    if isinstance(src, (str, os.PathLike)):
+        with open(src, "rb") as f:
+            return f.read(SNIFF_BYTES)
+    pos = src.tell()
+    prefix = src.read(SNIFF_BYTES)
+    src.seek(pos)
+    return prefix if isinstance(prefix, bytes) else prefix.encode("utf-8")
+
+
+def _scan_encoding(src, block_size: int = 1 << 20) -> str:
+    """ASCII 以外の文字が現れるところまで読み進めてエンコーディングを判定（最後まで ASCII なら utf-8）"""
+    if isinstance(src, bytes):
+        src = io.BytesIO(src)
+    f = open(src, "rb") if isinstance(src, (str, os.PathLike)) else src
+    pos = f.tell()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        for block in iter(lambda: f.read(block_size), b""):
+            if block.isascii():
+                continue
+            try:
+                decoder.decode(block, final=False)
+                return "utf-8"
+            except UnicodeDecodeError:
+                return "cp932"
+        return "utf-8"
+    finally:
+        if f is src:
+            f.seek(pos)
+        else:
+            f.close()
+
+
+def sniff_source(src: Union[str, os.PathLike, io.IOBase, bytes]) -> Tuple[str, str]:
+    """分割読込用の判定（先頭が ASCII だけなら、ASCII 以外が現れるところまで読んで決める）
+
+    分割読込では読み始めた後にエンコーディングを変えられないため、読む前に確定させる。
+    """
+    prefix = _read_prefix(src)
+    encoding, sep = sniff_csv(prefix)
+    if len(prefix) == SNIFF_BYTES and detect_encoding(prefix) is None:
+        encoding = _scan_encoding(src)
+    return encoding, sep
+
+
+def _has_undecoded(df: pd.DataFrame) -> bool:
+    """utf-8 として読めなかった値があるか（pyarrow エンジンは bytes のまま返す）"""
+    if any(isinstance(c, bytes) for c in df.columns):
+        return True
+    return any(df[c].map(lambda v: isinstance(v, bytes)).any()
+               for c in df.columns[df.dtypes == object])
+
+
+def _read_csv(src, engine: str, kwargs: dict) -> Tuple[pd.DataFrame, str]:
+    """read_csv を実行（pyarrow で読めなければ従来エンジンで読む）。(DataFrame, 使ったエンジン) を返す"""
+    if hasattr(src, "seek"):
+        src.seek(0)
+    try:
+        return pd.read_csv(src, engine=engine, **kwargs), engine
+    except UnicodeDecodeError:
+        raise
+    except Exception as e:
+        if engine != "pyarrow":
+            raise Exception(f"読込失敗: ({e})")
+    # 行ごとの列数が揃っていない等、pyarrow で読めないCSVは従来エンジンで読む
+    return _read_csv(src, "c", kwargs)
+
+
+def read_csv_flexible(src: Union[str, os.PathLike, io.IOBase, bytes], label: str = "",
+                      log: Optional[Callable[[str], None]] = None, **kwargs) -> pd.DataFrame:
+    """エンコーディング・区切り文字を判定してCSVを1回で読み込む
+
+    src はパス・ファイルオブジェクト・bytes のいずれか。判定結果と所要時間は
+    df.attrs["csv_dialect"] に残す（log を渡したときだけ1行で知らせる。既定は表示しない）。
+    encoding / sep を明示した場合はその値を使う。
+    """
+    if isinstance(src, bytes):
+        src = io.BytesIO(src)
+    elif hasattr(src, "seek"):
+        src.seek(0)
+
+    t0 = time.time()
+    prefix = _read_prefix(src)
+    encoding, sep = sniff_csv(prefix)
+    # 先頭が ASCII だけなら utf-8 で読み、読めない値があれば cp932 で読み直す
+    undecided = "encoding" not in kwargs and len(prefix) == SNIFF_BYTES and detect_encoding(prefix) is None
+    kwargs.setdefault("encoding", encoding)
+    kwargs.setdefault("sep", kwargs.pop("delimiter", sep))
+
+    engine = kwargs.pop("engine", None)
+    if engine is None:
+        engine = "pyarrow" if HAS_PYARROW and not (_PYARROW_UNSUPPORTED & kwargs.keys()) else "c"
+
+    try:
+        df, engine = _read_csv(src, engine, kwargs)
+        retry = undecided and _has_undecoded(df)
+    except UnicodeDecodeError as e:
+        if not undecided:
+            raise Exception(f"読込失敗: ({e})")
+        retry = True
+    if retry:
+        kwargs["encoding"] = "cp932"
+        try:
+            df, engine = _read_csv(src, engine, kwargs)
+        except UnicodeDecodeError as e:
+            raise Exception(f"読込失敗: ({e})")
+
+    elapsed = time.time() - t0
+    df.attrs["csv_dialect"] = {
+        "encoding": kwargs["encoding"], "sep": kwargs["sep"], "engine": engine, "seconds": round(elapsed, 3)
+    }
+    if log is not None:
+        name = label or (os.path.basename(src) if isinstance(src, (str, os.PathLike)) else "CSV")
+        log(f"    読込: {name} (encoding={kwargs['encoding']}, sep={kwargs['sep']!r}, "
+            f"engine={engine}, {len(df):,}行, {elapsed:.2f}秒)")
+    return df
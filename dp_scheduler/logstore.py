@@ -0,0 +1,214 @@
+"""log 履歴の月別 Parquet ストア（計画期間の月だけを読む）
+
+root/month=YYYY-MM/data.parquet に月ごとの行を保存する。day を日付にした _day 列を持ち、
+read(start, end) は期間外の月のファイルを開かず、月内も _day の条件で行グループを絞って読む。
+
+- sync(df_log): log.csv の内容を反映する。archived_through より後の月は log.csv と同じ内容にし
+  （削除された行も消える）、それ以前の月は ID で上書き・追加のみ行う（退避済みの行は残す）。
+- append(df): Archive.gs で退避した行などを ID で上書き・追加する。
+log.csv 由来の行は log.csv の行順、追加分はその前に追加順で返す。
+"""
+import os
+import json
+import shutil
+import importlib.util
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+STORE_VERSION = 1
+DAY_COLUMN = "day"
+ID_COLUMN = "ID"
+NO_MONTH = "none"  # day が日付にならない行
+_INTERNAL = ["_day", "_tier", "_seq"]  # _tier: 0=追加分 1=log.csv 由来、_seq: 並び順
+
+
+def _month_of(days: pd.Series) -> np.ndarray:
+    return np.where(days.isna(), NO_MONTH, days.dt.strftime("%Y-%m"))
+
+
+class LogStore:
+    """月別 Parquet による log 履歴（pyarrow が無い環境では enabled=False）"""
+
+    def __init__(self, root: str, archived_through: Optional[str] = None,
+                 day_col: str = DAY_COLUMN, id_col: str = ID_COLUMN):
+        self.root = root
+        self.day_col = day_col
+        self.id_col = id_col
+        self.enabled = importlib.util.find_spec("pyarrow") is not None
+        if not self.enabled:
+            print("    ℹ️ pyarrow が無いため、log ストアは使いません")
+            return
+        os.makedirs(root, exist_ok=True)
+        self.meta = self._load_meta()
+        if archived_through is not None and archived_through != self.meta.get("archived_through"):
+            self.archive_through(archived_through)
+
+    # --- メタ情報 ---
+    def _meta_path(self) -> str:
+        return os.path.join(self.root, "meta.json")
+
+    def _load_meta(self) -> dict:
+        try:
+            with open(self._meta_path(), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") == STORE_VERSION:
+                return meta
+        except (OSError, ValueError):
+            pass
+        return {"version": STORE_VERSION, "archived_through": None, "months": {},
+                "columns": [], "source": None, "next_seq": 0}
+
+    def _save_meta(self):
+        tmp = self._meta_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(tmp, self._meta_path())
+
+    # --- 月ファイル ---
+    def _month_path(self, month: str) -> str:
+        return os.path.join(self.root, f"month={month}", "data.parquet")
+
+    def months(self) -> List[str]:
+        return sorted(self.meta["months"])
+
+    def _read_month(self, month: str, filters=None) -> Optional[pd.DataFrame]:
+        path = self._month_path(month)
+        if not os.path.exists(path):
+            return None
+        return pd.read_parquet(path, filters=filters)
+
+    def _write_month(self, month: str, df: pd.DataFrame):
+        path = self._month_path(month)
+        if df.empty:
+            shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+            self.meta["months"].pop(month, None)
+            return
+        digest = str(int(pd.util.hash_pandas_object(df.astype(str), index=False).sum()))
+        if self.meta["months"].get(month) == digest and os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        df.reset_index(drop=True).to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        self.meta["months"][month] = digest
+
+    def _prepare(self, df: pd.DataFrame, tier: int, seq: np.ndarray) -> pd.DataFrame:
+        out = df.reset_index(drop=True).copy()
+        out["_day"] = pd.to_datetime(out[self.day_col], errors="coerce")
+        out["_tier"] = tier
+        out["_seq"] = seq
+        return out
+
+    def _upsert(self, month: str, rows: pd.DataFrame):
+        current = self._read_month(month)
+        if current is not None and self.id_col in rows.columns and self.id_col in current.columns:
+            ids = rows[self.id_col].dropna().astype(str)
+            current = current[~current[self.id_col].astype(str).isin(ids)]
+        merged = rows if current is None or current.empty else pd.concat([current, rows], ignore_index=True)
+        self._write_month(month, merged.sort_values(["_tier", "_seq"], kind="stable"))
+
+    def _is_archived(self, month: str) -> bool:
+        cutoff = self.meta.get("archived_through")
+        return cutoff is not None and month != NO_MONTH and month <= cutoff
+
+    def _remember_columns(self, df: pd.DataFrame):
+        cols = list(self.meta["columns"])
+        cols += [c for c in df.columns if c not in cols and c not in _INTERNAL]
+        self.meta["columns"] = cols
+
+    # --- 書込 ---
+    def append(self, df: pd.DataFrame) -> int:
+        """行を ID で上書き・追加する（退避済みの履歴の取り込み用）。書き込んだ行数を返す"""
+        if not self.enabled or df.empty:
+            return 0
+        start = self.meta["next_seq"]
+        rows = self._prepare(df, 0, np.arange(start, start + len(df)))
+        self.meta["next_seq"] = start + len(df)
+        months = _month_of(rows["_day"])
+        for month in pd.unique(months):
+            self._upsert(month, rows[months == month])
+        self._remember_columns(df)
+        self._save_meta()
+        return len(rows)
+
+    def sync(self, df_log: pd.DataFrame) -> Dict[str, int]:
+        """log.csv の内容を反映する。{"months": 書き換えた月数, "rows": 行数} を返す"""
+        rows = self._prepare(df_log, 1, np.arange(len(df_log)))
+        months = _month_of(rows["_day"])
+        before = dict(self.meta["months"])
+        present = set(pd.unique(months))
+        for month in present:
+            part = rows[months == month]
+            if self._is_archived(month):
+                self._upsert(month, part)
+            else:
+                self._write_month(month, part)
+        # log.csv から消えた月（退避済みでないもの）は削除
+        for month in list(self.meta["months"]):
+            if month not in present and not self._is_archived(month):
+                self._write_month(month, rows.iloc[0:0])
+        self._remember_columns(df_log)
+        self._save_meta()
+        changed = sum(1 for m in set(before) | set(self.meta["months"])
+                      if before.get(m) != self.meta["months"].get(m))
+        return {"months": changed, "rows": len(rows)}
+
+    def sync_file(self, path: str, reader: Callable[[str], pd.DataFrame]) -> bool:
+        """log.csv が前回の sync から変わっていれば読んで反映する。反映したら True"""
+        st = os.stat(path)
+        stamp = [os.path.abspath(path), st.st_size, st.st_mtime_ns]
+        if self.meta.get("source") == stamp and self.meta["months"]:
+            return False
+        result = self.sync(reader(path))
+        self.meta["source"] = stamp
+        self._save_meta()
+        print(f"    log ストア更新: {result['rows']:,}行 / 書換 {result['months']}か月")
+        return True
+
+    def archive_through(self, month: str):
+        """month（YYYY-MM）以前を退避済みとし、log.csv から消えても残す"""
+        for m in self.months():
+            if m != NO_MONTH and m <= month:
+                part = self._read_month(m)
+                if part is not None and (part["_tier"] == 1).any():
+                    live = (part["_tier"] == 1).to_numpy()
+                    start = self.meta["next_seq"]
+                    part.loc[live, "_seq"] = np.arange(start, start + live.sum())
+                    part.loc[live, "_tier"] = 0
+                    self.meta["next_seq"] = start + int(live.sum())
+                    self._write_month(m, part.sort_values(["_tier", "_seq"], kind="stable"))
+        self.meta["archived_through"] = month
+        self.meta["source"] = None
+        self._save_meta()
+
+    # --- 読込 ---
+    def read(self, start=None, end=None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """day が start～end（両端含む）の行を読む。両方省略すると日付不明の行も含めて全件"""
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        filters = []
+        if start is not None:
+            filters.append(("_day", ">=", start))
+        if end is not None:
+            filters.append(("_day", "<=", end))
+
+        lo = start.strftime("%Y-%m") if start is not None else None
+        hi = end.strftime("%Y-%m") if end is not None else None
+        parts = []
+        for month in self.months():
+            if month == NO_MONTH:
+                if filters:
+                    continue
+            elif (lo and month < lo) or (hi and month > hi):
+                continue
+            part = self._read_month(month, filters or None)
+            if part is not None and not part.empty:
+                parts.append(part)
+
+        cols = columns or self.meta["columns"]
+        if not parts:
+            return pd.DataFrame(columns=cols)
+        df = pd.concat(parts, ignore_index=True).sort_values(["_tier", "_seq"], kind="stable")
+        return df[[c for c in cols if c in df.columns]].reset_index(drop=True)
@@ -0,0 +1,84 @@
+"""月別シート用データ（製品×在庫×需要予測×統計を1回だけ結合し、月ごとに切り出す）"""
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+OUTPUT_COLUMNS = ["品番", "商品名", "在庫数量", "日割", "移動平均", "安全在庫"]
+DEFAULT_SAFETY_FACTOR = 1.65   # サービス率95%相当
+SAFETY_FACTOR_COLUMN = "安全係数"  # 製品マスタにこの列があれば品番ごとの係数として使う
+
+
+def safety_stock(std, lead, interval: float = 7, factor=DEFAULT_SAFETY_FACTOR) -> np.ndarray:
+    """安全在庫 = 係数 × 標準偏差 × √(リードタイム + 発注間隔)（列単位で計算）
+
+    標準偏差・リードタイムが欠損、または標準偏差が0なら0。
+    """
+    std = pd.to_numeric(pd.Series(std), errors="coerce").to_numpy(dtype=float)
+    lead = pd.to_numeric(pd.Series(lead), errors="coerce").to_numpy(dtype=float)
+    factor = np.broadcast_to(np.asarray(factor, dtype=float), std.shape)
+    with np.errstate(invalid="ignore"):
+        value = factor * std * np.sqrt(lead + interval)
+    return np.where(np.isnan(std) | np.isnan(lead) | (std == 0), 0.0, value)
+
+
+def pretty_num_series(s: pd.Series) -> pd.Series:
+    """数値を整形（整数は小数点なし、小数は2桁、欠損は空文字）"""
+    num = pd.to_numeric(s, errors="coerce").to_numpy(dtype=float)
+    out = np.empty(len(num), dtype=object)
+    missing = np.isnan(num)
+    with np.errstate(invalid="ignore"):
+        is_int = ~missing & (np.mod(num, 1) == 0)
+    rest = ~missing & ~is_int
+    out[rest] = [round(v, 2) for v in num[rest].tolist()]  # np.round は 0.005 → 0.0 になるため Python の round
+    out[is_int] = num[is_int].astype(np.int64).tolist()
+    out[missing] = ""
+    # 数値にできない文字列はそのまま残す
+    keep = missing & s.notna().to_numpy() & (s.astype(str) != "").to_numpy()
+    out[keep] = s.to_numpy(dtype=object)[keep]
+    return pd.Series(out, index=s.index)
+
+
+def build_product_frame(
+    df_prod: pd.DataFrame,
+    df_zaiko: pd.DataFrame,
+    df_need: pd.DataFrame,
+    df_stats: pd.DataFrame,
+    window_labels: List[str],
+    interval: float = 7,
+    factor: Optional[float] = None,
+) -> pd.DataFrame:
+    """全月共通の結合と安全在庫計算を1回だけ行う
+
+    製品マスタに「安全係数」列があれば品番ごとの係数として使い、空欄は既定値で補う。
+    数量の列は数値のまま返す（シート用の整形は month_slices で行う）。
+    """
+    daily_cols = [f"{m}日割" for m in window_labels]
+    df = (df_prod
+        .merge(df_zaiko, on="品番", how="left")
+        .merge(df_need.reindex(columns=["品番"] + daily_cols), on="品番", how="left")
+        .merge(df_stats, on="品番", how="left"))
+
+    default = DEFAULT_SAFETY_FACTOR if factor is None else factor
+    if SAFETY_FACTOR_COLUMN in df.columns:
+        factors = pd.to_numeric(df[SAFETY_FACTOR_COLUMN], errors="coerce").fillna(default).to_numpy()
+    else:
+        factors = default
+    df["安全在庫"] = safety_stock(df["使用量標準偏差"], df["発注リードタイム"], interval=interval, factor=factors)
+    return df
+
+
+def month_slices(df_joined: pd.DataFrame, window_labels: List[str]) -> Dict[str, pd.DataFrame]:
+    """結合済みデータから月ごとの出力列（日割はその月の列）を整形した新しい DataFrame を作る
+
+    月をまたいで同じ列（在庫数量・移動平均・安全在庫）は1回だけ整形する。df_joined は変更しない。
+    """
+    common = {c: pretty_num_series(df_joined[c]) for c in ["在庫数量", "移動平均", "安全在庫"]}
+    slices = {}
+    for m in window_labels:
+        slices[m] = pd.DataFrame({
+            "品番": df_joined["品番"], "商品名": df_joined["商品名"], "在庫数量": common["在庫数量"],
+            "日割": pretty_num_series(df_joined[f"{m}日割"]), "移動平均": common["移動平均"],
+            "安全在庫": common["安全在庫"],
+        }, columns=OUTPUT_COLUMNS)
+    return slices
@@ -0,0 +1,41 @@
+"""ダウンロード・整形・集計・シート書込を重ねて実行するための Future の道具（1.py の OVERLAP_IO）
+
+- then(executor, future, fn): future が終わったら fn(結果) を executor に投入する
+  （届いたファイルから順に整形・集計を始め、全ファイルのダウンロードを待たない）
+- resolve(value): Future なら結果を待ち、それ以外はそのまま返す
+全体の所要時間は「最も長い1本の経路（例: Base のダウンロード → 集計 → シート書込）」に近づく。
+"""
+from concurrent.futures import Executor, Future
+from typing import Callable
+
+
+def then(executor: Executor, future: Future, fn: Callable) -> Future:
+    """future の結果を fn に渡す処理を、future の完了後に executor で実行する Future"""
+    out: Future = Future()
+
+    def forward(inner: Future):
+        if inner.cancelled():
+            out.cancel()
+        elif inner.exception() is not None:
+            out.set_exception(inner.exception())
+        else:
+            out.set_result(inner.result())
+
+    def submit(done: Future):
+        if done.cancelled():
+            out.cancel()
+            return
+        if done.exception() is not None:
+            out.set_exception(done.exception())
+            return
+        try:
+            executor.submit(fn, done.result()).add_done_callback(forward)
+        except Exception as e:  # executor が停止済みなど（待っている側に伝える）
+            out.set_exception(e)
+
+    future.add_done_callback(submit)
+    return out
+
+
+def resolve(value):
+    return value.result() if isinstance(value, Future) else value
@@ -0,0 +1,122 @@
+"""処理段（ステージ）の依存関係をたどって実行し、結果をメモ化する小さな実行器
+
+各ステージは名前・関数・依存ステージ・入力ファイル・設定値を持つ。run(targets) は targets に
+必要なステージだけを依存順に実行し、入力ファイル（更新時刻・サイズ）・設定値・依存ステージの結果が
+前回と同じなら再計算せず前回の結果を使う。同じ CSV を複数の出力処理で読み直さないために使う。
+"""
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from dp_scheduler import trace
+
+
+class Stage:
+    def __init__(self, name: str, func: Callable, deps: Sequence[str] = (), inputs: Sequence[str] = (),
+                 config: Optional[Callable[[], tuple]] = None):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.inputs = list(inputs)
+        self.config = config  # 実行時に呼び、結果に影響する設定値を返す（変われば再計算）
+
+
+def _file_key(path: str):
+    try:
+        st = os.stat(path)
+        return (path, st.st_mtime_ns, st.st_size)
+    except OSError:
+        return (path, None, None)
+
+
+class Pipeline:
+    """ステージの登録と実行（関数には依存ステージの結果が deps の順に渡される）"""
+
+    def __init__(self, verbose: bool = True):
+        self.stages: Dict[str, Stage] = {}
+        self.results: Dict[str, object] = {}
+        self.verbose = verbose
+        self._keys: Dict[str, tuple] = {}
+        self._versions: Dict[str, int] = {}
+        self.stats = {"computed": 0, "reused": 0}
+
+    def add(self, name: str, func: Callable, deps: Sequence[str] = (), inputs: Sequence[str] = (),
+            config: Optional[Callable[[], tuple]] = None) -> Stage:
+        if name in self.stages:
+            raise ValueError(f"ステージ名が重複しています: {name}")
+        stage = Stage(name, func, deps, inputs, config)
+        self.stages[name] = stage
+        return stage
+
+    def stage(self, name: str, deps: Sequence[str] = (), inputs: Sequence[str] = (),
+              config: Optional[Callable[[], tuple]] = None):
+        """デコレータ版の add"""
+        def register(func: Callable) -> Callable:
+            self.add(name, func, deps, inputs, config)
+            return func
+        return register
+
+    def order(self, targets: Optional[Iterable[str]] = None) -> List[str]:
+        """targets（省略時は全ステージ）の実行に必要なステージを依存順に並べる"""
+        names = list(self.stages) if targets is None else list(targets)
+        ordered, state = [], {}
+
+        def visit(name: str, path: List[str]):
+            if name not in self.stages:
+                raise KeyError(f"未登録のステージです: {name}")
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError("ステージの依存が循環しています: " + " → ".join(path + [name]))
+            state[name] = "visiting"
+            for dep in self.stages[name].deps:
+                visit(dep, path + [name])
+            state[name] = "done"
+            ordered.append(name)
+
+        for name in names:
+            visit(name, [])
+        return ordered
+
+    def _key(self, stage: Stage) -> tuple:
+        return (tuple(_file_key(p) for p in stage.inputs),
+                stage.config() if stage.config else (),
+                tuple(self._versions.get(d) for d in stage.deps))
+
+    def run(self, targets: Optional[Iterable[str]] = None, force: Iterable[str] = ()) -> Dict[str, object]:
+        """targets を実行して {ステージ名: 結果} を返す（force のステージは必ず再計算）"""
+        targets = list(self.stages) if targets is None else list(targets)
+        force = set(force)
+        for name in self.order(targets):
+            stage = self.stages[name]
+            key = self._key(stage)
+            if name not in force and name in self.results and self._keys.get(name) == key:
+                self.stats["reused"] += 1
+                trace.count("pipeline.reused")
+                continue
+            start = time.perf_counter()
+            args = [self.results[d] for d in stage.deps]
+            with trace.span(name):
+                self.results[name] = stage.func(*args)
+                inputs = [n for n in map(trace.row_count, args) if n is not None]
+                trace.rows(rows_in=sum(inputs) if inputs else None, rows_out=trace.row_count(self.results[name]))
+            self._keys[name] = key
+            self._versions[name] = self._versions.get(name, 0) + 1
+            self.stats["computed"] += 1
+            if self.verbose:
+                print(f"  ✓ {name} ({time.perf_counter() - start:.2f}秒)")
+        return {name: self.results[name] for name in targets}
+
+    def invalidate(self, *names: str):
+        """指定ステージと、それに依存するステージの結果を破棄する"""
+        dropped = set(names)
+        changed = True
+        while changed:
+            changed = False
+            for stage in self.stages.values():
+                if stage.name not in dropped and dropped.intersection(stage.deps):
+                    dropped.add(stage.name)
+                    changed = True
+        for name in dropped:
+            self.results.pop(name, None)
+            self._keys.pop(name, None)
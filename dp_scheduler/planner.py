@@ -0,0 +1,474 @@
+"""需要計画（scheduler plan / ai-export・2.py から run() を呼ぶ）
+
+log.csv・workday.csv・material_master.csv から仕込計画（scheduler_list・scheduler_shortage）、
+釜・充填ラインへの割付（scheduler_capacity）、AIscheduler_YYYYMMDD.csv を出力する。
+import しただけでは何も実行しない（パスは configure()、実行は run() または run_scheduler() など）。
+"""
+import os
+import re
+import math
+import warnings
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import Tuple, Dict, List, Optional
+
+from dp_scheduler.ingest import read_csv_flexible
+from dp_scheduler.workcalendar import WorkCalendar
+from dp_scheduler.consolidate import consolidate
+from dp_scheduler.incremental import RescheduleState, consolidate_incremental
+from dp_scheduler.pipeline import Pipeline
+from dp_scheduler.logstore import LogStore
+from dp_scheduler.capacity import code_key, default_kettles, schedule_capacity
+from dp_scheduler.enrich import LOG_HEADERS, read_text_csv, enrich_log, changes_payload, write_changes
+from dp_scheduler import trace, workcalendar
+
+warnings.filterwarnings('ignore')
+
+# ===== 1) パス自動判定 =====
+MYDRIVE_CANDIDATES = ["/content/drive/MyDrive", "/content/drive/My Drive"]
+# 以下のパス・PIPELINE は configure() で設定する
+ROOT: Optional[str] = None
+INPUT_DIR = OUTPUT_DIR = LOG_FILE = CALENDAR_FILE = MATERIAL_FILE = None
+FORMULATION_FILE = MACHINE_FILE = LOG_CHANGES_FILE = None
+STATE_DIR = LOG_STORE_DIR = None
+TODAY_STR = None
+PIPELINE: Optional[Pipeline] = None
+
+def mount_drive():
+    """Google Drive をマウント（Colab 以外では何もしない）"""
+    try:
+        from google.colab import drive  # noqa
+        drive.mount('/content/drive', force_remount=False)
+    except Exception:
+        pass  # Colab以外ならスキップ
+
+def configure(root: Optional[str] = None):
+    """dp_Scheduler フォルダの親（root）から入出力パスと日付（TODAY_STR）を決める
+
+    root を省略すると DP_SCHEDULER_ROOT（ローカルの合成データ・ベンチマーク用）、
+    無ければ マイドライブ を使う。フォルダが変わったときだけ処理段を登録し直す
+    （同じフォルダなら読込・計画の結果を持ち越す）。
+    """
+    global ROOT, INPUT_DIR, OUTPUT_DIR, LOG_FILE, CALENDAR_FILE, MATERIAL_FILE, FORMULATION_FILE
+    global MACHINE_FILE, LOG_CHANGES_FILE, STATE_DIR, LOG_STORE_DIR, TODAY_STR, PIPELINE
+    previous = ROOT
+    ROOT = root or os.environ.get("DP_SCHEDULER_ROOT") or next((p for p in MYDRIVE_CANDIDATES if os.path.exists(p)), "/content/drive/My Drive")
+
+    INPUT_DIR   = os.path.join(ROOT, "dp_Scheduler/Input/Master/")
+    OUTPUT_DIR  = os.path.join(ROOT, "dp_Scheduler/Output/")
+    LOG_FILE        = os.path.join(INPUT_DIR,  "log.csv")
+    CALENDAR_FILE   = os.path.join(INPUT_DIR,  "workday.csv")
+    MATERIAL_FILE   = os.path.join(INPUT_DIR,  "material_master.csv")
+    FORMULATION_FILE = os.path.join(INPUT_DIR, "formulation.csv")
+    MACHINE_FILE     = os.path.join(INPUT_DIR, "machine.csv")
+    LOG_CHANGES_FILE = os.path.join(INPUT_DIR, "log_changes.json")  # LogFrom.gs の applyLogChangesFromPython で反映
+    STATE_DIR = os.path.join(OUTPUT_DIR, ".scheduler_state")  # 前回の統合結果（INCREMENTAL_MODE）
+    LOG_STORE_DIR = os.path.join(OUTPUT_DIR, ".log_store")    # 月別 Parquet（USE_LOG_STORE）
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    TODAY_STR = datetime.now().strftime("%Y%m%d")
+    if PIPELINE is None or ROOT != previous:
+        PIPELINE = build_pipeline()
+
+# ===== 2) 共通ユーティリティ =====
+def safe_read_csv(path, **kwargs):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"ファイルが見つかりません: {path}")
+    return read_csv_flexible(path, **kwargs)
+
+def load_log() -> pd.DataFrame:
+    """計画期間（FILTER_START_DATE～FILTER_END_DATE）の log を読む"""
+    if USE_LOG_STORE:
+        store = LogStore(LOG_STORE_DIR, archived_through=LOG_ARCHIVED_THROUGH)
+        if store.enabled:
+            store.sync_file(LOG_FILE, safe_read_csv)
+            return store.read(FILTER_START_DATE, FILTER_END_DATE)
+    return safe_read_csv(LOG_FILE)
+
+def pick_col(df: pd.DataFrame, candidates: List[str]) -> Optional[str]:
+    for c in candidates:
+        if c in df.columns:
+            return c
+        low = [x.lower() for x in df.columns]
+        if c.lower() in low:
+            return df.columns[low.index(c.lower())]
+    return None
+
+# ===== 3) ① スケジューラ処理（あなたのコードを関数化し、冗長printは整理） =====
+# 計画ロジック設定
+STANDARD_LEAD_TIME = 4    # 標準仕込L/T（営業日）
+DEFAULT_LEAD_TIME  = 3    # デフォL/T
+SHORT_LEAD_TIME    = 1    # 短縮L/T（NR, LC, 工程3なし）
+# 稼働日カレンダーの開始年は先頭の月と今日から推定（1.py と共通。固定するなら DP_SCHEDULER_CALENDAR_START_YEAR）
+MAX_PRODUCTS_PER_BATCH = 4
+CONSOLIDATION_STRATEGY = "greedy"  # greedy（従来どおり） / first_fit / first_fit_decreasing
+INCREMENTAL_MODE = True  # 前回の統合結果を素地単位で再利用（log.csv の ID 列が必要）
+FILTER_START_DATE = "2025-10-01"   # 必要に応じて変更
+FILTER_END_DATE   = "2025-12-31"   # 必要に応じて変更（四半期分をまとめて統合）
+USE_LOG_STORE = True  # log.csv を月別 Parquet に保存し、計画期間の月だけ読む
+LOG_ARCHIVED_THROUGH = None  # "YYYY-MM": Archive.gs で退避済みの月（以前の月は log.csv から消えても残す）
+# log.csv（A～H列）に formulation.csv・machine.csv の情報を付与してから計画する（LogFrom.gs の Enrich と同じ）
+ENRICH_LOG = False
+ENRICH_WRITE_CHANGES = True  # 付与で変わったセルだけを LOG_CHANGES_FILE に出力（log シートへの反映用）
+# 釜・充填ラインの空き枠を考慮して仕込日・充填日を割り付ける（scheduler_capacity_YYYYMMDD.csv）
+CAPACITY_MODE = True
+LINE_SLOTS_PER_DAY = 4       # 1ライン1日あたりの充填数（config.gs の logFromMaxItems と同じ）
+KETTLE_BATCHES_PER_DAY = 1   # 1釜1日あたりの仕込回数
+KETTLES = None               # {"釜名": 容量}。None なら material_master の 油脂仕込み量１ ごとに1釜
+# 処理段ごとの所要時間・件数・メモリを OUTPUT_DIR/trace_scheduler_*.json に出力
+TRACE_OUTPUT = True
+TRACE_CHROME = False  # True: chrome://tracing・Perfetto で開ける .chrome.json も出力
+
+def enrich_log_file() -> bool:
+    """log.csv にマスタ情報を付与して書き戻す（内容が変わらなければ書き込まない）。書き込んだら True"""
+    df_raw = read_text_csv(LOG_FILE)
+    df_enriched = enrich_log(df_raw, read_text_csv(FORMULATION_FILE), read_text_csv(MACHINE_FILE))
+    same = (list(df_raw.columns) == LOG_HEADERS and df_raw.shape == df_enriched.shape
+            and (df_raw.astype(str).values == df_enriched.astype(str).values).all())
+    changes = [] if same else changes_payload(df_raw, df_enriched)
+    if ENRICH_WRITE_CHANGES:
+        write_changes(LOG_CHANGES_FILE, changes)
+    if same:
+        print(f"ℹ️ log.csv のマスタ情報は最新です ({len(df_enriched)}行)")
+        return False
+    tmp = LOG_FILE + ".tmp"
+    df_enriched.to_csv(tmp, index=False, encoding="utf-8-sig")
+    os.replace(tmp, LOG_FILE)
+    print(f"✅ log.csv にマスタ情報を付与: {len(df_enriched)}行 / 変更 {len(changes)}範囲")
+    return True
+
+def get_working_days(calendar_file_path: str, start_year: Optional[int] = None,
+                     today: Optional[pd.Timestamp] = None) -> WorkCalendar:
+    df_calendar = safe_read_csv(calendar_file_path, header=None)
+    return WorkCalendar.from_first_row(df_calendar, start_year, today=today)
+
+def get_material_info(material_file_path: str) -> Tuple[Dict, Dict]:
+    return material_info_from_frame(safe_read_csv(material_file_path))
+
+def material_info_from_frame(df_material: pd.DataFrame) -> Tuple[Dict, Dict]:
+    if '素地' not in df_material.columns or '油脂仕込み量１' not in df_material.columns:
+        raise KeyError("material_master.csv に ['素地','油脂仕込み量１'] が必要です")
+    df_u = df_material.drop_duplicates(subset=['素地']).copy()
+    df_u['Maxbatchsize'] = pd.to_numeric(df_u['油脂仕込み量１'], errors='coerce').fillna(0)
+    max_batch_dict = pd.Series(df_u['Maxbatchsize'].values, index=df_u['素地']).to_dict()
+
+    lt_dict = {}
+    for _, row in df_u.iterrows():
+        recipe = row['素地']
+        is_short = ('工程３' not in row) or pd.isna(row['工程３'])
+        lt_dict[recipe] = SHORT_LEAD_TIME if (recipe in ['NR','LC'] or is_short) else DEFAULT_LEAD_TIME
+    return max_batch_dict, lt_dict
+
+def consolidate_batches_advanced(df_schedulable: pd.DataFrame, infer_types: bool = True) -> pd.DataFrame:
+    return consolidate(df_schedulable, strategy=CONSOLIDATION_STRATEGY, max_products=MAX_PRODUCTS_PER_BATCH,
+                       infer_types=infer_types)
+
+def _safe_write_scheduler_csv(df_schedulable, output_dir, today_str):
+    path_schedulable = os.path.join(output_dir, f'scheduler_list_{today_str}.csv')
+
+    if df_schedulable.empty:
+        print("ℹ️ スケジュール可能タスクなし（scheduler_list 出力スキップ）")
+        return
+
+    df_out = df_schedulable.copy()
+    # 日付列の整形
+    for col in ['充填日','標準仕込希望日','最終仕込デッドライン']:
+        if col in df_out.columns:
+            df_out[col] = pd.to_datetime(df_out[col], errors='coerce').dt.strftime('%Y-%m-%d')
+
+    # 期待列（無いものは空列で補完）
+    output_cols = [
+        'Recipe','充填日','標準仕込希望日','最終仕込デッドライン',
+        '必要素地量','釜最大容量','余剰液量','統合フラグ','統合製品数','仕込回数削減',
+        '製品(1)_コード','製品(1)_商品名','製品(1)_個数','製品(1)_充填日','製品(1)_素地量','製品(1)_状態',
+        '製品(2)_コード','製品(2)_商品名','製品(2)_個数','製品(2)_充填日','製品(2)_素地量','製品(2)_状態',
+        '製品(3)_コード','製品(3)_商品名','製品(3)_個数','製品(3)_充填日','製品(3)_素地量','製品(3)_状態',
+        '製品(4)_コード','製品(4)_商品名','製品(4)_個数','製品(4)_充填日','製品(4)_素地量','製品(4)_状態',
+        '製品リスト'
+    ]
+    for c in output_cols:
+        if c not in df_out.columns:
+            df_out[c] = ""
+
+    # 並べ替えて保存
+    df_out = df_out[output_cols]
+    df_out.to_csv(path_schedulable, index=False, encoding='utf-8-sig')
+    print(f"✅ 出力: {path_schedulable} ({len(df_out)} 件)")
+
+def run_scheduler():
+    """scheduler_list・scheduler_shortage を出力（計画は PIPELINE の scheduler 段）"""
+    return PIPELINE.run(["scheduler"])["scheduler"]
+
+def build_plan(df_log: pd.DataFrame, material_info: Tuple[Dict, Dict], calendar: WorkCalendar) -> pd.DataFrame:
+    """log.csv から期間内の計画行を作り、L/T・釜容量・仕込希望日・デッドラインを付ける"""
+    max_batch_dict, lt_dict = material_info
+
+    required_cols = ['day','Recipe','batchsize','code','productname','cell']
+    if not all(c in df_log.columns for c in required_cols):
+        raise KeyError("log.csv に必要列が不足しています: " + str(required_cols))
+
+    key_cols = [c for c in ['ID', 'Timestamp'] if c in df_log.columns]
+    df_plan = df_log[required_cols + key_cols].copy()
+    df_plan['充填日'] = pd.to_datetime(df_plan['day'], errors='coerce')
+    df_plan['必要素地量'] = pd.to_numeric(df_plan['batchsize'], errors='coerce')
+
+    df_plan = df_plan[
+        (df_plan['充填日'] >= pd.to_datetime(FILTER_START_DATE)) &
+        (df_plan['充填日'] <= pd.to_datetime(FILTER_END_DATE))
+    ].dropna(subset=['充填日','Recipe','必要素地量'])
+    df_plan = df_plan[df_plan['必要素地量'] > 0]
+
+    if not df_plan.empty:
+        df_plan['L/T'] = df_plan['Recipe'].map(lt_dict).fillna(DEFAULT_LEAD_TIME)
+        df_plan['釜最大容量'] = df_plan['Recipe'].map(max_batch_dict).fillna(0)
+        df_plan['code'] = pd.to_numeric(df_plan['code'], errors='coerce').fillna(0).astype(int)
+        df_plan['cell'] = pd.to_numeric(df_plan['cell'], errors='coerce').fillna(0).astype(int)
+        # 充填日から稼働日で L/T 日さかのぼる（全行まとめて計算）
+        df_plan['標準仕込希望日'] = calendar.offset(df_plan['充填日'], -STANDARD_LEAD_TIME).to_numpy()
+        df_plan['最終仕込デッドライン'] = calendar.offset(
+            df_plan['充填日'], -df_plan['L/T'].astype(int).to_numpy()
+        ).to_numpy()
+    return df_plan
+
+def schedule_from_plan(df_plan: pd.DataFrame, calendar: WorkCalendar) -> pd.DataFrame:
+    """計画行を統合して scheduler_list / scheduler_shortage を出力し、統合結果を返す"""
+    # 可スケジュール
+    if '最終仕込デッドライン' in df_plan.columns and not df_plan.empty:
+        df_schedulable = df_plan.dropna(subset=['最終仕込デッドライン']).sort_values(
+            by=['最終仕込デッドライン','標準仕込希望日','Recipe']
+        )
+    else:
+        df_schedulable = pd.DataFrame()
+
+    if not df_schedulable.empty and INCREMENTAL_MODE and 'ID' in df_schedulable.columns:
+        state = RescheduleState(STATE_DIR, settings={
+            "strategy": CONSOLIDATION_STRATEGY,
+            "max_products": MAX_PRODUCTS_PER_BATCH,
+            "amount_dtype": df_schedulable['必要素地量'].dtype,
+        })
+        df_schedulable = consolidate_incremental(df_schedulable, consolidate_batches_advanced, state)
+    elif not df_schedulable.empty:
+        df_schedulable = consolidate_batches_advanced(df_schedulable)
+    else:
+        print("ℹ️ スケジュール可能タスクなし（統合処理スキップ）")
+
+    # 保存（不足列は空で補完）
+    _safe_write_scheduler_csv(df_schedulable, OUTPUT_DIR, TODAY_STR)
+
+    # 不足タスクも従来どおり（必要ならこの下を略）
+    path_shortage = os.path.join(OUTPUT_DIR, f'scheduler_shortage_{TODAY_STR}.csv')
+    if '最終仕込デッドライン' in df_plan.columns:
+        df_shortage = df_plan[df_plan['最終仕込デッドライン'].isna()].copy()
+    else:
+        df_shortage = pd.DataFrame()
+    if not df_shortage.empty:
+        df_shortage['理由'] = np.where(
+            calendar.is_workday(df_shortage['充填日']),
+            "リードタイムがカレンダー範囲外", "充填日が稼働日カレンダーにない"
+        )
+        df_shortage['充填日'] = df_shortage['充填日'].dt.strftime('%Y-%m-%d')
+        df_shortage[['Recipe','充填日','必要素地量','code','productname','cell','理由']].to_csv(
+            path_shortage, index=False, encoding='utf-8-sig'
+        )
+        print(f"✅ 出力: {path_shortage} ({len(df_shortage)} 件)")
+    else:
+        print("ℹ️ 不足タスクなし（shortage 出力スキップ）")
+    return df_schedulable
+
+def run_capacity_scheduler():
+    """scheduler_capacity（と割付不可の一覧）を出力"""
+    return PIPELINE.run(["capacity"])["capacity"]
+
+def capacity_from_schedule(df_schedulable: pd.DataFrame, df_log: pd.DataFrame,
+                           material_info: Tuple[Dict, Dict], calendar: WorkCalendar) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """統合済みバッチを釜・充填ラインの空き枠に割り付け、scheduler_capacity（と割付不可の一覧）を出力する"""
+    max_batch_dict, lt_dict = material_info
+    line_of = {}
+    if 'line' in df_log.columns and 'code' in df_log.columns:
+        lines = df_log['line'].fillna('').astype(str).str.strip()
+        has_line = (lines != '').to_numpy()
+        line_of = dict(zip(code_key(df_log['code'])[has_line], lines[has_line]))
+    kettles = KETTLES or default_kettles(max_batch_dict)
+
+    df_lot, df_fill = schedule_capacity(
+        df_schedulable, calendar, lt_dict, line_of, kettles, default_lead=DEFAULT_LEAD_TIME,
+        line_slots=LINE_SLOTS_PER_DAY, kettle_slots=KETTLE_BATCHES_PER_DAY,
+    )
+    if df_lot.empty:
+        print("ℹ️ 割付対象のバッチなし（capacity 出力スキップ）")
+        return df_lot, df_fill
+
+    path_capacity = os.path.join(OUTPUT_DIR, f'scheduler_capacity_{TODAY_STR}.csv')
+    out = df_fill.copy()
+    for c in ['仕込日', '希望充填日', '充填日']:
+        out[c] = pd.to_datetime(out[c]).dt.strftime('%Y-%m-%d')
+    out.to_csv(path_capacity, index=False, encoding='utf-8-sig')
+    print(f"✅ 出力: {path_capacity} ({len(out)} 件 / 釜 {len(kettles)} / ライン {len(set(line_of.values()))})")
+
+    df_ng = df_lot[df_lot['状態'] != '割付済'].copy()
+    path_infeasible = os.path.join(OUTPUT_DIR, f'scheduler_capacity_infeasible_{TODAY_STR}.csv')
+    if not df_ng.empty:
+        for c in ['標準仕込希望日', '最終仕込デッドライン']:
+            df_ng[c] = pd.to_datetime(df_ng[c]).dt.strftime('%Y-%m-%d')
+        df_ng[['Recipe', '必要素地量', '標準仕込希望日', '最終仕込デッドライン', '理由']].to_csv(
+            path_infeasible, index=False, encoding='utf-8-sig'
+        )
+        print(f"✅ 出力: {path_infeasible} ({len(df_ng)} 件)")
+    else:
+        print("ℹ️ 割付不可のバッチなし")
+    return df_lot, df_fill
+
+# ===== 4) ② AIscheduler_YYYYMMDD.csv 生成（先ほどの仕様） =====
+def run_ai_formatter():
+    """AIscheduler_YYYYMMDD.csv を出力"""
+    return PIPELINE.run(["ai_format"])["ai_format"]
+
+def format_ai(df_log: pd.DataFrame, df_mat: pd.DataFrame) -> pd.DataFrame:
+
+    RECIPE_CANDIDATES     = ["Recipe","素地","recipe","item_name","recipe_name"]
+    DEADLINE_CANDIDATES   = ["最終仕込デッドライン","最終仕込デットライン","deadline","production_deadline","最終仕込"]
+    ITEM_CODE_CANDIDATES  = ["item_code","コード","code"]
+    MAXCAP_CANDIDATES     = ["釜最大容量","油脂仕込み量１","Maxbatchsize","max_batch_size"]
+
+    RECIPE_COL     = pick_col(df_log, RECIPE_CANDIDATES) or df_log.columns[0]
+    DEADLINE_COL   = pick_col(df_log, DEADLINE_CANDIDATES)
+    ITEM_CODE_COL  = pick_col(df_mat, ITEM_CODE_CANDIDATES) or "item_code"
+    RECIPE_KEY_MAT = pick_col(df_mat, RECIPE_CANDIDATES)
+    MAXCAP_COL     = pick_col(df_mat, MAXCAP_CANDIDATES)
+
+    df = df_log.copy()
+    if DEADLINE_COL:
+        df[DEADLINE_COL] = pd.to_datetime(df[DEADLINE_COL], errors="coerce")
+    else:
+        DEADLINE_COL = "production_deadline"
+        df[DEADLINE_COL] = pd.NaT
+
+    # item_code・釜最大容量付与（マスタ側で素地ごとに組み合わせてから、ログとは1回だけ結合）
+    has_code = bool(RECIPE_KEY_MAT) and ITEM_CODE_COL in df_mat.columns
+    has_cap = bool(RECIPE_KEY_MAT and MAXCAP_COL) and MAXCAP_COL in df_mat.columns
+    lookup = None
+    if has_code:
+        lookup = df_mat[[RECIPE_KEY_MAT, ITEM_CODE_COL]].drop_duplicates()
+    if has_cap:
+        caps = df_mat[[RECIPE_KEY_MAT, MAXCAP_COL]].drop_duplicates()
+        lookup = caps if lookup is None else lookup.merge(caps, how="left", on=RECIPE_KEY_MAT)
+    if lookup is not None:
+        df = df.merge(
+            lookup, how="left", left_on=RECIPE_COL, right_on=RECIPE_KEY_MAT
+        ).drop(columns=[c for c in [RECIPE_KEY_MAT] if c != RECIPE_COL], errors="ignore")
+    if not has_code:
+        df[ITEM_CODE_COL] = np.nan
+    if has_cap:
+        if MAXCAP_COL != "釜最大容量":
+            df.rename(columns={MAXCAP_COL: "釜最大容量"}, inplace=True)
+    elif "釜最大容量" not in df.columns:
+        df["釜最大容量"] = np.nan
+
+    # lot_no（Recipeごとに01〜）
+    df["_idx"] = np.arange(len(df))
+    df = df.sort_values([RECIPE_COL, DEADLINE_COL, "_idx"], na_position="last")
+    df["serial_within_recipe"] = df.groupby(RECIPE_COL).cumcount() + 1
+    df["lot_no"] = df[RECIPE_COL].astype(str) + df["serial_within_recipe"].astype(str).str.zfill(2)
+
+    # 仕込/PH ブロック
+    block1 = pd.DataFrame({
+        "id": "",
+        "lot_no": df["lot_no"],
+        "item_code": df[ITEM_CODE_COL] if ITEM_CODE_COL in df.columns else "",
+        "item_name": df[RECIPE_COL],
+        "process_code": 1,
+        "process_name": "仕込/PH",
+        "num": 2,
+        "prep_amount": df["釜最大容量"],
+        "production_deadline": df[DEADLINE_COL].dt.strftime("%Y-%m-%d") if pd.api.types.is_datetime64_any_dtype(df[DEADLINE_COL]) else df[DEADLINE_COL],
+        "before_arrange_ids": ""
+    })
+    block1["arrange_data_type"] = 0
+    block1["arrange_status"]    = 0
+
+    # 配合/充填 ブロック（コピーして変更）
+    block2 = block1.copy()
+    block2["process_code"]   = 2
+    block2["process_name"]   = "配合/充填"
+    block2["num"]            = 1
+    block2["before_arrange_ids"] = [str(x) for x in range(1, 2*len(block2), 2)]  # 1,3,5,...
+
+    # 結合＆ID採番
+    out = pd.concat([block1, block2], ignore_index=True)
+    out["id"] = (np.arange(len(out)) + 1).astype(int)
+
+    col_order = [
+        "id","lot_no","item_code","item_name",
+        "process_code","process_name","num","prep_amount",
+        "production_deadline","before_arrange_ids",
+        "arrange_data_type","arrange_status"
+    ]
+    for c in col_order:
+        if c not in out.columns:
+            out[c] = ""
+    out = out[col_order]
+
+    path_ai = os.path.join(OUTPUT_DIR, f"AIscheduler_{TODAY_STR}.csv")
+    out.to_csv(path_ai, index=False, encoding="utf-8-sig")
+    print(f"✅ 出力: {path_ai} ({len(out)}行)")
+    return out
+
+# ===== 4.5) 処理段の登録（入力は1回だけ読み、各出力で共有する） =====
+# 入力ファイル・設定値が変わらなければ、同じセッションで再実行しても読込・計画は前回の結果を使う。
+# config には各段の結果に影響する設定を並べる（実行時に読むため、設定を変えればその段から計算し直す）。
+def build_pipeline() -> Pipeline:
+    pipeline = Pipeline()
+    pipeline.add("calendar", lambda: get_working_days(CALENDAR_FILE), inputs=[CALENDAR_FILE],
+                 config=lambda: (workcalendar.CALENDAR_START_YEAR, TODAY_STR))
+    pipeline.add("log", load_log, inputs=[LOG_FILE],
+                 config=lambda: (USE_LOG_STORE, LOG_ARCHIVED_THROUGH, FILTER_START_DATE, FILTER_END_DATE))
+    pipeline.add("material", lambda: safe_read_csv(MATERIAL_FILE), inputs=[MATERIAL_FILE])
+    pipeline.add("material_info", material_info_from_frame, deps=["material"],
+                 config=lambda: (SHORT_LEAD_TIME, DEFAULT_LEAD_TIME))
+    pipeline.add("plan", build_plan, deps=["log", "material_info", "calendar"],
+                 config=lambda: (FILTER_START_DATE, FILTER_END_DATE, STANDARD_LEAD_TIME, DEFAULT_LEAD_TIME))
+    pipeline.add("scheduler", schedule_from_plan, deps=["plan", "calendar"],
+                 config=lambda: (CONSOLIDATION_STRATEGY, MAX_PRODUCTS_PER_BATCH, INCREMENTAL_MODE,
+                                 OUTPUT_DIR, TODAY_STR))
+    pipeline.add("ai_format", format_ai, deps=["log", "material"], config=lambda: (OUTPUT_DIR, TODAY_STR))
+    pipeline.add("capacity", capacity_from_schedule, deps=["scheduler", "log", "material_info", "calendar"],
+                 config=lambda: (dict(KETTLES) if KETTLES else None, LINE_SLOTS_PER_DAY, KETTLE_BATCHES_PER_DAY,
+                                 DEFAULT_LEAD_TIME, OUTPUT_DIR, TODAY_STR))
+    return pipeline
+
+# ===== 5) --- 実 行 -------------------------------------------------
+def default_steps() -> List[str]:
+    """実行設定（ENRICH_LOG・CAPACITY_MODE）に従った既定の処理"""
+    return (["enrich"] if ENRICH_LOG else []) + ["scheduler"] + (["capacity"] if CAPACITY_MODE else []) + ["ai_format"]
+
+def run(steps: Optional[List[str]] = None, root: Optional[str] = None) -> Dict[str, object]:
+    """steps（enrich・scheduler・capacity・ai_format。省略時は default_steps()）を順に実行し、{処理: 結果} を返す
+
+    毎回 configure() し直す（root 省略時は前回のフォルダ。日付が変われば出力ファイル名も変わる）。
+    設定値（FILTER_START_DATE など）は各段が実行時に読み、変わった段から計算し直す。
+    """
+    configure(root or ROOT)
+    jobs = {
+        "enrich": enrich_log_file,              # ← log.csv へのマスタ情報付与（log_changes.json）
+        "scheduler": run_scheduler,             # ← スケジューラ（scheduler_list_YYYYMMDD.csv / scheduler_shortage_YYYYMMDD.csv）
+        "capacity": run_capacity_scheduler,     # ← 釜・充填ラインへの割付（scheduler_capacity_YYYYMMDD.csv）
+        "ai_format": run_ai_formatter,          # ← AIscheduler_YYYYMMDD.csv
+    }
+    steps = default_steps() if steps is None else list(steps)
+    unknown = [s for s in steps if s not in jobs]
+    if unknown:
+        raise ValueError(f"未対応の処理です: {unknown}（{', '.join(jobs)}）")
+
+    results = {}
+    with trace.Tracer("scheduler") as tracer:
+        for step in steps:
+            tracer.step(step)
+            results[step] = jobs[step]()
+        tracer.finish()
+        if TRACE_OUTPUT:
+            results["trace"] = tracer.write(OUTPUT_DIR, chrome=TRACE_CHROME)
+            print(f"✅ トレース: {results['trace']}")
+            for line in tracer.report():
+                print(f"    - {line}")
+    return results
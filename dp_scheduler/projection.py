@@ -0,0 +1,100 @@
+"""在庫推移の予測（calendar.gs の calculateInventory の数式を値で求める）
+
+月シートの偶数行（在庫行）は G列以降に「左のセル − 日割(D列) + 入庫(下の行)」の数式を並べ、
+月をまたぐ G 列は前月シートの最終列を参照していた。ここでは 品番×稼働日 の行列で
+    在庫[t] = 在庫数量 + Σ(入庫 − 日割)[開始日の翌稼働日..t]
+を累積和で一度に求め、値として書き込む（開始日の列は現在の在庫数量）。
+数式と同じく、2か月目以降の月初（G 列 = 前月の最終列 + 入庫）は日割を引かない。
+入庫は入庫行に手入力する数量（log.gs の recordCalendarEdit が log.csv の cell 列に記録する値）。
+"""
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from dp_scheduler.workcalendar import WorkCalendar
+
+START_COL = 7         # G列（config.gs の calendarStartCol）
+FILL_COLUMN = "cell"  # log.csv の入庫数量の列（月シートの入庫行の値。batchsize は cell × 仕込み量）
+
+
+def fills_from_log(df_log: pd.DataFrame, qty_col: str = FILL_COLUMN,
+                   code_col: str = "code", day_col: str = "day") -> pd.DataFrame:
+    """log.csv から 品番・日付ごとの入庫予定（品番, 日付, 入庫）"""
+    for col in (code_col, day_col, qty_col):
+        if col not in df_log.columns:
+            raise KeyError(f"log.csv に '{col}' 列がありません")
+    df = pd.DataFrame({
+        "品番": df_log[code_col].astype(str).str.strip(),
+        "日付": pd.to_datetime(df_log[day_col], errors="coerce").dt.normalize(),
+        "入庫": pd.to_numeric(df_log[qty_col], errors="coerce").fillna(0.0),
+    }).dropna(subset=["日付"])
+    return df.groupby(["品番", "日付"], as_index=False)["入庫"].sum()
+
+
+def horizon_days(calendar: WorkCalendar, today: pd.Timestamp, end: pd.Timestamp) -> pd.DatetimeIndex:
+    """予測する稼働日（今日以前で最も近い稼働日 ～ end）。今日がカレンダーより前ならその先頭から"""
+    days = calendar.index.normalize()
+    today = pd.Timestamp(today).normalize()
+    first = days[days <= today].max() if (days <= today).any() else days[0]
+    return days[(days >= first) & (days <= pd.Timestamp(end))]
+
+
+def demand_matrix(days: pd.DatetimeIndex, daily_by_month: Dict[tuple, np.ndarray], num_products: int) -> np.ndarray:
+    """品番×稼働日 の日割（daily_by_month は (年, 月) → 品番ごとの日割。無い月は 0）
+
+    2か月目以降の月初の稼働日は 0（月シートの G 列の数式は前月の最終列に入庫を足すだけのため）。
+    """
+    out = np.zeros((num_products, len(days)))
+    months = list(zip(days.year, days.month))
+    for n, key in enumerate(dict.fromkeys(months)):
+        cols = np.array([m == key for m in months])
+        values = daily_by_month.get(key)
+        if values is not None:
+            out[:, cols] = np.nan_to_num(np.asarray(values, dtype=float))[:, None]
+        if n:
+            out[:, np.argmax(cols)] = 0.0
+    return out
+
+
+def fills_matrix(days: pd.DatetimeIndex, codes: Sequence[str], df_fills: pd.DataFrame) -> np.ndarray:
+    """品番×稼働日 の入庫（稼働日でない日の入庫は次の稼働日に計上、範囲外は除く）"""
+    out = np.zeros((len(codes), len(days)))
+    if df_fills is None or df_fills.empty or len(days) == 0:
+        return out
+    fills = df_fills.assign(_col=days.searchsorted(pd.DatetimeIndex(df_fills["日付"]), side="left"))
+    fills = fills[fills["_col"] < len(days)]
+    # 品番が重複する行にはそれぞれ計上する
+    rows = pd.DataFrame({"品番": list(codes), "_row": np.arange(len(codes))}).merge(fills, on="品番")
+    np.add.at(out, (rows["_row"].to_numpy(), rows["_col"].to_numpy()), rows["入庫"].to_numpy(dtype=float))
+    return out
+
+
+def project_inventory(stock: np.ndarray, demand: np.ndarray, fills: np.ndarray) -> np.ndarray:
+    """品番×稼働日 の在庫予測（先頭列は現在の在庫、以降は入庫 − 日割 を累積）"""
+    stock = np.nan_to_num(np.asarray(stock, dtype=float))
+    delta = fills - demand
+    if delta.shape[1]:
+        delta[:, 0] = 0.0  # 開始日の在庫数量には当日分を含むとみなす
+    return stock[:, None] + np.cumsum(delta, axis=1)
+
+
+def sheet_values(projected: np.ndarray, days: pd.DatetimeIndex, month_days: pd.DatetimeIndex) -> List[list]:
+    """月シートの G4 から書き込む値（製品行に在庫、入庫行と開始日より前の列は None＝書き込まない）"""
+    pos = days.get_indexer(month_days.normalize())
+    grid = []
+    for row in projected:
+        values = [None if p < 0 else round(float(row[p]), 2) for p in pos]
+        grid.append([int(v) if v is not None and v.is_integer() else v for v in values])
+        grid.append([None] * len(pos))
+    return grid
+
+
+def projection_frame(projected: np.ndarray, days: pd.DatetimeIndex, codes: Sequence[str],
+                     names: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """品番（・商品名）と日付ごとの列を並べた表（CSV 出力用）"""
+    out = pd.DataFrame(np.round(projected, 2), columns=[d.strftime("%Y/%m/%d") for d in days])
+    if names is not None:
+        out.insert(0, "商品名", list(names))
+    out.insert(0, "品番", list(codes))
+    return out
@@ -0,0 +1,163 @@
+"""Google API 呼び出しのクォータ制御（トークンバケット + Retry-After 対応リトライ）
+
+Sheets API の既定クォータ（ユーザーあたり 読取/書込 各60回/分）を超えないよう
+クライアント側で呼び出しを間引き、429/5xx は Retry-After を優先して待機し再実行する。
+"""
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from dp_scheduler import trace
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+MAX_BACKOFF = 64.0  # 秒
+DEFAULT_MAX_PAYLOAD = 2 * 1024 * 1024  # batchUpdate 1回あたりの本文サイズ上限（バイト）
+
+
+class TokenBucket:
+    """per_minute 回/分で補充されるトークンバケット（スレッドセーフ）"""
+
+    def __init__(self, per_minute: float, burst: int = 10,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.rate = per_minute / 60.0
+        self.capacity = float(max(1, burst))
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, n: float = 1) -> float:
+        """トークンを n 個取得（足りなければ待つ）。待った秒数を返す"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return waited
+                wait = (n - self.tokens) / self.rate
+            self.sleep(wait)
+            waited += wait
+
+    def drain(self):
+        """429 を受けたらバケットを空にして以降の呼び出しも控える"""
+        with self.lock:
+            self._refill()
+            self.tokens = 0.0
+
+
+def error_status(exc: Exception) -> Tuple[Optional[int], Optional[float]]:
+    """例外から HTTP ステータスと Retry-After（秒）を取り出す
+
+    gspread の APIError（.response）と googleapiclient の HttpError（.resp）に対応。
+    """
+    status, headers = None, {}
+    response = getattr(exc, "response", None)
+    resp = getattr(exc, "resp", None)
+    if response is not None and hasattr(response, "status_code"):
+        status = response.status_code
+        headers = getattr(response, "headers", None) or {}
+    elif resp is not None and hasattr(resp, "status"):
+        status = int(resp.status)
+        headers = resp
+    elif isinstance(getattr(exc, "code", None), int):
+        status = exc.code
+
+    retry_after = None
+    value = None
+    if hasattr(headers, "get"):
+        value = headers.get("Retry-After") or headers.get("retry-after")
+    if value is not None:
+        try:
+            retry_after = max(0.0, float(value))
+        except (TypeError, ValueError):
+            retry_after = None
+    return status, retry_after
+
+
+def split_by_payload(items: List, max_bytes: int = DEFAULT_MAX_PAYLOAD) -> List[List]:
+    """JSON にしたときの合計サイズが max_bytes 以下になるよう順序を保って分割"""
+    chunks, current, size = [], [], 2  # "[]"
+    for item in items:
+        n = len(json.dumps(item, ensure_ascii=False, default=str).encode("utf-8")) + 1
+        if current and size + n > max_bytes:
+            chunks.append(current)
+            current, size = [], 2
+        current.append(item)
+        size += n
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class RequestScheduler:
+    """読取/書込ごとのトークンバケットで呼び出しを間引き、失敗時は再試行する
+
+    call(func, ..., kind="read"|"write") で1回の API 呼び出しを行う。
+    run_parallel で独立したシートごとの処理を並行実行する（各呼び出しは同じバケットを共有）。
+    """
+
+    def __init__(self, read_per_minute: float = 60, write_per_minute: float = 60, burst: int = 10,
+                 retries: int = 5, max_workers: int = 4, max_payload: int = DEFAULT_MAX_PAYLOAD,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.buckets: Dict[str, TokenBucket] = {
+            "read": TokenBucket(read_per_minute, burst, clock=clock, sleep=sleep),
+            "write": TokenBucket(write_per_minute, burst, clock=clock, sleep=sleep),
+        }
+        self.retries = retries
+        self.max_workers = max_workers
+        self.max_payload = max_payload
+        self.sleep = sleep
+        self.stats = {"calls": 0, "retries": 0, "throttled_seconds": 0.0}
+        self._lock = threading.Lock()
+
+    def _count(self, key: str, value=1):
+        with self._lock:
+            self.stats[key] += value
+        trace.count(f"api.{key}", value)
+
+    def call(self, func: Callable, *args, kind: str = "write", **kwargs):
+        """クォータ内で func を呼び出す（429/5xx は Retry-After または指数バックオフで再試行）"""
+        bucket = self.buckets[kind]
+        for attempt in range(self.retries + 1):
+            self._count("throttled_seconds", bucket.acquire())
+            self._count("calls")
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                status, retry_after = error_status(e)
+                if status not in RETRYABLE_STATUS or attempt == self.retries:
+                    raise
+                if status == 429:
+                    bucket.drain()
+                wait = retry_after if retry_after is not None else min(MAX_BACKOFF, 2 ** attempt) * random.uniform(0.5, 1.0)
+                print(f"    ⏳ APIエラー({status})、{wait:.1f}秒待機してリトライ...")
+                self._count("retries")
+                self.sleep(wait)
+
+    def read(self, func: Callable, *args, **kwargs):
+        return self.call(func, *args, kind="read", **kwargs)
+
+    def batch_update(self, spreadsheet, requests: List[dict]) -> int:
+        """spreadsheets.batchUpdate を本文サイズで分割して順に送る。送信回数を返す"""
+        chunks = split_by_payload(requests, self.max_payload)
+        for chunk in chunks:
+            self.call(spreadsheet.batch_update, {"requests": chunk})
+        return len(chunks)
+
+    def run_parallel(self, func: Callable, items: Iterable) -> List:
+        """items の各要素に func を並行適用し、入力順に結果を返す"""
+        items = list(items)
+        if self.max_workers <= 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as ex:
+            return list(ex.map(func, items))
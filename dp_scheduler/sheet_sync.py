@@ -0,0 +1,300 @@
+"""月別シート（yyyy/mm）の差分書き込み
+
+前回の内容（シートの現在値、または前回出力時のローカルスナップショット）と比べ、
+変わったセルだけを書き込む（A～F列の表・G列以降の在庫推移とも）。
+セル結合も増えた行の追加・減った行の解除だけを行う。
+"""
+import os
+import re
+import json
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from dp_scheduler.quota import RequestScheduler, split_by_payload
+
+HEADER_ROW = 3      # A3 にヘッダー
+DATA_START_ROW = 4  # 4行目からデータ（1行おきに空行）
+
+
+def col_letter(n: int) -> str:
+    """列番号（1始まり）をA1形式の列名に変換"""
+    s = ""
+    while n > 0:
+        n, r = divmod(n - 1, 26)
+        s = chr(65 + r) + s
+    return s
+
+
+def build_grid(df_out: pd.DataFrame) -> List[list]:
+    """A3 から書き込む内容（ヘッダー + データ行と空行の交互）"""
+    num_cols = len(df_out.columns)
+    grid = [df_out.columns.tolist()]
+    for row in df_out.fillna("").values.tolist():
+        grid.append(row)
+        grid.append([""] * num_cols)
+    return grid
+
+
+def count_data_rows(grid: List[list]) -> int:
+    """グリッド中の製品行数（値のある最後のデータ行まで）"""
+    n = 0
+    for i in range(1, len(grid), 2):
+        if any(v not in ("", None) for v in grid[i]):
+            n = (i + 1) // 2
+    return n
+
+
+def _norm(v):
+    """シートの値と比較するための正規化（数値は float、文字列は前後空白除去）"""
+    if v is None:
+        return ""
+    if isinstance(v, bool):
+        return v
+    if isinstance(v, (int, float)):
+        return float(v)
+    s = str(v).strip()
+    try:
+        return float(s.replace(",", "")) if s else ""
+    except ValueError:
+        return s
+
+
+def _changed(o, n) -> bool:
+    """new の None は書き換えないセル（比較もしない）"""
+    return n is not None and _norm(o) != _norm(n)
+
+
+def diff_grid(old: List[list], new: List[list], num_cols: int, first_row: int = HEADER_ROW,
+              first_col: int = 1) -> List[dict]:
+    """変更セルを行ごとに範囲化し、連続する同じ列範囲の行はまとめる（グリッド先頭が first_row 行目・first_col 列目）
+
+    範囲内の変わっていない None のセルは null として送られ、Sheets API は書き換えない。
+    """
+    rows = max(len(old), len(new))
+    changes = []  # (行index, 開始列, 終了列)
+    for i in range(rows):
+        o = old[i] if i < len(old) else []
+        n = new[i] if i < len(new) else []
+        cols = [j for j in range(num_cols)
+                if _changed(o[j] if j < len(o) else "", n[j] if j < len(n) else "")]
+        if cols:
+            changes.append((i, cols[0], cols[-1]))
+
+    data = []
+    for i, c0, c1 in changes:
+        values = [(new[i][j] if i < len(new) and j < len(new[i]) else "") for j in range(c0, c1 + 1)]
+        last = data[-1] if data else None
+        if last and last["_span"] == (c0, c1) and last["_end"] == i - 1:
+            last["values"].append(values)
+            last["_end"] = i
+        else:
+            data.append({"_span": (c0, c1), "_start": i, "_end": i, "values": [values]})
+
+    return [{
+        "range": f"{col_letter(d['_span'][0] + first_col)}{first_row + d['_start']}:"
+                 f"{col_letter(d['_span'][1] + first_col)}{first_row + d['_end']}",
+        "values": d["values"],
+    } for d in data]
+
+
+def merge_requests(sheet_id: int, first: int, last: int, num_cols: int) -> List[dict]:
+    """製品行 first..last-1 の A～F 列を2行ずつ縦結合（1行につき1リクエスト）"""
+    reqs = []
+    for i in range(first, last):
+        row_api = DATA_START_ROW - 1 + i * 2
+        reqs.append({
+            "mergeCells": {
+                "range": {
+                    "sheetId": sheet_id,
+                    "startRowIndex": row_api,
+                    "endRowIndex": row_api + 2,
+                    "startColumnIndex": 0,
+                    "endColumnIndex": num_cols
+                },
+                "mergeType": "MERGE_COLUMNS"
+            }
+        })
+    return reqs
+
+
+def unmerge_request(sheet_id: int, first: int, last: int, num_cols: int) -> dict:
+    """製品行 first..last-1 の結合をまとめて解除"""
+    return {
+        "unmergeCells": {
+            "range": {
+                "sheetId": sheet_id,
+                "startRowIndex": DATA_START_ROW - 1 + first * 2,
+                "endRowIndex": DATA_START_ROW - 1 + last * 2,
+                "startColumnIndex": 0,
+                "endColumnIndex": num_cols
+            }
+        }
+    }
+
+
+class SheetSnapshot:
+    """前回出力したグリッドをローカルJSONに保存する
+
+    書込の前に discard() で前回分を消し、書込後は stage() で控えておき、
+    結合も含めてすべて成功してから commit() で保存する（途中で失敗したシートは次回シートを読み直す）。
+    """
+
+    def __init__(self, snapshot_dir: str, spreadsheet_key: str):
+        self.dir = os.path.join(snapshot_dir, spreadsheet_key)
+        self.staged: Dict[str, dict] = {}
+
+    def _path(self, sheet_name: str) -> str:
+        return os.path.join(self.dir, sheet_name.replace("/", "_") + ".json")
+
+    def load(self, sheet_name: str, sheet_id: int) -> Optional[List[list]]:
+        """スナップショットを取得（シートが作り直されていれば None）"""
+        path = self._path(sheet_name)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return data.get("grid") if data.get("sheet_id") == sheet_id else None
+
+    def save(self, sheet_name: str, sheet_id: int, grid: List[list]):
+        os.makedirs(self.dir, exist_ok=True)
+        tmp = self._path(sheet_name) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"sheet_id": sheet_id, "grid": grid}, f, ensure_ascii=False, default=str)
+        os.replace(tmp, self._path(sheet_name))
+
+    def discard(self, sheet_name: str):
+        """シートへ書き込む前に前回分を消す（書込途中で失敗しても古い内容と比べないように）"""
+        self.staged.pop(sheet_name, None)
+        try:
+            os.remove(self._path(sheet_name))
+        except FileNotFoundError:
+            pass
+
+    def stage(self, sheet_name: str, sheet_id: int, grid: List[list]):
+        """書き込んだ内容を控える（commit() まで保存しない）"""
+        self.staged[sheet_name] = {"sheet_id": sheet_id, "grid": grid}
+
+    def commit(self):
+        """控えた内容を保存する（すべての書込・結合が成功した後に呼ぶ）"""
+        for sheet_name, data in self.staged.items():
+            self.save(sheet_name, data["sheet_id"], data["grid"])
+        self.staged.clear()
+
+
+def read_sheet_grid(ws, num_cols: int, scheduler: RequestScheduler, first_row: int = HEADER_ROW,
+                    first_col: int = 1) -> List[list]:
+    """シートの first_row 行目・first_col 列目（既定は A3）以降の現在値（書式適用前の値）を取得"""
+    rng = f"{col_letter(first_col)}{first_row}:{col_letter(first_col + num_cols - 1)}{ws.row_count}"
+    values = scheduler.read(ws.get, rng, value_render_option="UNFORMATTED_VALUE")
+    return [list(r) + [""] * (num_cols - len(r)) for r in values]
+
+
+def sync_month_sheet(
+    ws,
+    df_out: pd.DataFrame,
+    snapshot: Optional[SheetSnapshot] = None,
+    use_snapshot: bool = False,
+    scheduler: Optional[RequestScheduler] = None,
+    log: Callable[[str], None] = print,
+) -> List[dict]:
+    """差分だけをシートへ書き込み、結合の追加/解除リクエストを返す
+
+    use_snapshot=True ならスナップショットを前回値として使い（無ければシートを読む）、
+    False ならシートの現在値を読んで比較する。書き込んだ内容は snapshot に控えるだけなので、
+    結合リクエストを送った後に snapshot.commit() で保存する。進捗は log に渡す。
+    """
+    scheduler = scheduler or RequestScheduler()
+    num_cols = len(df_out.columns)
+    new = build_grid(df_out)
+
+    old = snapshot.load(ws.title, ws.id) if (snapshot and use_snapshot) else None
+    if old is None:
+        old = read_sheet_grid(ws, num_cols, scheduler)
+    if snapshot:
+        snapshot.discard(ws.title)
+
+    old_n, new_n = count_data_rows(old), len(df_out)
+
+    # 行数が足りなければ追加
+    needed = HEADER_ROW + len(new) - 1
+    if ws.row_count < needed:
+        scheduler.call(ws.add_rows, needed - ws.row_count)
+
+    data = diff_grid(old, new, num_cols)
+    for chunk in split_by_payload(data, scheduler.max_payload):
+        scheduler.call(ws.batch_update, chunk, value_input_option='USER_ENTERED')
+    cells = sum(len(d["values"]) * len(d["values"][0]) for d in data)
+
+    requests = []
+    if new_n > old_n:
+        requests += merge_requests(ws.id, old_n, new_n, num_cols)
+    elif new_n < old_n:
+        requests.append(unmerge_request(ws.id, new_n, old_n, num_cols))
+
+    if snapshot:
+        snapshot.stage(ws.title, ws.id, new)
+    log(f"    ✓ '{ws.title}': {new_n:,}行 / 変更 {cells:,}セル / 結合追加 {max(new_n - old_n, 0):,}行 / 解除 {max(old_n - new_n, 0):,}行")
+    return requests
+
+
+def sync_inventory(
+    ws,
+    grid: List[list],
+    first_col: int,
+    snapshot: Optional[SheetSnapshot] = None,
+    use_snapshot: bool = False,
+    scheduler: Optional[RequestScheduler] = None,
+    log: Callable[[str], None] = print,
+) -> int:
+    """在庫推移（DATA_START_ROW 行目・first_col 列目から。None のセルは書き換えない）の差分だけを値で書き込む
+
+    前回値の取り方・snapshot の扱いは sync_month_sheet と同じ（スナップショットは「シート名#inventory」）。
+    書き込んだセル数を返す。
+    """
+    scheduler = scheduler or RequestScheduler()
+    name = f"{ws.title}#inventory"
+    rows, num_cols = len(grid) // 2, len(grid[0])
+    last_col = first_col + num_cols - 1
+    if ws.col_count < last_col:
+        scheduler.call(ws.add_cols, last_col - ws.col_count)
+
+    old = snapshot.load(name, ws.id) if (snapshot and use_snapshot) else None
+    if old is None:
+        old = read_sheet_grid(ws, num_cols, scheduler, first_row=DATA_START_ROW, first_col=first_col)
+    if snapshot:
+        snapshot.discard(name)
+    # 減った製品行の在庫推移は消す（入庫行は書き換えない）
+    grid = grid + [[""] * num_cols if k % 2 == 0 else [None] * num_cols for k in range(len(old) - len(grid))]
+
+    data = diff_grid(old, grid, num_cols, first_row=DATA_START_ROW, first_col=first_col)
+    for chunk in split_by_payload(data, scheduler.max_payload):
+        scheduler.call(ws.batch_update, chunk, value_input_option='RAW')
+    cells = sum(v is not None for d in data for row in d["values"] for v in row)
+
+    if snapshot:
+        snapshot.stage(name, ws.id, grid)
+    log(f"    ✓ '{ws.title}': 在庫推移 {rows:,}行 × {num_cols}日 / 変更 {cells:,}セル")
+    return cells
+
+
+def month_order_requests(worksheets) -> List[dict]:
+    """yyyy/mm シートを月順に先頭から並べる updateSheetProperties リクエスト"""
+    months = []
+    for ws in worksheets:
+        if re.match(r'^\d{4}/\d{2}$', ws.title):
+            try:
+                months.append((datetime.strptime(ws.title, "%Y/%m"), ws))
+            except ValueError:
+                pass
+    months.sort(key=lambda x: x[0])
+    return [{
+        "updateSheetProperties": {
+            "properties": {"sheetId": ws.id, "index": idx},
+            "fields": "index"
+        }
+    } for idx, (_, ws) in enumerate(months)]
@@ -0,0 +1,95 @@
+"""在庫推移からの欠品予測（shortage_list.csv）
+
+projection.py の 品番×稼働日 の在庫推移に対し、品番ごとに安全在庫を下回る最初の稼働日と
+0 を下回る最初の稼働日を行列演算で一度に求める。安全在庫割れの日から発注リードタイム分
+（稼働日）さかのぼった日を最終仕込日とし、欠品の早い順に並べる。
+"""
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from dp_scheduler.workcalendar import WorkCalendar
+from dp_scheduler.monthly import pretty_num_series
+
+SHORTAGE_COLUMNS = [
+    "順位", "品番", "商品名", "在庫数量", "安全在庫", "安全在庫割れ日", "欠品日",
+    "最小在庫", "不足数量", "発注リードタイム", "最終仕込日", "状態",
+]
+DATE_COLUMNS = ["安全在庫割れ日", "欠品日", "最終仕込日"]
+STATUS_LATE = "手配遅れ"   # 最終仕込日が今日より前（またはカレンダーより前）
+STATUS_TODO = "要手配"
+
+
+def first_below(projected: np.ndarray, threshold) -> np.ndarray:
+    """行ごとに threshold を下回る最初の列（無ければ -1）"""
+    threshold = np.asarray(threshold, dtype=float)
+    if threshold.ndim:
+        threshold = threshold[:, None]
+    below = projected < threshold
+    idx = below.argmax(axis=1)
+    idx[~below.any(axis=1)] = -1
+    return idx
+
+
+def _take_days(days: pd.DatetimeIndex, idx: np.ndarray) -> pd.DatetimeIndex:
+    out = np.full(len(idx), np.datetime64("NaT"), dtype="datetime64[ns]")
+    hit = idx >= 0
+    out[hit] = days.to_numpy(dtype="datetime64[ns]")[idx[hit]]
+    return pd.DatetimeIndex(out)
+
+
+def detect_shortages(projected: np.ndarray, days: pd.DatetimeIndex, safety: np.ndarray,
+                     lead_time: np.ndarray, calendar: WorkCalendar, today: pd.Timestamp,
+                     codes: Sequence[str], names: Optional[Sequence[str]] = None,
+                     log: Callable[[str], None] = print) -> pd.DataFrame:
+    """安全在庫を下回る品番の一覧（欠品日 → 安全在庫割れ日 → 不足数量の大きい順）
+
+    最終仕込日が today より前なら手配遅れ。days（在庫推移の期間）が空か today を含まなければ空の一覧を返す。
+    """
+    today = pd.Timestamp(today)
+    today = (today.tz_localize(None) if today.tzinfo else today).normalize()
+    if not len(days) or not days[0] <= today <= days[-1]:
+        span = f"{days[0]:%Y/%m/%d}～{days[-1]:%Y/%m/%d}" if len(days) else "なし"
+        log(f"  ⚠️ 警告: 在庫推移の期間（{span}）が今日（{today:%Y/%m/%d}）を含まないため欠品予測をスキップ")
+        return pd.DataFrame(columns=SHORTAGE_COLUMNS).astype({col: "datetime64[ns]" for col in DATE_COLUMNS})
+
+    safety = np.nan_to_num(np.asarray(safety, dtype=float))
+    lead = np.ceil(np.nan_to_num(np.asarray(lead_time, dtype=float))).astype(np.int64)
+
+    idx_safety = first_below(projected, safety)
+    idx_zero = first_below(projected, 0.0)
+    rows = np.flatnonzero(idx_safety >= 0)
+
+    low = projected[rows].min(axis=1) if projected.shape[1] else np.zeros(len(rows))
+    safety_day = _take_days(days, idx_safety[rows])
+    latest = calendar.offset(safety_day, -lead[rows])
+    late = latest.isna() | (latest < today)
+
+    out = pd.DataFrame({
+        "品番": np.asarray(codes, dtype=object)[rows],
+        "商品名": np.asarray(names, dtype=object)[rows] if names is not None else "",
+        "在庫数量": projected[rows, 0],
+        "安全在庫": safety[rows],
+        "安全在庫割れ日": safety_day,
+        "欠品日": _take_days(days, idx_zero[rows]),
+        "最小在庫": low,
+        "不足数量": np.maximum(safety[rows] - low, 0.0),
+        "発注リードタイム": lead[rows],
+        "最終仕込日": latest,
+        "状態": np.where(late, STATUS_LATE, STATUS_TODO),
+    })
+    out = out.sort_values(["欠品日", "安全在庫割れ日", "不足数量"], ascending=[True, True, False],
+                          na_position="last", kind="stable").reset_index(drop=True)
+    out.insert(0, "順位", np.arange(1, len(out) + 1))
+    return out[SHORTAGE_COLUMNS]
+
+
+def format_shortages(df: pd.DataFrame) -> pd.DataFrame:
+    """CSV 出力用（日付は yyyy/mm/dd、数量は整数なら小数点なし・小数は2桁）"""
+    out = df.copy()
+    for col in DATE_COLUMNS:
+        out[col] = out[col].dt.strftime("%Y/%m/%d").fillna("")
+    for col in ["在庫数量", "安全在庫", "最小在庫", "不足数量"]:
+        out[col] = pretty_num_series(out[col])
+    return out
@@ -0,0 +1,115 @@
+"""拠点別 Base ファイル（base_file.csv / base_file_k.csv / base_file_m.csv …）の集計
+
+拠点ごとの品番別 件数・平均・偏差平方和 をプロセスプールで並行して求め、
+Chan の式でそのまま合算して全拠点の移動平均・標準偏差にする（全行を1ファイルにまとめて
+集計した場合と同じ値）。
+"""
+import os
+import re
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from dp_scheduler.basestats import (
+    MOMENT_COLUMNS, combine_moments, finalize_moments, stream_base_moments,
+    moments_to_frame, frame_to_moments,
+)
+from dp_scheduler.usagestore import UsageStore
+
+SITE_PATTERNS = ["base_file"]
+SITE_FILE = re.compile(r"^base_file(?:_([^.]+))?\.csv$", re.IGNORECASE)
+MAIN_SITE = "main"  # base_file.csv（拠点名なし）
+ALL_SITES = "全拠点"
+
+
+def site_of(name: str) -> Optional[str]:
+    """ファイル名から拠点名（base_file_k.csv → "k"、base_file.csv → "main"）。対象外なら None"""
+    m = SITE_FILE.match(name)
+    if not m:
+        return None
+    return m.group(1) or MAIN_SITE
+
+
+def discover_sites(files: List[dict]) -> Dict[str, dict]:
+    """ファイル一覧から拠点ごとに1件（同名が複数あれば更新日時が新しいもの）"""
+    sites: Dict[str, dict] = {}
+    for info in files:
+        site = site_of(info['name'])
+        if site is None:
+            continue
+        prev = sites.get(site)
+        if prev is None or info.get('modifiedTime', '') > prev.get('modifiedTime', ''):
+            sites[site] = info
+    return dict(sorted(sites.items(), key=lambda kv: (kv[0] != MAIN_SITE, kv[0])))
+
+
+def site_moments_job(args: Tuple) -> Tuple[str, pd.DataFrame]:
+    """1拠点分の集計（プロセスプールで実行）。(拠点名, 品番列付きの集計表) を返す
+
+    store_root を指定すると使用量ストアを更新してから期間の集計を取り出す。
+    """
+    site, content, file_info, start, store_root = args
+    if store_root:
+        store = UsageStore(store_root)
+        if store.enabled:
+            store.update(content, file_info)
+            return site, moments_to_frame(store.window_code_moments(start))
+    return site, moments_to_frame(stream_base_moments(content, start, label=file_info['name']))
+
+
+def site_content_job(site: str, file_info: dict, start, store_root: Optional[str],
+                     content: Optional[bytes]) -> Tuple[str, Optional[pd.DataFrame]]:
+    """ダウンロードの完了後に呼ぶ site_moments_job（取得に失敗していれば集計表は None）"""
+    if content is None:
+        return site, None
+    return site_moments_job((site, content, file_info, start, store_root))
+
+
+def site_pool(workers: int, prestart: bool = False) -> ProcessPoolExecutor:
+    """拠点の集計用のプロセスプール
+
+    spawn だと呼び出し元のスクリプト（1.py）が子プロセスで再実行されるため fork を使う。
+    prestart=True なら workers 個のプロセスを今すぐ起動する（スレッドを動かす前に fork しておくため）。
+    """
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork") if "fork" in methods else None
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    if prestart:
+        for future in [pool.submit(os.getpid) for _ in range(workers)]:
+            future.result()
+    return pool
+
+
+def run_site_jobs(jobs: List[Tuple], max_workers: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+    """拠点ごとの集計を並行実行（1拠点ならそのまま実行）"""
+    if not jobs:
+        return {}
+    if len(jobs) == 1 or max_workers == 1:
+        results = [site_moments_job(job) for job in jobs]
+    else:
+        with site_pool(min(len(jobs), max_workers or os.cpu_count() or 1)) as ex:
+            results = list(ex.map(site_moments_job, jobs))
+    return {site: frame for site, frame in results}
+
+
+def combine_sites(site_frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """拠点別の集計表を合算した品番別の集計（index は品番）"""
+    frames = [frame_to_moments(f) for f in site_frames.values() if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=MOMENT_COLUMNS)
+    stacked = pd.concat(frames)
+    return combine_moments(stacked, stacked.index.to_numpy())
+
+
+def site_stats_table(site_frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """拠点・品番・件数・移動平均・使用量標準偏差 の縦長の表（最後に全拠点の合算）"""
+    parts = []
+    for site, frame in list(site_frames.items()) + [(ALL_SITES, moments_to_frame(combine_sites(site_frames)))]:
+        moments = frame_to_moments(frame)
+        stats = finalize_moments(moments)
+        stats.insert(0, "拠点", site)
+        stats.insert(2, "件数", stats["品番"].map(moments["n"]).fillna(0).astype("int64").to_numpy())
+        parts.append(stats)
+    return pd.concat(parts, ignore_index=True)
@@ -0,0 +1,185 @@
+"""ベンチマーク・オフライン確認用の合成マスタ（実データと同じ形式・件数は指定可能）
+
+write_fixture(root, ...) は <root>/dp_Scheduler/Input/Master に次のファイルを出力する
+（1.py の DP_SCHEDULER_MASTER_DIR・2.py の DP_SCHEDULER_ROOT にそのまま渡せる構成）。
+- product.csv（cp932。品番・商品名・LT）
+- zaiko.xlsx（ヘッダーなし。B列=品番・D列=在庫数量）
+- 需要予測_本舗.csv / 需要予測_販売.csv（4月～3月。"計 1,234" 形式の値を含む）
+- workday.csv（"MM/dd" を1行に並べた形式。土日と年末年始は休み）
+- base/base_file.csv（20列。A列=日付・B列=品番・S列=使用量。sites を渡すと base_file_<拠点>.csv も）
+- log.csv（LogFrom.gs の付与後と同じ18列）
+- material_master.csv（素地・油脂仕込み量１・工程３・item_code）
+品番は 100000 からの連番、乱数は seed で固定する。
+"""
+import os
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from dp_scheduler.enrich import LOG_HEADERS
+
+# 件数の目安（SKU 数・Base の行数・log の行数）
+SIZES = {
+    "1k": {"skus": 1_000, "base_rows": 100_000, "log_rows": 2_000},
+    "10k": {"skus": 10_000, "base_rows": 1_000_000, "log_rows": 20_000},
+    "100k": {"skus": 100_000, "base_rows": 1_000_000, "log_rows": 200_000},
+}
+FY_MONTHS = [f"{m}月" for m in [4, 5, 6, 7, 8, 9, 10, 11, 12, 1, 2, 3]]
+BASE_COLUMNS = 20
+USAGE_POS = 18  # S列
+KETTLE_SIZES = [500, 800, 1000, 1200]
+SHORT_RECIPES = ["NR", "LC"]
+CALENDAR_START = "2025-10-01"  # workday.csv の先頭（log の充填日は 2.py の FILTER_START_DATE の既定に合わせる）
+
+
+def master_dir(root: str) -> str:
+    return os.path.join(root, "dp_Scheduler", "Input", "Master")
+
+
+def product_codes(skus: int) -> np.ndarray:
+    return (100000 + np.arange(skus)).astype(str)
+
+
+def recipe_names(count: int) -> list:
+    return SHORT_RECIPES + [f"R{i:03d}" for i in range(max(0, count - len(SHORT_RECIPES)))]
+
+
+def _popularity(rng: np.random.Generator, skus: int) -> np.ndarray:
+    """品番ごとの出現確率（少数の品番に集中する Zipf 風の分布）"""
+    weights = 1.0 / np.arange(1, skus + 1) ** 0.8
+    return rng.permutation(weights / weights.sum())
+
+
+def make_products(skus: int, rng: np.random.Generator) -> pd.DataFrame:
+    return pd.DataFrame({
+        "品番": product_codes(skus),
+        "商品名": [f"製品{i}" for i in range(skus)],
+        "LT": rng.integers(1, 15, skus),
+    })
+
+
+def make_zaiko(skus: int, rng: np.random.Generator) -> pd.DataFrame:
+    return pd.DataFrame({
+        0: "倉庫A",
+        1: product_codes(skus),
+        2: "在庫",
+        3: rng.integers(0, 30000, skus),  # 需要予測の数か月分
+    })
+
+
+def make_forecast(skus: int, rng: np.random.Generator, text_ratio: float = 0.4) -> pd.DataFrame:
+    """各月の値の text_ratio 程度を "計 1,234" 形式の文字列にする（空欄も少し混ぜる）"""
+    values = rng.integers(0, 5000, (skus, len(FY_MONTHS)))
+    cells = values.astype(object)
+    text = rng.random(values.shape) < text_ratio
+    cells[text] = [f"計 {v:,}" for v in values[text]]
+    cells[rng.random(values.shape) < 0.02] = ""
+    df = pd.DataFrame(cells, columns=FY_MONTHS)
+    df.insert(0, "品番", product_codes(skus))
+    return df
+
+
+def workdays(start: pd.Timestamp, months: int) -> pd.DatetimeIndex:
+    """start から months か月分の稼働日（平日のうち 12/29～1/3 を除く）"""
+    start = pd.Timestamp(start).normalize()
+    days = pd.bdate_range(start, start + pd.DateOffset(months=months) - pd.Timedelta(days=1))
+    holiday = ((days.month == 12) & (days.day >= 29)) | ((days.month == 1) & (days.day <= 3))
+    return days[~holiday]
+
+
+def make_base(rows: int, skus: int, end: pd.Timestamp, rng: np.random.Generator,
+              days: int = 365) -> pd.DataFrame:
+    """Base（A列=日付・B列=品番・S列=使用量、他は小さな整数）"""
+    codes = product_codes(skus)[rng.choice(skus, rows, p=_popularity(rng, skus))]
+    dates = pd.Timestamp(end).normalize() - pd.to_timedelta(rng.integers(0, days, rows), unit="D")
+    data = {f"c{i}": rng.integers(0, 10, rows) for i in range(BASE_COLUMNS)}
+    data["c0"] = dates.strftime("%Y/%m/%d")
+    data["c1"] = codes
+    data[f"c{USAGE_POS}"] = rng.gamma(2.0, 20.0, rows).round(1)
+    return pd.DataFrame(data)
+
+
+def make_materials(recipes: Sequence[str], rng: np.random.Generator) -> pd.DataFrame:
+    n = len(recipes)
+    return pd.DataFrame({
+        "素地": list(recipes),
+        "油脂仕込み量１": rng.choice(KETTLE_SIZES, n),
+        "工程３": np.where(rng.random(n) < 0.7, "x", ""),
+        "item_code": [f"I{i}" for i in range(n)],
+    })
+
+
+def make_log(rows: int, skus: int, recipes: Sequence[str], days: pd.DatetimeIndex,
+             rng: np.random.Generator, lines: int = 6) -> pd.DataFrame:
+    """付与済みの log（充填日は days から選び、少しだけ休日を混ぜる）"""
+    sku = rng.choice(skus, rows, p=_popularity(rng, skus))
+    recipe_of = rng.integers(0, len(recipes), skus)
+    line_of = rng.integers(1, lines + 1, skus)
+    fill = days[rng.integers(0, len(days), rows)]
+    off = rng.random(rows) < 0.01  # 土曜日（稼働日カレンダーにない充填日）
+    fill = fill.where(~off, fill + pd.offsets.Week(weekday=5))
+    cell = rng.integers(1, 40, rows)
+    per_cell = rng.integers(5, 30, skus)
+    ids = rng.integers(0, 2 ** 63, rows, dtype=np.int64)
+    df = pd.DataFrame({
+        "Account": "planner@example.com",
+        "code": product_codes(skus)[sku],
+        "productname": [f"製品{i}" for i in sku],
+        "cell": cell,
+        "day": fill.strftime("%Y/%m/%d"),
+        "ID": [f"{v:016x}" for v in ids],
+        "Timestamp": (fill - pd.Timedelta(days=7)).strftime("%Y/%m/%d 10:00:00"),
+        "CellPosition": "H4",
+        "Recipe": np.asarray(recipes, dtype=object)[recipe_of[sku]],
+        "BulkRecipe": "",
+        "purelevel": 1,
+        "preparation": 1,
+        "batchsize/1": 1,
+        "product/1": per_cell[sku],
+        "bulk": 1,
+        "requiredmaterials": cell,
+        "batchsize": cell * per_cell[sku],
+        "line": [f"L{v}" for v in line_of[sku]],
+    })
+    return df[LOG_HEADERS]
+
+
+def write_fixture(root: str, skus: int = 1_000, base_rows: int = 100_000, log_rows: int = 2_000,
+                  recipes: Optional[int] = None, sites: Sequence[str] = (),
+                  today: Optional[pd.Timestamp] = None, calendar_start: str = CALENDAR_START,
+                  calendar_months: int = 24, log_months: int = 3, seed: int = 0) -> Dict[str, str]:
+    """合成マスタ一式を出力し、{ファイルの種類: パス} を返す
+
+    log の充填日は calendar_start から log_months か月（2.py の FILTER_START_DATE の既定に合わせる）、
+    Base の日付は today までの1年間。素地の数は省略時 SKU 数の 1/20（10～200）。
+    """
+    rng = np.random.default_rng(seed)
+    today = pd.Timestamp.now().normalize() if today is None else pd.Timestamp(today)
+    folder = master_dir(root)
+    os.makedirs(os.path.join(folder, "base"), exist_ok=True)
+    paths = {}
+
+    def save_csv(key, name, df, encoding="utf-8-sig", **kwargs):
+        paths[key] = os.path.join(folder, name)
+        df.to_csv(paths[key], index=False, encoding=encoding, **kwargs)
+
+    save_csv("product", "product.csv", make_products(skus, rng), encoding="cp932")
+    paths["zaiko"] = os.path.join(folder, "zaiko.xlsx")
+    make_zaiko(skus, rng).to_excel(paths["zaiko"], index=False, header=False)
+    save_csv("honpo", "需要予測_本舗.csv", make_forecast(skus, rng))
+    save_csv("sales", "需要予測_販売.csv", make_forecast(skus, rng))
+
+    days = workdays(pd.Timestamp(calendar_start), calendar_months)
+    save_csv("workday", "workday.csv", pd.DataFrame([days.strftime("%m/%d")]), header=False)
+
+    for site in [""] + list(sites):
+        name = f"base_file_{site}.csv" if site else "base_file.csv"
+        save_csv(f"base_{site}" if site else "base", os.path.join("base", name),
+                 make_base(base_rows, skus, today, rng))
+
+    names = recipe_names(recipes or min(200, max(10, skus // 20)))
+    save_csv("material", "material_master.csv", make_materials(names, rng))
+    log_days = days[days < pd.Timestamp(calendar_start) + pd.DateOffset(months=log_months)]
+    save_csv("log", "log.csv", make_log(log_rows, skus, names, log_days, rng))
+    return paths
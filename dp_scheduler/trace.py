@@ -0,0 +1,260 @@
+"""処理段ごとの計測（所要時間・件数・API 呼び出し・メモリ）と実行ごとのトレース出力
+
+- Tracer.step(name): 1.py の [n/9] のような段を順に切り替える（前の段は自動で閉じる）
+- Tracer.span(name) / span(name): 段の中の処理（パース・ステージなど）を入れ子で計る
+- count(key, value) / rows(rows_in, rows_out): 開いている段すべてに加算する（スレッドから呼んでもよい）
+- Tracer.write(dir, chrome=True): trace_<名前>_YYYYMMDD_HHMMSS.json（と chrome://tracing 形式）を出力
+
+span / count / rows はモジュール関数でも呼べ、activate() した（または with で使っている）Tracer が無ければ何もしない
+（dp_scheduler 内の処理は Tracer を受け渡さずに計測点を置ける）。
+"""
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_active: Optional["Tracer"] = None
+
+
+def _rss_mb() -> Optional[float]:
+    """現在の常駐メモリ（MB。取得できなければ None）"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _peak_rss_mb(who=None) -> Optional[float]:
+    """プロセス開始からの最大常駐メモリ（MB。Linux の ru_maxrss は KB）"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who is None else who)
+    return usage.ru_maxrss / 1024
+
+
+def row_count(obj) -> Optional[int]:
+    """DataFrame・Series・ndarray の行数（それ以外は None）"""
+    shape = getattr(obj, "shape", None)
+    return int(shape[0]) if shape else None
+
+
+class Span:
+    """計測した1区間（開始・所要時間は実行開始からの秒）"""
+
+    def __init__(self, index: int, name: str, parent: Optional[int], start: float, thread: int):
+        self.index = index
+        self.name = name
+        self.parent = parent
+        self.start = start
+        self.duration: Optional[float] = None
+        self.thread = thread
+        self.counters: Dict[str, float] = {}
+        self.rows_in: Optional[int] = None
+        self.rows_out: Optional[int] = None
+        self.rss_start_mb = _rss_mb()
+        self.rss_end_mb: Optional[float] = None
+        self.peak_rss_mb: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        out = {"name": self.name, "parent": self.parent, "thread": self.thread,
+               "start": round(self.start, 6), "duration": round(self.duration or 0.0, 6),
+               "rows_in": self.rows_in, "rows_out": self.rows_out,
+               "rss_start_mb": self.rss_start_mb, "rss_end_mb": self.rss_end_mb,
+               "peak_rss_mb": self.peak_rss_mb}
+        out["counters"] = {k: round(v, 6) if isinstance(v, float) else v for k, v in self.counters.items()}
+        return out
+
+
+class Tracer:
+    """1回の実行の計測結果を集める"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = datetime.now()
+        self.spans: List[Span] = []
+        self.totals: Dict[str, float] = {}
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._main = threading.get_ident()
+        self._step: Optional[Span] = None
+
+    # --- 区間 ---
+    def _stack(self) -> List[Span]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def _open_stack(self) -> List[Span]:
+        """count() の加算先（このスレッドの最も内側の区間とその親。無ければ主スレッドの段）"""
+        stack = self._stack()
+        span = stack[-1] if stack else self._step
+        chain = []
+        while span is not None and span.duration is None:
+            chain.append(span)
+            span = self.spans[span.parent] if span.parent is not None else None
+        return chain[::-1]
+
+    def _open(self, name: str) -> Span:
+        stack = self._stack()
+        parent = stack[-1] if stack else self._step  # 別スレッドの区間は主スレッドの段の下に置く
+        if parent is not None and parent.duration is not None:
+            parent = None
+        with self._lock:
+            span = Span(len(self.spans), name, parent.index if parent is not None else None,
+                        time.perf_counter() - self._t0, threading.get_ident())
+            self.spans.append(span)
+        stack.append(span)
+        return span
+
+    def _close(self, span: Span):
+        span.duration = time.perf_counter() - self._t0 - span.start
+        span.rss_end_mb = _rss_mb()
+        span.peak_rss_mb = _peak_rss_mb()
+        stack = self._stack()
+        if span in stack:
+            stack.remove(span)
+
+    @contextmanager
+    def span(self, name: str):
+        span = self._open(name)
+        try:
+            yield span
+        finally:
+            self._close(span)
+
+    def step(self, name: str) -> Span:
+        """主スレッドの段を name に切り替える"""
+        self.end_step()
+        self._step = self._open(name)
+        return self._step
+
+    def end_step(self):
+        if self._step is not None and self._step.duration is None:
+            self._close(self._step)
+        self._step = None
+
+    # --- カウンタ ---
+    def count(self, key: str, value: float = 1):
+        spans = self._open_stack()
+        with self._lock:
+            self.totals[key] = self.totals.get(key, 0) + value
+            for span in spans:
+                span.counters[key] = span.counters.get(key, 0) + value
+
+    def rows(self, rows_in: Optional[int] = None, rows_out: Optional[int] = None):
+        spans = self._open_stack()
+        if not spans:
+            return
+        span = spans[-1]
+        with self._lock:
+            if rows_in is not None:
+                span.rows_in = (span.rows_in or 0) + int(rows_in)
+            if rows_out is not None:
+                span.rows_out = (span.rows_out or 0) + int(rows_out)
+
+    # --- 出力 ---
+    def finish(self):
+        self.end_step()
+
+    def summary(self) -> dict:
+        return {
+            "name": self.name,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "duration": round(time.perf_counter() - self._t0, 6),
+            "pid": os.getpid(),
+            "peak_rss_mb": _peak_rss_mb(),
+            "peak_rss_children_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+            "totals": {k: round(v, 6) if isinstance(v, float) else v for k, v in self.totals.items()},
+            "spans": [s.to_dict() for s in self.spans if s.duration is not None],
+        }
+
+    def chrome_events(self) -> dict:
+        """chrome://tracing・Perfetto で開ける形式（区間は "X"、時間はマイクロ秒）"""
+        pid = os.getpid()
+        threads = {tid: n for n, tid in enumerate(dict.fromkeys(s.thread for s in self.spans))}
+        events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": n,
+                   "args": {"name": "main" if tid == self._main else f"worker-{n}"}}
+                  for tid, n in threads.items()]
+        for s in self.spans:
+            if s.duration is None:
+                continue
+            args = dict(s.counters)
+            args.update({k: v for k, v in (("rows_in", s.rows_in), ("rows_out", s.rows_out),
+                                           ("peak_rss_mb", s.peak_rss_mb)) if v is not None})
+            events.append({"name": s.name, "cat": self.name, "ph": "X", "pid": pid, "tid": threads[s.thread],
+                           "ts": round(s.start * 1e6), "dur": round(s.duration * 1e6), "args": args})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write(self, out_dir: str, chrome: bool = False) -> str:
+        """トレースを保存してパスを返す（chrome=True なら .chrome.json も並べて出力）"""
+        self.finish()
+        os.makedirs(out_dir, exist_ok=True)
+        base = os.path.join(out_dir, f"trace_{self.name}_{self.started_at:%Y%m%d_%H%M%S}")
+        outputs = [(base + ".json", self.summary())]
+        if chrome:
+            outputs.append((base + ".chrome.json", self.chrome_events()))
+        for path, data in outputs:
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=1, default=str)
+            os.replace(tmp, path)
+        return outputs[0][0]
+
+    def report(self, top: int = 5) -> List[str]:
+        """所要時間の長い段（入れ子を除く）の一覧（表示用）"""
+        steps = sorted((s for s in self.spans if s.parent is None and s.duration is not None),
+                       key=lambda s: -s.duration)[:top]
+        lines = []
+        for s in steps:
+            peak = f" / 最大メモリ {s.peak_rss_mb:,.0f}MB" if s.peak_rss_mb is not None else ""
+            lines.append(f"{s.name}: {s.duration:.2f}秒{peak}")
+        return lines
+
+    # --- モジュール関数の対象 ---
+    def activate(self) -> "Tracer":
+        global _active
+        _active = self
+        return self
+
+    def deactivate(self):
+        global _active
+        if _active is self:
+            _active = None
+
+    def __enter__(self) -> "Tracer":
+        return self.activate()
+
+    def __exit__(self, *exc):
+        # 途中で例外になっても段を閉じ、以後のモジュール関数の計測先から外す
+        self.finish()
+        self.deactivate()
+
+
+def active() -> Optional[Tracer]:
+    return _active
+
+
+def span(name: str):
+    """activate() した Tracer の区間（無ければ何もしない）"""
+    return _active.span(name) if _active is not None else nullcontext()
+
+
+def count(key: str, value: float = 1):
+    if _active is not None:
+        _active.count(key, value)
+
+
+def rows(rows_in: Optional[int] = None, rows_out: Optional[int] = None):
+    if _active is not None:
+        _active.rows(rows_in, rows_out)
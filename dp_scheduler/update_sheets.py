@@ -0,0 +1,808 @@
+"""スプレッドシート更新（scheduler sync-sheets・1.py から run() を呼ぶ）
+
+マスター（Google Drive またはローカルフォルダ）を読み、月シート（yyyy/mm）に品番ごとの
+在庫数量・日割・移動平均・安全在庫と在庫推移を書き込む。import しただけでは何も実行しない。
+Google のクライアントライブラリは Drive・スプレッドシートを使う場合だけ読み込む。
+"""
+import io
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import partial
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from dp_scheduler.datasource import DriveDataSource, LocalDataSource, fetch_all, fetch_futures
+from dp_scheduler.cache import ParseCache
+from dp_scheduler.ingest import read_csv_flexible
+from dp_scheduler.forecast import normalize_forecast, combine_forecasts
+from dp_scheduler.monthly import build_product_frame, month_slices
+from dp_scheduler.sheet_sync import SheetSnapshot, sync_month_sheet, sync_inventory, month_order_requests
+from dp_scheduler.quota import RequestScheduler
+from dp_scheduler.workcalendar import WorkCalendar
+from dp_scheduler.basestats import finalize_moments, moments_to_frame
+from dp_scheduler.usagestore import UsageStore
+from dp_scheduler.sites import (SITE_PATTERNS, MAIN_SITE, discover_sites, run_site_jobs, site_pool,
+                                site_content_job, combine_sites, site_stats_table)
+from dp_scheduler.projection import (START_COL, fills_from_log, horizon_days, demand_matrix, fills_matrix,
+                                     project_inventory, sheet_values, projection_frame)
+from dp_scheduler.shortage import detect_shortages, format_shortages
+from dp_scheduler.auth import get_credentials, open_spreadsheet
+from dp_scheduler.overlap import then, resolve
+from dp_scheduler import trace
+
+# --- 0. 実行設定 ---
+# DP_SCHEDULER_SOURCE=local でローカルフォルダ（dp_Scheduler/Input/Master）から読み込み
+DATA_SOURCE = os.environ.get("DP_SCHEDULER_SOURCE", "drive")
+LOCAL_MASTER_DIR = os.environ.get("DP_SCHEDULER_MASTER_DIR", "/content/drive/My Drive/dp_Scheduler/Input/Master")
+OUTPUT_DIR = os.environ.get("DP_SCHEDULER_OUTPUT_DIR", "/content/drive/My Drive/dp_Scheduler/Output")
+# DP_SCHEDULER_SHEETS=off でスプレッドシート出力をスキップ、fake でローカルの代替シートへ出力（オフライン/CI用）
+SHEETS_MODE = os.environ.get("DP_SCHEDULER_SHEETS", "on")
+MAX_DOWNLOAD_WORKERS = 6
+# ダウンロード・整形・Base 集計・月シートの準備と書込を重ねて実行する
+# （False: 全ファイルを取得してから順に整形し、表と在庫推移がそろってからシートに書く）
+OVERLAP_IO = True
+PARSE_WORKERS = 4  # マスタの整形・在庫推移の計算を並行するスレッド数
+MASTER_FOLDER_ID = "13EoohP_R4zZXt5uMu_EgVR9ES8iwzBtc"  # config.gs の MASTER_FOLDER_ID と同じ
+CACHE_DIR = os.environ.get("DP_SCHEDULER_CACHE_DIR", os.path.expanduser("~/.cache/dp_scheduler"))
+CACHE_MAX_BYTES = 512 * 1024 * 1024  # 読込キャッシュの上限サイズ
+# True: 前回出力時のスナップショットと比較（シート読込を省略） / False: シートの現在値と比較
+USE_SHEET_SNAPSHOT = False
+PARSER_VERSION = 6  # マスタの整形処理を変えたら上げる（古いキャッシュを使わないため）
+BASE_WINDOW_MONTHS = 3  # 移動平均・標準偏差を求める期間（月）
+# Base の使用量を品番×日で保存し、追記分だけ集計する（期間を変えても再読込不要）
+USE_USAGE_STORE = True
+# 比較用に複数期間の移動平均・標準偏差を CACHE_DIR/base_windows_YYYYMMDD.csv に出力（空なら出力しない）
+BASE_COMPARE_WINDOWS = ()  # 例: (1, 3, 6, 12)
+BASE_COMPARE_WEEKDAYS_ONLY = False
+# base_file_k.csv・base_file_m.csv など拠点別の Base も集計し、全拠点を合算した統計を使う
+# （拠点別の統計は CACHE_DIR/base_sites_YYYYMMDD.csv に出力）
+BASE_MULTI_SITE = True
+BASE_SITE_WORKERS = 4  # 拠点の集計を並行するプロセス数
+# 在庫推移（在庫数量 − 日割 + log.csv の入庫）を値で月シートの G列以降・偶数行に書き込む（変わったセルだけ）
+# config.gs の inventoryFromPython と同じ値にする（切り替え方は config.gs を参照）。False でも欠品予測用に計算し、
+# 予測期間の全日付は CACHE_DIR/projection_YYYYMMDD.csv に出力
+INVENTORY_PROJECTION = False
+PROJECTION_MONTHS = 4  # 予測する月数（今月を含む）
+# 在庫推移で安全在庫・0 を下回る品番を OUTPUT_DIR/shortage_list.csv に出力（欠品の早い順）
+SHORTAGE_LIST = True
+SHEET_KEY = "1g3ZeCFzexguuu6q3r7kS3tOHqq44JtDarnnwd8wpRhc"
+# Sheets API のクォータ（ユーザーあたり/分）と、月シートを並行して書き込む数
+SHEETS_READ_PER_MINUTE = 60
+SHEETS_WRITE_PER_MINUTE = 60
+SHEET_WORKERS = 4
+# 段ごとの所要時間・件数・API 呼び出し・ダウンロード量・メモリを OUTPUT_DIR/trace_sheets_*.json に出力
+TRACE_OUTPUT = True
+TRACE_CHROME = False  # True: chrome://tracing・Perfetto で開ける .chrome.json も出力
+
+# キー → ファイル名パターン（先頭ほど優先）
+MASTER_PATTERNS = {
+    "product": ['product.csv', '製品.csv', '製品.xlsx'],
+    "zaiko": ['zaiko.xlsx', '在庫.xlsx'],
+    "honpo": ['需要予測_本舗.csv', '本舗.csv'],
+    "sales": ['需要予測_販売.csv', '販売.csv'],
+    "workday": ['workday.csv', '稼働日.csv', '営業日.csv'],
+    "base": ['base_file.csv', 'base.csv'],
+    "log": ['log.csv'],  # 在庫推移の入庫予定
+}
+
+# 需要予測として合算するキー（ファイルを増やす場合は MASTER_PATTERNS と両方に追加）
+FORECAST_KEYS = ["honpo", "sales"]
+
+FY_ORDER = ['4月','5月','6月','7月','8月','9月','10月','11月','12月','1月','2月','3月']
+
+
+def load_work_calendar(df_workday, today):
+    """workday.csv（MM/dd を1行に並べた形式）から稼働日カレンダーを作成（形式が違えば None）
+
+    年は先頭の月と today から推定する（workcalendar.CALENDAR_START_YEAR で固定した場合はその年）。
+    """
+    if df_workday is None or df_workday.empty:
+        return None
+    try:
+        return WorkCalendar.from_first_row(df_workday, today=today)
+    except ValueError:
+        return None
+
+def get_workdays(df_workday, work_calendar, year, month):
+    """稼働日数を取得（稼働日カレンダー → 年月/稼働日の表 → 営業日計算 の順）"""
+    if work_calendar is not None and work_calendar.covers_month(year, month):
+        return float(work_calendar.month_workdays(year, month))
+
+    if df_workday is None or work_calendar is not None:
+        s = pd.Timestamp(year, month, 1)
+        e = s + pd.offsets.MonthEnd(1)
+        return float(len(pd.date_range(start=s, end=e, freq="B")))
+
+    try:
+        # 1行目を列名とした表（年月・稼働日の列）から探す
+        df = df_workday.iloc[1:].copy()
+        df.columns = [str(c).strip() for c in df_workday.iloc[0]]
+        cur_ym, cur_m = f"{year}-{month:02d}", f"{month}月"
+
+        for mk in df.columns:
+            if any(k in mk for k in ["年月","月"]):
+                for wk in df.columns:
+                    if any(k in wk for k in ["稼働日","営業日"]):
+                        hit = df[df[mk].astype(str).str.contains(cur_ym)|df[mk].astype(str).str.contains(cur_m)]
+                        if not hit.empty:
+                            v = pd.to_numeric(hit[wk], errors='coerce').dropna()
+                            if not v.empty:
+                                return float(v.iloc[0])
+    except (IndexError, KeyError, ValueError, AttributeError):
+        # 空の表・列名の重複（df[mk] が表になる）などは表から探すのをやめて営業日計算にする
+        pass
+
+    s = pd.Timestamp(year, month, 1)
+    e = s + pd.offsets.MonthEnd(1)
+    return float(len(pd.date_range(start=s, end=e, freq="B")))
+
+# --- 各マスタの整形（キャッシュにはこの結果を保存） ---
+
+def parse_workday(file_content, file_info):
+    """稼働日CSV（ヘッダーなしで読み、値は文字列）"""
+    df = read_csv_flexible(file_content, label=file_info['name'], header=None).fillna("")
+    df.columns = [str(c) for c in df.columns]
+    return df.astype(str)
+
+def parse_product(file_content, file_info):
+    """製品マスタ（品番・商品名・発注リードタイム）"""
+    if file_info['name'].endswith(('.xlsx', '.xls')):
+        df_prod = pd.read_excel(file_content)
+    else:
+        df_prod = read_csv_flexible(file_content, label=file_info['name'])
+
+    df_prod.columns = [str(c).strip() for c in df_prod.columns]
+    df_prod = df_prod.rename(columns={
+        df_prod.columns[0]: "品番",
+        df_prod.columns[1]: "商品名"
+    })
+
+    if len(df_prod.columns) >= 3:
+        df_prod = df_prod.rename(columns={df_prod.columns[2]: "発注リードタイム"})
+    else:
+        df_prod["発注リードタイム"] = 0
+
+    df_prod["発注リードタイム"] = pd.to_numeric(df_prod["発注リードタイム"], errors='coerce').fillna(0)
+    df_prod["品番"] = df_prod["品番"].astype(str).str.strip()
+    return df_prod
+
+def parse_zaiko(file_content, file_info):
+    """在庫データ（品番ごとの在庫数量）"""
+    df_zaiko_raw = pd.read_excel(file_content, sheet_name=0, header=None)
+    df_zaiko = df_zaiko_raw.iloc[:, [1, 3]].copy()
+    df_zaiko.columns = ["品番", "在庫数量"]
+    df_zaiko["品番"] = df_zaiko["品番"].astype(str).str.strip()
+    df_zaiko["在庫数量"] = pd.to_numeric(df_zaiko["在庫数量"], errors='coerce').fillna(0)
+    return df_zaiko.groupby("品番", as_index=False)["在庫数量"].sum()
+
+def parse_forecast(file_content, file_info):
+    """需要予測CSV（品番 + 各月の数値）"""
+    df = read_csv_flexible(file_content, label=file_info['name'])
+    return normalize_forecast(df, FY_ORDER)
+
+def parse_log(file_content, file_info):
+    """log.csv（品番・日付ごとの入庫予定に集計）"""
+    return fills_from_log(read_csv_flexible(file_content, label=file_info['name']))
+
+MASTER_PARSERS = {
+    "product": parse_product,
+    "zaiko": parse_zaiko,
+    **{key: parse_forecast for key in FORECAST_KEYS},
+    "workday": parse_workday,
+    "log": parse_log,
+}
+
+
+def site_name(key: str) -> str:
+    """Base のキー（base / base_<拠点>）の拠点名"""
+    return MAIN_SITE if key == "base" else key[len("base_"):]
+
+
+class MasterLoader:
+    """マスタの取得・整形（キャッシュ → 使用量ストア → 整形中・ダウンロード済みファイルの順に使う）
+
+    base は期間内の品番別集計をキャッシュするため、集計開始日（base_start）もキャッシュのキーに含める。
+    """
+
+    def __init__(self, source, files_found: Dict[str, dict], cache_dir: str, base_start: pd.Timestamp):
+        self.source = source
+        self.files_found = files_found
+        self.cache_dir = cache_dir
+        self.base_start = base_start
+        self.base_keys = [k for k in files_found if k == "base" or k.startswith("base_")]
+        self.cache = ParseCache(os.path.join(cache_dir, "parsed"), max_bytes=CACHE_MAX_BYTES)
+        cache_names = {k: f"{k}@{base_start:%Y-%m-%d}" for k in self.base_keys}
+        self.cache_keys = {k: ParseCache.key(cache_names.get(k, k), info, PARSER_VERSION)
+                           for k, info in files_found.items()}
+        self.masters: Dict[str, pd.DataFrame] = {}
+        for key in files_found:
+            df_cached = self.cache.get(self.cache_keys[key])
+            if df_cached is not None:
+                self.masters[key] = df_cached
+        self.usage_stores: Dict[str, UsageStore] = {}
+        self.pending: Dict[str, Future] = {}  # キー → 整形済みマスタ・拠点の集計（OVERLAP_IO）
+        self.file_contents: Dict[str, bytes] = {}
+
+    def usage_root(self, key: str) -> str:
+        return os.path.join(self.cache_dir, "usage" if key == "base" else f"usage_{site_name(key)}")
+
+    def open_usage_stores(self):
+        """base は使用量ストア（拠点ごと）に反映済みなら、ダウンロードせずにストアから期間の集計を求める"""
+        for key in self.base_keys:
+            store = UsageStore(self.usage_root(key))
+            if not store.enabled:
+                break
+            self.usage_stores[key] = store
+        for key, store in self.usage_stores.items():
+            if key not in self.masters and store.is_current(self.files_found[key]):
+                self.masters[key] = moments_to_frame(store.window_code_moments(self.base_start))
+                self.cache.put(self.cache_keys[key], self.masters[key])
+
+    def to_fetch(self) -> Dict[str, dict]:
+        return {k: v for k, v in self.files_found.items() if k not in self.masters}
+
+    def parse(self, key: str, content: Optional[bytes]) -> Optional[pd.DataFrame]:
+        """ダウンロードしたマスタを整形（取得に失敗していれば None）"""
+        if content is None:
+            return None
+        with trace.span(f"parse:{key}"):
+            df = MASTER_PARSERS[key](io.BytesIO(content), self.files_found[key])
+            trace.rows(rows_out=trace.row_count(df))
+        return df
+
+    def site_job(self, key: str):
+        return partial(site_content_job, key, self.files_found[key], self.base_start,
+                       self.usage_root(key) if key in self.usage_stores else None)
+
+    def start(self, io_pool: Executor, parse_pool: Executor, process_pool: Optional[Executor] = None):
+        """ダウンロードを始め、届いたファイルから順に整形・拠点の集計を始める（OVERLAP_IO）"""
+        for key, future in fetch_futures(self.source, self.to_fetch(), io_pool).items():
+            if key in MASTER_PARSERS:
+                self.pending[key] = then(parse_pool, future, partial(self.parse, key))
+            elif key in self.base_keys:
+                self.pending[key] = then(process_pool or parse_pool, future, self.site_job(key))
+
+    def fetch(self):
+        """見つかったファイルをすべてダウンロードする（OVERLAP_IO でない場合）"""
+        self.file_contents = fetch_all(self.source, self.to_fetch(), max_workers=MAX_DOWNLOAD_WORKERS)
+
+    def load(self, key: str) -> Optional[pd.DataFrame]:
+        """整形済みマスタを取得（キャッシュ → 整形中・ダウンロード済みファイルの順）。無ければ None"""
+        if key in self.masters:
+            return self.masters[key]
+        if key in self.pending:
+            df = self.pending.pop(key).result()
+        else:
+            df = self.parse(key, self.file_contents.get(key))
+        if df is None:
+            return None
+        self.cache.put(self.cache_keys[key], df)
+        self.masters[key] = df
+        return df
+
+    def require(self, key: str, label: str) -> pd.DataFrame:
+        """必須のマスタを取得（見つからない・取得できなければ FileNotFoundError）"""
+        if not self.files_found.get(key):
+            raise FileNotFoundError(f"{label}が見つかりません")
+        df = self.load(key)
+        if df is None:
+            raise FileNotFoundError(f"{label}の取得に失敗しました")
+        return df
+
+    def read_forecast(self, key: str, labels) -> pd.DataFrame:
+        """需要予測を対象月に絞って取得（無い・読めなければ空の表）"""
+        try:
+            df = self.load(key)
+        except (KeyError, ValueError) as e:  # 品番列が無い・CSV として読めない
+            print(f"  ℹ️ {key}: 読込エラー: {e}")
+            return pd.DataFrame({"品番": []})
+        if df is None:
+            return pd.DataFrame({"品番": []})
+
+        df = df.copy()
+        for m in labels:
+            if m not in df.columns:
+                df[m] = np.nan
+        return df[["品番"] + list(labels)]
+
+    def load_base_sites(self) -> Dict[str, pd.DataFrame]:
+        """拠点ごとの Baseファイル（A列=日付, B列=品番, S列=使用量）の base_start 以降の品番別集計
+
+        キャッシュに無い拠点だけを並行して分割読込し（OVERLAP_IO ではダウンロード直後に始めた集計を待ち）、
+        {拠点名: 集計表} を返す。
+        """
+        jobs = [(key, self.file_contents[key], self.files_found[key], self.base_start,
+                 self.usage_root(key) if key in self.usage_stores else None)
+                for key in self.base_keys if key not in self.masters and key in self.file_contents]
+        waiting = [self.pending.pop(key) for key in self.base_keys if key in self.pending]
+        with trace.span("parse:base"):
+            frames = run_site_jobs(jobs, max_workers=BASE_SITE_WORKERS)
+            for future in waiting:
+                key, frame = future.result()
+                if frame is not None:
+                    frames[key] = frame
+            trace.rows(rows_out=sum(len(frame) for frame in frames.values()))
+        for key, frame in frames.items():
+            self.cache.put(self.cache_keys[key], frame)
+            self.masters[key] = frame
+        return {site_name(key): self.masters[key] for key in self.base_keys if key in self.masters}
+
+
+class SheetWriter:
+    """月シートの取得・作成・書込（Sheets API の呼び出しはすべて scheduler 経由でクォータ内に収める）
+
+    worksheet_not_found・api_error は gspread（または代替シート）の例外クラス。
+    月シートごとの表示は控えておき、そのシートの書込が終わったときにまとめて出す（並行書込で行が混ざらないように）。
+    """
+
+    def __init__(self, spreadsheet, scheduler: RequestScheduler, snapshot: SheetSnapshot,
+                 worksheet_not_found: type, api_error: type):
+        self.spreadsheet = spreadsheet
+        self.scheduler = scheduler
+        self.snapshot = snapshot
+        self.worksheet_not_found = worksheet_not_found
+        self.api_error = api_error
+        self.pending: Dict[str, Future] = {}  # シート名 → 書込準備済みのワークシート（OVERLAP_IO）
+        self.logs: Dict[str, List[str]] = {}  # シート名 → まだ表示していない行
+        self._print_lock = threading.Lock()
+
+    def log_for(self, sheet_name: str) -> Callable[[str], None]:
+        return self.logs.setdefault(sheet_name, []).append
+
+    def flush(self, sheet_name: str):
+        """控えた表示をまとめて出す"""
+        lines = self.logs.pop(sheet_name, [])
+        if lines:
+            with self._print_lock:
+                print("\n".join(lines), flush=True)
+
+    def get_or_create_worksheet(self, sheet_name: str, rows: int = 1000, cols: int = 20,
+                                log: Callable[[str], None] = print):
+        """シートを取得またはコピー作成"""
+        scheduler, spreadsheet = self.scheduler, self.spreadsheet
+        try:
+            ws = scheduler.read(spreadsheet.worksheet, sheet_name)
+            log(f"    ✓ '{sheet_name}' (既存)")
+            return ws
+        except self.worksheet_not_found:
+            try:
+                template = scheduler.read(spreadsheet.worksheet, "format")
+                new_ws = scheduler.call(
+                    spreadsheet.duplicate_sheet,
+                    source_sheet_id=template.id,
+                    new_sheet_name=sheet_name
+                )
+                log(f"    ✓ '{sheet_name}' (formatからコピー)")
+                return new_ws
+            except self.worksheet_not_found:
+                ws = scheduler.call(spreadsheet.add_worksheet, title=sheet_name, rows=rows, cols=cols)
+                log(f"    ✓ '{sheet_name}' (新規作成)")
+                return ws
+
+    def prepare_worksheet(self, sheet_name: str, rows: int = 1000, log: Callable[[str], None] = print):
+        """月シートを取得（無ければ作成）し、フィルタを解除する"""
+        ws = self.get_or_create_worksheet(sheet_name, rows=rows, cols=20, log=log)
+        try:
+            self.scheduler.call(ws.clear_basic_filter)
+        except self.api_error as e:  # フィルタが解除できなくても書込は続ける
+            log(f"    ℹ️ '{sheet_name}' フィルタ解除エラー: {e}")
+        return ws
+
+    def prepare_async(self, pool: Executor, sheet_names):
+        """月シートの取得・作成・フィルタ解除をダウンロード・集計の間に済ませておく"""
+        for name in sheet_names:
+            self.pending[name] = pool.submit(self.prepare_worksheet, name, log=self.log_for(name))
+
+    def write_month_sheet(self, sheet_name: str, df_out: pd.DataFrame, inventory=None,
+                          log: Callable[[str], None] = print) -> List[dict]:
+        """月シートへ変更セルだけを書き込み、セル結合の追加/解除リクエストを返す
+
+        inventory（在庫推移の値。計算中なら Future）があれば G4 からの前回値と比べて書き込む（None のセルは書き換えない）。
+        """
+        if sheet_name in self.pending:
+            ws = self.pending.pop(sheet_name).result()
+        else:
+            ws = self.prepare_worksheet(sheet_name, rows=len(df_out) * 2 + 10, log=log)
+
+        requests = sync_month_sheet(ws, df_out, snapshot=self.snapshot, use_snapshot=USE_SHEET_SNAPSHOT,
+                                    scheduler=self.scheduler, log=log)
+        inventory = resolve(inventory)
+        if inventory and inventory[0]:
+            sync_inventory(ws, inventory, START_COL, snapshot=self.snapshot, use_snapshot=USE_SHEET_SNAPSHOT,
+                           scheduler=self.scheduler, log=log)
+        return requests
+
+    def write_month_job(self, job) -> List[dict]:
+        sheet_name = job[0]
+        try:
+            with trace.span(f"sheet:{sheet_name}"):
+                trace.rows(rows_out=len(job[1]))
+                return self.write_month_sheet(*job, log=self.log_for(sheet_name))
+        finally:
+            self.flush(sheet_name)
+
+    def write_months(self, jobs) -> List[List[dict]]:
+        """月シートどうしは独立しているので並行して書き込む"""
+        return self.scheduler.run_parallel(self.write_month_job, jobs)
+
+    def merge_cells(self, requests: List[dict]):
+        """一括セル結合（失敗したら次回はシートを読み直して比べる）"""
+        try:
+            sent = self.scheduler.batch_update(self.spreadsheet, requests)
+            print(f"  ✓ {len(requests):,}件の結合/解除完了（{sent}回に分割して送信）")
+        except Exception as e:
+            print(f"結合エラー: {e}")
+            self.snapshot.staged.clear()
+
+    def reorder(self):
+        """月シートを月順に並べる（updateSheetProperties 1回の batchUpdate）"""
+        try:
+            all_worksheets = self.scheduler.read(self.spreadsheet.worksheets)
+            titles = {ws.id: ws.title for ws in all_worksheets}
+            order_requests = month_order_requests(all_worksheets)
+            if order_requests:
+                self.scheduler.batch_update(self.spreadsheet, order_requests)
+            for idx, req in enumerate(order_requests):
+                print(f"  {titles[req['updateSheetProperties']['properties']['sheetId']]} → 位置 {idx + 1}")
+        except Exception as e:
+            print(f"並べ替えエラー: {e}")
+
+
+def connect(data_source: str, master_dir: str, cache_dir: str, sheets_mode: str,
+            auth_mode: Optional[str] = None, key_file: Optional[str] = None):
+    """認証し、マスターの読み取り元と月シートの書込先を用意する
+
+    (データソース, SheetWriter) を返す（シートに出力しなければ SheetWriter は None）。
+    """
+    creds = None
+    if data_source == "drive" or sheets_mode == "on":
+        creds = get_credentials(auth_mode, key_file)
+    else:
+        print("  ✓ ローカル実行のため認証をスキップ")
+
+    # Google Sheets API接続（呼び出しはすべて scheduler 経由でクォータ内に収める）
+    writer = None
+    scheduler = RequestScheduler(SHEETS_READ_PER_MINUTE, SHEETS_WRITE_PER_MINUTE, max_workers=SHEET_WORKERS)
+    snapshot = SheetSnapshot(os.path.join(cache_dir, "sheets"), SHEET_KEY)
+    if sheets_mode == "fake":
+        from dp_scheduler.fake_sheets import FakeSpreadsheet, FakeAPIError, WorksheetNotFound
+        sh = FakeSpreadsheet(os.path.join(cache_dir, "fake_sheets.json"))
+        writer = SheetWriter(sh, scheduler, snapshot, WorksheetNotFound, FakeAPIError)
+        print(f"  ✓ ローカルの代替スプレッドシートに出力します")
+    elif sheets_mode != "off":
+        sh, not_found, api_error = open_spreadsheet(creds, SHEET_KEY)
+        writer = SheetWriter(sh, scheduler, snapshot, not_found, api_error)
+        print(f"  ✓ スプレッドシート接続完了")
+
+    # データソース（ファイル読み取り用）
+    if data_source == "local":
+        source = LocalDataSource(master_dir, manifest_path=os.path.join(cache_dir, "manifest_local.json"))
+        print(f"  ✓ ローカルフォルダ: {master_dir}")
+    else:
+        source = DriveDataSource(
+            creds,
+            folder_id=MASTER_FOLDER_ID,
+            manifest_path=os.path.join(cache_dir, f"manifest_{MASTER_FOLDER_ID}.json")
+        )
+        print(f"  ✓ Google Drive API接続完了")
+    return source, writer
+
+
+def discover_files(source) -> Dict[str, dict]:
+    """マスターフォルダを1回のクエリでまとめて探索（拠点別の Base は base_<拠点> として追加）"""
+    files_found = source.resolve(MASTER_PATTERNS)
+    for key in MASTER_PATTERNS:
+        file = files_found.get(key)
+        if file:
+            mark = "" if file.get('changed', True) else " (前回から変更なし)"
+            print(f"  ✓ {key:12s}: {file['name']}{mark}")
+        else:
+            print(f"{key:12s}: 見つかりません")
+
+    if BASE_MULTI_SITE:
+        for site, file in discover_sites(source.find_all(SITE_PATTERNS)).items():
+            if site == MAIN_SITE:
+                continue
+            files_found[f"base_{site}"] = file
+            mark = "" if file.get('changed', True) else " (前回から変更なし)"
+            print(f"  ✓ {'base_' + site:12s}: {file['name']}{mark}")
+    return files_found
+
+
+def month_workdays(df_workday, work_calendar, today: pd.Timestamp, window_labels) -> Dict[str, float]:
+    """対象月（今月から4か月）ごとの稼働日数"""
+    workdays_map = {}
+    for k, label in enumerate(window_labels):
+        dt = (today.tz_localize(None) + pd.DateOffset(months=k))
+        workdays_map[label] = get_workdays(df_workday, work_calendar, dt.year, dt.month)
+        print(f"  {dt.year}年{dt.month:02d}月 ({label}): {workdays_map[label]:.0f}日")
+    return workdays_map
+
+
+def base_statistics(loader: MasterLoader, today: pd.Timestamp) -> pd.DataFrame:
+    """全拠点を合算した品番別の移動平均・標準偏差（拠点別・期間比較の表も CACHE_DIR に出力）"""
+    if not loader.base_keys:
+        raise FileNotFoundError("Baseファイルが見つかりません")
+    site_frames = loader.load_base_sites()
+    if not site_frames:
+        raise FileNotFoundError("Baseファイルの取得に失敗しました")
+    df_stats = finalize_moments(combine_sites(site_frames))
+
+    if len(site_frames) > 1:
+        df_sites = site_stats_table(site_frames)
+        path_sites = os.path.join(loader.cache_dir, f"base_sites_{today:%Y%m%d}.csv")
+        df_sites.to_csv(path_sites, index=False, encoding="utf-8-sig")
+        counts = ", ".join(f"{site} {len(frame):,}" for site, frame in site_frames.items())
+        print(f"  ✓ 拠点別統計: {path_sites} ({counts})")
+
+    if BASE_COMPARE_WINDOWS:
+        usage_store = loader.usage_stores.get("base")
+        if usage_store is not None and usage_store.is_current(loader.files_found["base"]):
+            df_windows = usage_store.compare_windows(today.tz_localize(None), BASE_COMPARE_WINDOWS,
+                                                     weekdays_only=BASE_COMPARE_WEEKDAYS_ONLY)
+            path_windows = os.path.join(loader.cache_dir, f"base_windows_{today:%Y%m%d}.csv")
+            df_windows.to_csv(path_windows, index=False, encoding="utf-8-sig")
+            print(f"  ✓ 期間比較: {path_windows} ({len(df_windows):,}件)")
+        else:
+            print("  ℹ️ 使用量ストアが無いため期間比較をスキップ")
+    return df_stats
+
+
+def build_projection(loader: MasterLoader, df_joined: pd.DataFrame, df_workday, work_calendar,
+                     today: pd.Timestamp):
+    """品番×稼働日 の在庫推移を求め、(稼働日, 推移の行列) を返す（稼働日カレンダーが無い・今日を含まなければ None）"""
+    if work_calendar is None:
+        print("  ℹ️ 稼働日カレンダーが無いため在庫推移をスキップ")
+        return None
+    if not work_calendar.covers(today):
+        print("  ℹ️ 稼働日カレンダーが今日を含まないため在庫推移をスキップ")
+        return None
+    months = [today.tz_localize(None) + pd.DateOffset(months=k) for k in range(PROJECTION_MONTHS)]
+    labels = list(dict.fromkeys(f"{dt.month}月" for dt in months))
+    df_need_h = combine_forecasts([loader.read_forecast(key, labels) for key in FORECAST_KEYS], labels)
+    need = df_joined[["品番"]].merge(df_need_h, on="品番", how="left")
+
+    daily_by_month = {}
+    for dt in months:
+        wd = get_workdays(df_workday, work_calendar, dt.year, dt.month)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            daily = need[f"{dt.month}月"].to_numpy(dtype=float) / wd if wd else np.nan
+        daily_by_month[(dt.year, dt.month)] = np.round(daily, 2)  # シートの日割（D列）と同じ丸め
+
+    end = (months[-1] + pd.offsets.MonthEnd(0)).normalize()
+    days = horizon_days(work_calendar, today.tz_localize(None), end)
+    codes = df_joined["品番"].tolist()
+    df_fills = loader.load("log")
+    projected = project_inventory(
+        df_joined["在庫数量"].to_numpy(dtype=float),
+        demand_matrix(days, daily_by_month, len(codes)),
+        fills_matrix(days, codes, df_fills),
+    )
+    path_projection = os.path.join(loader.cache_dir, f"projection_{today:%Y%m%d}.csv")
+    projection_frame(projected, days, codes, df_joined["商品名"]).to_csv(path_projection, index=False, encoding="utf-8-sig")
+    fills_note = "" if df_fills is not None else "（log.csv が無いため入庫なし）"
+    print(f"  ✓ 在庫推移: {len(codes):,}品番 × {len(days)}日 → {path_projection}{fills_note}")
+    return days, projected
+
+
+def inventory_grid(work_calendar, sheet_name: str, projection):
+    """月シートの在庫推移の書込値（在庫推移を求めていなければ None）"""
+    if projection is None:
+        return None
+    month_start = pd.Timestamp(sheet_name.replace("/", "-") + "-01")
+    month_days = work_calendar.index.normalize()
+    month_days = month_days[(month_days >= month_start) & (month_days <= month_start + pd.offsets.MonthEnd(0))]
+    return sheet_values(projection[1], projection[0], month_days)
+
+
+def write_shortages(projection, df_joined: pd.DataFrame, work_calendar, today: pd.Timestamp,
+                    output_dir: str) -> pd.DataFrame:
+    """在庫推移で安全在庫・0 を下回る品番を output_dir/shortage_list.csv に出力"""
+    df_shortage = detect_shortages(
+        projection[1], projection[0],
+        safety=df_joined["安全在庫"].to_numpy(dtype=float),
+        lead_time=df_joined["発注リードタイム"].to_numpy(dtype=float),
+        calendar=work_calendar, today=today, codes=df_joined["品番"].tolist(), names=df_joined["商品名"].tolist(),
+    )
+    os.makedirs(output_dir, exist_ok=True)
+    path_shortage = os.path.join(output_dir, "shortage_list.csv")
+    format_shortages(df_shortage).to_csv(path_shortage, index=False, encoding="utf-8-sig")
+    print(f"  ✓ 欠品予測: {path_shortage} (安全在庫割れ {len(df_shortage):,}品番 / "
+          f"欠品 {df_shortage['欠品日'].notna().sum():,}品番)")
+    return df_shortage
+
+
+def run(data_source: Optional[str] = None, master_dir: Optional[str] = None, output_dir: Optional[str] = None,
+        cache_dir: Optional[str] = None, sheets_mode: Optional[str] = None,
+        auth_mode: Optional[str] = None, key_file: Optional[str] = None) -> Dict[str, object]:
+    """スプレッドシートを更新する（省略した引数は上の実行設定・環境変数の値）
+
+    sheets_mode は on / off / fake、auth_mode は dp_scheduler.auth.AUTH_MODES のいずれか。
+    結合済みの品番表・欠品予測・トレースのパスを返す。
+    """
+    data_source = data_source or DATA_SOURCE
+    master_dir = master_dir or LOCAL_MASTER_DIR
+    output_dir = output_dir or OUTPUT_DIR
+    cache_dir = cache_dir or CACHE_DIR
+    sheets_mode = sheets_mode or SHEETS_MODE
+
+    # 途中で失敗しても（FileNotFoundError など）プールを止め、トレースを無効にしてから抜ける
+    with trace.Tracer("sheets") as tracer:
+        with ExitStack() as pools:
+            df_joined, df_shortage = _update(tracer, pools, data_source, master_dir, output_dir, cache_dir,
+                                             sheets_mode, auth_mode, key_file)
+
+        path_trace = None
+        if TRACE_OUTPUT:
+            path_trace = tracer.write(output_dir, chrome=TRACE_CHROME)
+            print(f"\n  ✓ トレース: {path_trace}")
+            for line in tracer.report():
+                print(f"    - {line}")
+
+    # --- 9. 完了 ---
+    print("\n" + "=" * 60)
+    print("処理が完了しました！")
+    print("=" * 60)
+    print("\n次のステップ:")
+    print("1. スプレッドシートを開く:")
+    print(f"   https://docs.google.com/spreadsheets/d/{SHEET_KEY}/")
+    print("\n2. メニュー「📅 カレンダー管理」→「🔄 カレンダー更新」を実行")
+    print("\n※ G列以降にカレンダー情報が追加されます")
+    print("=" * 60)
+    return {"products": df_joined, "shortages": df_shortage, "trace": path_trace}
+
+
+def _update(tracer: trace.Tracer, pools: ExitStack, data_source: str, master_dir: str, output_dir: str,
+            cache_dir: str, sheets_mode: str, auth_mode: Optional[str], key_file: Optional[str]):
+    """run() の本体（作ったプールは pools に登録して run() の終わりに止める）。(品番表, 欠品予測) を返す"""
+    # --- 1. 認証（1回のみ） ---
+    print("=" * 60)
+    print("Google Colab - スプレッドシート更新プログラム")
+    print("=" * 60)
+
+    print("\n[1/9] 認証処理を開始します...")
+    tracer.step("auth")
+    source, writer = connect(data_source, master_dir, cache_dir, sheets_mode, auth_mode, key_file)
+
+    # --- 2. ファイル探索 ---
+    print("\n[2/9] マスターファイルを探索中...")
+    tracer.step("discover")
+    files_found = discover_files(source)
+
+    today = pd.Timestamp.now(tz='Asia/Tokyo')
+    base_start = (today - pd.DateOffset(months=BASE_WINDOW_MONTHS)).tz_localize(None)
+
+    # キャッシュ済みのものはダウンロード・読込ともにスキップ
+    loader = MasterLoader(source, files_found, cache_dir, base_start)
+    if USE_USAGE_STORE:
+        loader.open_usage_stores()
+
+    tracer.count("cache.hits", len(loader.masters))
+    month_sheet_names = [(today + pd.DateOffset(months=k)).strftime("%Y/%m") for k in range(4)]
+    io_pool = parse_pool = None
+    t0 = time.time()
+    if OVERLAP_IO:
+        # 拠点の集計プロセスは、スレッドを動かす前に fork しておく
+        base_fetch = [k for k in loader.base_keys if k in loader.to_fetch()]
+        process_pool = (site_pool(min(len(base_fetch), BASE_SITE_WORKERS), prestart=True)
+                        if len(base_fetch) > 1 and BASE_SITE_WORKERS > 1 else None)
+        io_pool = ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_WORKERS)
+        parse_pool = ThreadPoolExecutor(max_workers=PARSE_WORKERS)
+        for pool in (io_pool, parse_pool, process_pool):
+            if pool is not None:
+                pools.callback(pool.shutdown, cancel_futures=True)
+        loader.start(io_pool, parse_pool, process_pool)
+        # 月シートの取得・作成・フィルタ解除もダウンロード・集計の間に済ませる（API は scheduler のクォータ内）
+        if writer is not None:
+            writer.prepare_async(io_pool, month_sheet_names)
+        print(f"  ✓ キャッシュ利用 {len(loader.masters)}件 / ダウンロード {len(loader.pending)}件（届いたものから整形・集計）")
+    else:
+        loader.fetch()
+        print(f"  ✓ キャッシュ利用 {len(loader.masters)}件 / ダウンロード {len(loader.file_contents)}件 ({time.time() - t0:.1f}秒)")
+
+    # --- 3. 稼働日数計算 ---
+    print("\n[3/9] 稼働日数を計算中...")
+    tracer.step("calendar")
+
+    window_labels = [FY_ORDER[(FY_ORDER.index(f"{today.month}月") + k) % 12] for k in range(4)]
+    print(f"  対象月: {' → '.join(window_labels)}")
+
+    df_workday = loader.load("workday")
+    work_calendar = load_work_calendar(df_workday, today)
+    if work_calendar is not None:
+        print(f"  ✓ 稼働日カレンダー: {work_calendar.index[0]:%Y/%m/%d}～{work_calendar.index[-1]:%Y/%m/%d} ({len(work_calendar):,}日)")
+        if not work_calendar.covers(today):
+            print(f"  ⚠️ 警告: 稼働日カレンダーが今日（{today:%Y/%m/%d}）を含みません。workday.csv を出力し直すか、"
+                  f"DP_SCHEDULER_CALENDAR_START_YEAR を確認してください（在庫推移・欠品予測はスキップ）")
+    workdays_map = month_workdays(df_workday, work_calendar, today, window_labels)
+
+    # --- 4. マスターデータ読み込み ---
+    print("\n[4/9] マスターデータを読み込み中...")
+    tracer.step("masters")
+
+    df_prod = loader.require("product", "製品マスタ")
+    print(f"  ✓ 製品マスタ: {len(df_prod):,}件")
+    df_zaiko = loader.require("zaiko", "在庫ファイル")
+    print(f"  ✓ 在庫データ: {len(df_zaiko):,}件")
+
+    # --- 5. 需要予測データ ---
+    print("\n[5/9] 需要予測データを処理中...")
+    tracer.step("forecast")
+
+    df_need = combine_forecasts([loader.read_forecast(key, window_labels) for key in FORECAST_KEYS], window_labels)
+    for m in window_labels:
+        wd = workdays_map[m]
+        df_need[f"{m}日割"] = (df_need[m] / wd) if wd else np.nan
+
+    print(f"  ✓ 需要予測: {len(df_need):,}件")
+    tracer.rows(rows_out=len(df_need))
+
+    # --- 6. 移動平均・安全在庫 ---
+    print("\n[6/9] 移動平均・安全在庫を計算中...")
+    tracer.step("base_stats")
+
+    df_stats = base_statistics(loader, today)
+    print(f"  ✓ 統計データ: {len(df_stats):,}件")
+    tracer.rows(rows_out=len(df_stats))
+
+    # --- 7. Google Sheets出力 ---
+    print("\n[7/9] Google Sheetsへ出力中...")
+    tracer.step("sheets")
+
+    # データ結合・安全在庫計算は全月共通で1回だけ行い、月ごとに切り出す
+    df_joined = build_product_frame(df_prod, df_zaiko, df_need, df_stats, window_labels)
+    month_frames = month_slices(df_joined, window_labels)
+    projection_args = (loader, df_joined, df_workday, work_calendar, today)
+
+    sheets_future = None
+    if OVERLAP_IO and INVENTORY_PROJECTION and writer is not None:
+        # 表（A～F列）の書込と在庫推移の計算を重ねる（在庫推移は求まったシートから G列以降に書く）
+        projection_future = parse_pool.submit(build_projection, *projection_args)
+        month_jobs = [(name, month_frames[window_labels[k]],
+                       then(parse_pool, projection_future, partial(inventory_grid, work_calendar, name)))
+                      for k, name in enumerate(month_sheet_names)]
+        sheets_future = io_pool.submit(writer.write_months, month_jobs)
+        projection = projection_future.result()
+    else:
+        projection = build_projection(*projection_args) if INVENTORY_PROJECTION or SHORTAGE_LIST else None
+
+    df_shortage = None
+    if projection is not None and SHORTAGE_LIST:
+        df_shortage = write_shortages(projection, df_joined, work_calendar, today, output_dir)
+
+    if writer is None:
+        for k, sheet_name in enumerate(month_sheet_names):
+            print(f"    - '{sheet_name}': {len(month_frames[window_labels[k]]):,}行（シート出力スキップ）")
+    else:
+        if sheets_future is None:
+            # INVENTORY_PROJECTION が False なら G列以降は calendar.gs の数式に任せる
+            sheet_projection = projection if INVENTORY_PROJECTION else None
+            month_jobs = [(name, month_frames[window_labels[k]], inventory_grid(work_calendar, name, sheet_projection))
+                          for k, name in enumerate(month_sheet_names)]
+            sheets_future = writer.write_months(month_jobs)
+        merge_requests = [req for reqs in resolve(sheets_future) for req in reqs]
+
+        # 一括セル結合（増えた行の結合・減った行の解除のみ）
+        if merge_requests:
+            print("\n[8/9] セル結合を実行中...")
+            tracer.step("merge")
+            writer.merge_cells(merge_requests)
+        writer.snapshot.commit()
+
+    # --- 8. シート並べ替え ---
+    print("\n[9/9] シートを月順に並べ替え中...")
+    tracer.step("reorder")
+
+    if writer is not None:
+        writer.reorder()
+        if sheets_mode == "fake":
+            writer.spreadsheet.save()
+        stats = writer.scheduler.stats
+        print(f"  ✓ API呼び出し {stats['calls']:,}回 / リトライ {stats['retries']}回 / "
+              f"クォータ待ち {stats['throttled_seconds']:.1f}秒")
+    return df_joined, df_shortage
@@ -0,0 +1,249 @@
+"""品番×日の使用量集計ストア（任意の期間の移動平均・標準偏差を累積和で求める）
+
+Base ファイルの行を品番・日ごとの 行数・件数・合計・二乗和 にまとめて Parquet に保存する。
+ファイルが追記だけで変わった場合（前回読んだ部分のハッシュが同じ）は追記分の行だけを集計し、
+それ以外は作り直す。期間の統計は品番ごとの累積和の差から求めるため、期間の長さによらず
+品番数に比例する時間で済む。
+
+二乗和の桁落ちを避けるため、合計・二乗和は品番ごとの基準値（最初に現れた日の平均）を
+引いた値で持つ。
+"""
+import io
+import os
+import json
+import hashlib
+import importlib.util
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+from dp_scheduler.basestats import (
+    DATE_POS, iter_base_chunks, canonicalize_moments, finalize_moments, sniff_source,
+)
+
+STORE_VERSION = 1
+DAY_NS = 86_400 * 10**9
+DAY_BITS = 24  # 日の通し番号（1970-01-01 からの日数 + 2^23）を収めるビット数
+DAILY_COLUMNS = ["code", "day", "rows", "n", "s", "ss"]
+
+
+def file_stamp(file_info: dict) -> str:
+    """ファイルの版（Drive の md5Checksum、無ければ ID と更新日時）"""
+    return file_info.get("md5Checksum") or f"{file_info['id']}@{file_info.get('modifiedTime', '')}"
+
+
+def _sha1(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+class UsageStore:
+    """品番×日の集計（daily.parquet）と、現れた品番・基準値（codes.parquet）を保持する
+
+    pyarrow が無い環境では enabled=False（呼び出し側で stream_base_stats を使う）。
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.enabled = importlib.util.find_spec("pyarrow") is not None
+        if not self.enabled:
+            print("    ℹ️ pyarrow が無いため、使用量ストアは使いません")
+            return
+        os.makedirs(root, exist_ok=True)
+        self.meta = self._load_meta()
+        self._daily: Optional[pd.DataFrame] = None
+        self._codes: Optional[pd.DataFrame] = None
+        self._prefix = None
+
+    # 集計表は使うときに読む（反映済みかの確認だけなら meta.json のみ）
+    @property
+    def daily(self) -> pd.DataFrame:
+        if self._daily is None:
+            self._daily = self._read("daily.parquet", DAILY_COLUMNS)
+        return self._daily
+
+    @daily.setter
+    def daily(self, df: pd.DataFrame):
+        self._daily = df
+
+    @property
+    def codes(self) -> pd.DataFrame:
+        if self._codes is None:
+            self._codes = self._read("codes.parquet", ["code", "shift"])
+        return self._codes
+
+    @codes.setter
+    def codes(self, df: pd.DataFrame):
+        self._codes = df
+
+    # --- 保存 ---
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _load_meta(self) -> dict:
+        try:
+            with open(self._path("meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") == STORE_VERSION:
+                return meta
+        except (OSError, ValueError):
+            pass
+        return {"version": STORE_VERSION, "stamp": None, "offset": 0, "prefix_sha1": None, "date_format": None}
+
+    def _read(self, name: str, columns) -> pd.DataFrame:
+        if self.meta.get("stamp") is None or not os.path.exists(self._path(name)):
+            return pd.DataFrame(columns=columns)
+        return pd.read_parquet(self._path(name))
+
+    def _save(self):
+        # メタ情報を最後に置き換え、途中で止まったら次回は作り直す
+        if os.path.exists(self._path("meta.json")):
+            os.remove(self._path("meta.json"))
+        for name, df in [("daily.parquet", self.daily), ("codes.parquet", self.codes)]:
+            tmp = self._path(name + ".tmp")
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, self._path(name))
+        tmp = self._path("meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(tmp, self._path("meta.json"))
+
+    # --- 更新 ---
+    def is_current(self, file_info: dict) -> bool:
+        """file_info のファイルを反映済みか（ダウンロード不要か）"""
+        return self.meta.get("stamp") == file_stamp(file_info)
+
+    def update(self, content: bytes, file_info: dict) -> int:
+        """ファイルの内容を反映する。新たに集計した行数を返す"""
+        if self.is_current(file_info):
+            return 0
+        header_end = content.find(b"\n") + 1 or len(content)
+        offset = self.meta.get("offset") or 0
+        appended = (self.meta.get("stamp") is not None and header_end <= offset <= len(content)
+                    and _sha1(content[:offset]) == self.meta.get("prefix_sha1"))
+        if appended:
+            body = content[:header_end] + content[offset:]
+        else:
+            self.daily = pd.DataFrame(columns=DAILY_COLUMNS)
+            self.codes = pd.DataFrame(columns=["code", "shift"])
+            self.meta["date_format"] = self._guess_date_format(content)
+            body = content
+
+        rows = self._consume(body)
+        self.meta.update({"stamp": file_stamp(file_info), "offset": len(content), "prefix_sha1": _sha1(content)})
+        self._save()
+        self._prefix = None
+        mode = "追記分" if appended else "全件"
+        print(f"    使用量ストア更新（{mode}）: {rows:,}行 → {self.daily['code'].nunique():,}品番 / {len(self.daily):,}日")
+        return rows
+
+    @staticmethod
+    def _guess_date_format(content: bytes) -> Optional[str]:
+        encoding, sep = sniff_source(content)
+        head = pd.read_csv(io.BytesIO(content), encoding=encoding, sep=sep, usecols=[DATE_POS], nrows=1000,
+                           dtype=str).iloc[:, 0].dropna()
+        return guess_datetime_format(head.iloc[0]) if len(head) else None
+
+    def _consume(self, body: bytes) -> int:
+        seen, parts, rows = set(), [], 0
+        shifts = dict(zip(self.codes["code"], self.codes["shift"]))
+        for chunk in iter_base_chunks(body, None, seen_codes=seen, date_format=self.meta["date_format"]):
+            chunk = chunk[chunk["日付"].notna()]
+            rows += len(chunk)
+            if chunk.empty:
+                continue
+            day = chunk["日付"].dt.normalize()
+            # 新しい品番の基準値は、最初に現れた分の平均
+            new = pd.Series(chunk["使用量"].to_numpy()).groupby(chunk["品番"].to_numpy()).mean()
+            for code, v in new.items():
+                if code not in shifts or pd.isna(shifts[code]):
+                    shifts[code] = v
+            x = chunk["使用量"].to_numpy() - chunk["品番"].map(shifts).to_numpy(dtype=float)
+            valid = ~np.isnan(x)
+            x0 = np.where(valid, x, 0.0)
+            parts.append(pd.DataFrame({
+                "code": chunk["品番"].to_numpy(), "day": day.to_numpy(),
+                "rows": 1, "n": valid.astype(np.int64), "s": x0, "ss": x0 * x0,
+            }).groupby(["code", "day"], as_index=False).sum())
+
+        for code in seen:
+            shifts.setdefault(code, np.nan)
+        self.codes = pd.DataFrame({"code": list(shifts), "shift": list(shifts.values())})
+        if parts:
+            frames = [self.daily] + parts if not self.daily.empty else parts
+            self.daily = (pd.concat(frames, ignore_index=True)
+                          .groupby(["code", "day"], as_index=False)[["rows", "n", "s", "ss"]].sum())
+            self.daily["rows"] = self.daily["rows"].astype(np.int64)
+            self.daily["n"] = self.daily["n"].astype(np.int64)
+        return rows
+
+    # --- 期間の統計 ---
+    def _prefix_sums(self):
+        """品番・日の順に並べた、品番ごとの累積和（平日のみの累積和も）"""
+        if self._prefix is None:
+            d = self.daily.sort_values(["code", "day"], kind="stable").reset_index(drop=True)
+            code_idx, codes = pd.factorize(d["code"], sort=True)
+            ordinal = d["day"].to_numpy(dtype="datetime64[ns]").astype(np.int64) // DAY_NS + (1 << (DAY_BITS - 1))
+            keys = (code_idx.astype(np.int64) << DAY_BITS) | ordinal
+            weekday = np.asarray(pd.DatetimeIndex(d["day"]).dayofweek < 5)
+            # 品番ごとに 0 から積み上げる（他の品番の大きな累積値との差で桁落ちしないように）
+            sums = {}
+            for col in ["rows", "n", "s", "ss"]:
+                v = d[col].to_numpy(dtype=float)
+                sums[col] = pd.Series(v).groupby(code_idx).cumsum().to_numpy()
+                sums[col + "_wd"] = pd.Series(np.where(weekday, v, 0.0)).groupby(code_idx).cumsum().to_numpy()
+            first = np.searchsorted(code_idx, np.arange(len(codes)))
+            self._prefix = {"codes": np.asarray(codes, dtype=object), "keys": keys, "first": first, "sums": sums}
+        return self._prefix
+
+    def window_moments(self, start=None, end=None, weekdays_only: bool = False) -> pd.DataFrame:
+        """start 以上・end 以下の日の 品番（読込時の表記）ごとの 件数・平均・偏差平方和"""
+        p = self._prefix_sums()
+        if len(p["codes"]) == 0:
+            return pd.DataFrame({"rows": [], "n": [], "mean": [], "m2": []})
+        # (品番, 日) の通し番号を二分探索し、品番ごとの期間の両端の位置を一度に求める
+        half = 1 << (DAY_BITS - 1)
+        lo_day = -(-pd.Timestamp(start).value // DAY_NS) + half if start is not None else 0  # start 以上の最初の日
+        hi_day = pd.Timestamp(end).value // DAY_NS + half if end is not None else (1 << DAY_BITS) - 1
+        code_base = np.arange(len(p["codes"]), dtype=np.int64) << DAY_BITS
+        lo = np.searchsorted(p["keys"], code_base | max(0, lo_day), side="left")
+        hi = np.searchsorted(p["keys"], code_base | min((1 << DAY_BITS) - 1, hi_day), side="right")
+        suffix = "_wd" if weekdays_only else ""
+
+        def upto(cs: np.ndarray, end: np.ndarray) -> np.ndarray:
+            # 品番の先頭から end 行目の手前までの合計
+            return np.where(end > p["first"], cs[np.maximum(end - 1, 0)], 0.0)
+
+        total = {}
+        for c in ["rows", "n", "s", "ss"]:
+            cs = p["sums"][c + suffix]
+            total[c] = upto(cs, hi) - upto(cs, lo)
+
+        shift = pd.Series(self.codes["shift"].to_numpy(dtype=float), index=self.codes["code"]).reindex(p["codes"]).to_numpy()
+        n = total["n"]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_x = np.where(n > 0, total["s"] / n, np.nan)
+            m2 = np.where(n > 0, np.maximum(total["ss"] - total["s"] * mean_x, 0.0), 0.0)
+        out = pd.DataFrame({"rows": total["rows"], "n": n.astype(np.int64), "mean": shift + mean_x, "m2": m2},
+                           index=p["codes"])
+        return out[out["rows"] > 0]
+
+    def window_code_moments(self, start=None, end=None, weekdays_only: bool = False) -> pd.DataFrame:
+        """期間の品番別 件数・平均・偏差平方和（stream_base_moments と同じ形式）"""
+        return canonicalize_moments(self.window_moments(start, end, weekdays_only), self.codes["code"])
+
+    def window_stats(self, start=None, end=None, weekdays_only: bool = False) -> pd.DataFrame:
+        """期間の 品番・移動平均・使用量標準偏差（stream_base_stats と同じ形式）"""
+        return finalize_moments(self.window_code_moments(start, end, weekdays_only))
+
+    def compare_windows(self, today, months: Iterable[int] = (1, 3, 6, 12), weekdays_only: bool = False) -> pd.DataFrame:
+        """today から遡る複数の期間（today - m か月 以降）の統計を横に並べる（列名に _3M などを付ける）"""
+        today = pd.Timestamp(today)
+        table: Optional[pd.DataFrame] = None
+        for m in months:
+            stats = self.window_stats(today - pd.DateOffset(months=m), None, weekdays_only)
+            label = f"{m}M" + ("平日" if weekdays_only else "")
+            stats = stats.rename(columns={"移動平均": f"移動平均_{label}", "使用量標準偏差": f"使用量標準偏差_{label}"})
+            table = stats if table is None else table.merge(stats, on="品番", how="outer")
+        return table if table is not None else pd.DataFrame(columns=["品番"])
@@ -0,0 +1,192 @@
+"""常駐モード（scheduler watch）: Input/Master の変更を見て、変わった段だけ計画し直す
+
+1回目は通常どおり全段を実行し、以降は同じプロセスで
+- planner.PIPELINE が読込済みのマスタ・稼働日カレンダー・計画を、入力ファイル（更新時刻・サイズ）ごとに保持し、
+- RescheduleState が前回の統合結果をメモリに持つため、
+log.csv を保存すると log → plan → scheduler（変わった素地だけ再統合）→ capacity / ai_format だけが走る。
+変更の検出はフォルダのポーリング（Colab のマウント先・ローカル）か、Drive の changes.list のページトークン
+（--source drive。変更があれば計画の入力を md5 で比べ、違うものだけ Input/Master へダウンロード）。
+保存途中のファイルを読まないよう、更新時刻・サイズが settle 秒変わらなくなってから実行する。
+"""
+import os
+import glob
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from dp_scheduler import trace
+from dp_scheduler.datasource import file_md5, fetch_all
+
+# 計画の入力（ローカルでのファイル名 → Drive で探すパターン）
+MIRROR_SPECS = {
+    "log.csv": ["log.csv"],
+    "workday.csv": ["workday.csv"],
+    "material_master.csv": ["material_master.csv"],
+    "formulation.csv": ["formulation.csv"],
+    "machine.csv": ["machine.csv"],
+}
+IGNORED_SUFFIXES = (".tmp", ".json", ".swp")  # 書込途中のファイル・log_changes.json（計画の出力）
+
+
+def folder_snapshot(folder: str) -> Dict[str, Tuple[int, int]]:
+    """フォルダ直下と1階層下のファイルの {パス: (更新時刻, サイズ)}（隠しファイル・一時ファイルを除く）"""
+    snap = {}
+    for path in glob.glob(os.path.join(folder, "*")) + glob.glob(os.path.join(folder, "*", "*")):
+        name = os.path.basename(path)
+        if name.startswith((".", "~$")) or name.endswith(IGNORED_SUFFIXES):
+            continue
+        try:
+            st = os.stat(path)
+        except OSError:  # 列挙後に消えた
+            continue
+        if os.path.isfile(path):
+            snap[path] = (st.st_mtime_ns, st.st_size)
+    return snap
+
+
+class FolderWatcher:
+    """フォルダのポーリング（poll() は前回からの追加・変更・削除のパスを返す）"""
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.snapshot = folder_snapshot(folder)
+
+    def poll(self) -> List[str]:
+        current = folder_snapshot(self.folder)
+        changed = sorted(p for p in current.keys() | self.snapshot.keys() if current.get(p) != self.snapshot.get(p))
+        self.snapshot = current
+        return changed
+
+    def settle(self, seconds: float, timeout: float = 60.0) -> List[str]:
+        """更新時刻・サイズが seconds 秒変わらなくなるまで待ち、その間に変わったパスを返す"""
+        changed = set()
+        deadline = time.monotonic() + timeout
+        while seconds > 0 and time.monotonic() < deadline:
+            time.sleep(seconds)
+            more = self.poll()
+            if not more:
+                break
+            changed.update(more)
+        return sorted(changed)
+
+    def reset(self):
+        """自分で書き込んだ変更（ENRICH_LOG の log.csv など）を無視するため、現在の状態を基準にする"""
+        self.snapshot = folder_snapshot(self.folder)
+
+
+class DriveMirror:
+    """Drive のマスターフォルダの変更を changes.list で確認し、計画の入力をローカルへ複製する"""
+
+    CHANGE_FIELDS = "nextPageToken, newStartPageToken, changes(fileId, removed, file(parents))"
+
+    def __init__(self, source, dest_dir: str, specs: Optional[Dict[str, List[str]]] = None):
+        self.source = source
+        self.dest_dir = dest_dir
+        self.specs = specs or MIRROR_SPECS
+        self.token: Optional[str] = None
+
+    def changed(self) -> bool:
+        """前回の確認以降にマスターフォルダ（とサブフォルダ）で変更があったか（初回は True）"""
+        changes = self.source.service.changes()
+        if self.token is None:
+            trace.count("drive.calls")
+            self.token = changes.getStartPageToken().execute()["startPageToken"]
+            return True
+        found, token = False, self.token
+        folders = set(self.source.folders)
+        while token:
+            trace.count("drive.calls")
+            res = changes.list(pageToken=token, spaces="drive", fields=self.CHANGE_FIELDS, pageSize=1000).execute()
+            for change in res.get("changes", []):
+                parents = (change.get("file") or {}).get("parents", [])
+                found = found or change.get("removed", False) or bool(folders.intersection(parents))
+            self.token = res.get("newStartPageToken", self.token)
+            token = res.get("nextPageToken")
+        return found
+
+    def sync(self) -> List[str]:
+        """Drive とローカルで md5 が異なる入力をダウンロードして置き換え、更新したファイル名を返す"""
+        found = self.source.resolve({name: patterns for name, patterns in self.specs.items()})
+        stale = {}
+        for name, info in found.items():
+            path = os.path.join(self.dest_dir, name)
+            if info and not (os.path.exists(path) and info.get("md5Checksum") == file_md5(path)):
+                stale[name] = info
+        contents = fetch_all(self.source, stale)
+        os.makedirs(self.dest_dir, exist_ok=True)
+        for name, content in contents.items():
+            path = os.path.join(self.dest_dir, name)
+            with open(path + ".tmp", "wb") as f:
+                f.write(content)
+            os.replace(path + ".tmp", path)
+        return sorted(contents)
+
+
+def _drive_mirror(dest_dir: str, auth_mode: Optional[str], key_file: Optional[str]) -> DriveMirror:
+    from dp_scheduler.auth import get_credentials
+    from dp_scheduler.datasource import DriveDataSource
+    from dp_scheduler.update_sheets import MASTER_FOLDER_ID
+    source = DriveDataSource(get_credentials(auth_mode, key_file), folder_id=MASTER_FOLDER_ID)
+    return DriveMirror(source, dest_dir)
+
+
+def replan(planner, steps: Optional[List[str]]) -> float:
+    """planner.run(steps) を実行して秒数を返す（日付・設定が変わった段は planner.PIPELINE が計算し直す）"""
+    start = time.perf_counter()
+    planner.run(steps)
+    return time.perf_counter() - start
+
+
+def watch(root: Optional[str] = None, steps: Optional[List[str]] = None, interval: float = 2.0,
+          settle: float = 1.0, source: str = "local", auth_mode: Optional[str] = None,
+          key_file: Optional[str] = None, max_runs: Optional[int] = None, trace_runs: bool = False) -> int:
+    """Input/Master を interval 秒ごとに確認し、変更があれば計画し直す（Ctrl+C で終了）
+
+    source="drive" では Drive の変更を確認して入力を Input/Master へ複製する（マウント不要。cron・常駐用）。
+    max_runs 回計画し直したら終了する（None なら終了しない）。計画し直した回数を返す。
+    trace_runs=False なら計画ごとのトレースは出力しない。
+    """
+    from dp_scheduler import planner
+
+    planner.configure(root)
+    planner.TRACE_OUTPUT = trace_runs
+    mirror = _drive_mirror(planner.INPUT_DIR, auth_mode, key_file) if source == "drive" else None
+    if mirror is not None and mirror.changed():
+        print(f"  ✓ Drive から取得: {', '.join(mirror.sync()) or '変更なし'}")
+
+    print("=" * 60)
+    print(f"常駐モード: {planner.INPUT_DIR} を {interval:g}秒ごとに確認します（Ctrl+C で終了）")
+    print("=" * 60)
+    seconds = replan(planner, steps)
+    print(f"✅ 初回の計画 {seconds:.2f}秒")
+    watcher = FolderWatcher(planner.INPUT_DIR)
+
+    runs = 0
+    try:
+        while max_runs is None or runs < max_runs:
+            time.sleep(interval)
+            if mirror is not None:
+                try:
+                    if mirror.changed():
+                        mirror.sync()
+                except Exception as e:
+                    print(f"    Drive 確認エラー（次回再試行）: {e}")
+                    continue
+            changed = watcher.poll()
+            if not changed:
+                continue
+            changed = sorted(set(changed) | set(watcher.settle(settle)))
+            names = ", ".join(os.path.relpath(p, planner.INPUT_DIR) for p in changed)
+            print(f"\n[{datetime.now():%H:%M:%S}] 変更: {names}")
+            try:
+                seconds = replan(planner, steps)
+                print(f"✅ 再計画 {seconds:.2f}秒（再利用 {planner.PIPELINE.stats['reused']} / "
+                      f"計算 {planner.PIPELINE.stats['computed']} 段・累計）")
+            except Exception as e:
+                # 保存途中・列不足の CSV などは次の変更で再実行する（直前の出力はそのまま）
+                print(f"    再計画エラー（次の変更で再実行）: {type(e).__name__}: {e}")
+            watcher.reset()
+            runs += 1
+    except KeyboardInterrupt:
+        print("\nℹ️ 常駐モードを終了します")
+    return runs
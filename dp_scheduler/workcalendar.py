@@ -0,0 +1,136 @@
+"""稼働日カレンダー（workday.csv から1回だけ作り、日付配列に対してまとめて計算する）
+
+workday.csv は calendar.gs / csv.gs が出力する "MM/dd" を1行に並べた形式。
+年は含まれないため、開始年から月が戻ったところで年を繰り上げる。開始年は先頭の月と今日から
+推定する（calendar.gs は今日を含む期間を出力する）。1.py・2.py とも同じ規則で求める。
+"""
+import os
+import re
+from typing import Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+MMDD_PATTERN = re.compile(r"(\d{1,2})/(\d{1,2})")
+
+DateLike = Union[pd.Timestamp, pd.Series, pd.DatetimeIndex, np.ndarray, list]
+
+# workday.csv の先頭の日付の年を固定する場合（過去に出力した workday.csv で計画し直すときなど）。
+# 空なら先頭の月と今日から推定する
+CALENDAR_START_YEAR: Optional[int] = (int(os.environ["DP_SCHEDULER_CALENDAR_START_YEAR"])
+                                      if os.environ.get("DP_SCHEDULER_CALENDAR_START_YEAR") else None)
+
+
+def infer_start_year(first_month: int, today: pd.Timestamp) -> int:
+    """先頭の月が today に最も近くなる年（年をまたぐカレンダー用）"""
+    base = today.tz_localize(None) if today.tzinfo else today
+    base = base.normalize()
+    candidates = [base.year - 1, base.year, base.year + 1]
+    return min(candidates, key=lambda y: abs((pd.Timestamp(y, first_month, 1) - base).days))
+
+
+class WorkCalendar:
+    """稼働日の昇順配列を持ち、判定・営業日オフセット・日数カウントを配列単位で行う
+
+    日付は時刻まで一致した場合のみ稼働日とみなす（従来の Series.get による検索と同じ）。
+    """
+
+    def __init__(self, days: Iterable):
+        days = pd.to_datetime(pd.Series(list(days), dtype=object)).dropna()
+        self.days = np.unique(days.to_numpy(dtype="datetime64[ns]"))
+        if len(self.days) == 0:
+            raise ValueError("カレンダーから稼働日が取得できません")
+
+    @classmethod
+    def from_mmdd(cls, values: Iterable, start_year: int) -> "WorkCalendar":
+        """"MM/dd" の並びから作成（月が戻ったら翌年とみなす）"""
+        days, last_month, year = [], 1, start_year
+        for v in values:
+            m = MMDD_PATTERN.match(str(v))
+            if m:
+                month, day = map(int, m.groups())
+                if month < last_month:
+                    year += 1
+                days.append(f"{year}/{month:02d}/{day:02d}")
+                last_month = month
+        return cls(days)
+
+    @classmethod
+    def from_first_row(cls, df: pd.DataFrame, start_year: Optional[int] = None,
+                       today: Optional[pd.Timestamp] = None) -> "WorkCalendar":
+        """workday.csv を header=None で読んだ DataFrame の1行目から作成
+
+        start_year を省略した場合は CALENDAR_START_YEAR、それも無ければ先頭の月と today（省略時は今日）から推定する。
+        """
+        values = [v for v in df.iloc[0].tolist() if MMDD_PATTERN.match(str(v))]
+        if start_year is None:
+            start_year = CALENDAR_START_YEAR
+        if start_year is None:
+            if not values:
+                raise ValueError("カレンダーから稼働日が取得できません")
+            first_month = int(MMDD_PATTERN.match(str(values[0])).group(1))
+            start_year = infer_start_year(first_month, today if today is not None else pd.Timestamp.now())
+        return cls.from_mmdd(values, start_year)
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    @property
+    def index(self) -> pd.DatetimeIndex:
+        return pd.DatetimeIndex(self.days)
+
+    @staticmethod
+    def _as_array(dates: DateLike) -> np.ndarray:
+        if isinstance(dates, pd.Timestamp) or not hasattr(dates, "__len__"):
+            return np.atleast_1d(np.datetime64(pd.Timestamp(dates), "ns"))
+        return pd.DatetimeIndex(dates).to_numpy(dtype="datetime64[ns]")
+
+    def _positions(self, dates: DateLike):
+        """各日付の稼働日インデックス（稼働日でなければ -1）"""
+        arr = self._as_array(dates)
+        pos = np.searchsorted(self.days, arr, side="left")
+        clipped = np.minimum(pos, len(self.days) - 1)
+        hit = ~np.isnat(arr) & (pos < len(self.days)) & (self.days[clipped] == arr)
+        return np.where(hit, pos, -1), hit
+
+    def is_workday(self, dates: DateLike) -> np.ndarray:
+        """稼働日かどうか（NaT は False）"""
+        return self._positions(dates)[1]
+
+    def offset(self, dates: DateLike, n) -> pd.DatetimeIndex:
+        """稼働日 dates から n 稼働日ずらした日（n<0 で前へ）
+
+        dates が稼働日でない、またはずらした先がカレンダー範囲外なら NaT。
+        n はスカラーまたは dates と同じ長さの配列。
+        """
+        pos, hit = self._positions(dates)
+        target = pos + np.asarray(n, dtype=np.int64)
+        ok = hit & (target >= 0) & (target < len(self.days))
+        out = np.full(len(pos), np.datetime64("NaT"), dtype="datetime64[ns]")
+        out[ok] = self.days[target[ok]]
+        return pd.DatetimeIndex(out)
+
+    def count(self, start: DateLike, end: DateLike) -> np.ndarray:
+        """start～end（両端含む）の稼働日数"""
+        s = self._as_array(start)
+        e = self._as_array(end)
+        n = np.searchsorted(self.days, e, side="right") - np.searchsorted(self.days, s, side="left")
+        return np.maximum(n, 0)
+
+    def covers(self, date) -> bool:
+        """date（の日付）がカレンダーの期間内か（稼働日でなくてもよい）"""
+        date = pd.Timestamp(date)
+        date = (date.tz_localize(None) if date.tzinfo else date).normalize()
+        return pd.Timestamp(self.days[0]).normalize() <= date <= pd.Timestamp(self.days[-1])
+
+    def covers_month(self, year: int, month: int) -> bool:
+        """その月がカレンダーの期間内に含まれるか"""
+        first = pd.Timestamp(self.days[0])
+        last = pd.Timestamp(self.days[-1])
+        return (first.year, first.month) <= (year, month) <= (last.year, last.month)
+
+    def month_workdays(self, year: int, month: int) -> int:
+        """その月の稼働日数"""
+        s = pd.Timestamp(year, month, 1)
+        e = s + pd.offsets.MonthEnd(1) + pd.Timedelta(days=1) - pd.Timedelta(1)
+        return int(self.count(s, e)[0])
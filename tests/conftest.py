@@ -0,0 +1,28 @@
+"""テスト共通: 合成マスタ（dp_scheduler.synthetic）と、そこから作る統合前の計画行"""
+import pandas as pd
+import pytest
+
+from dp_scheduler import planner, synthetic
+
+TODAY = pd.Timestamp("2026-01-15")  # 合成マスタの「今日」（カレンダーは synthetic.CALENDAR_START から）
+
+
+@pytest.fixture(scope="session")
+def fixture_paths(tmp_path_factory):
+    """小さな合成マスタ一式（{ファイルの種類: パス}）"""
+    root = tmp_path_factory.mktemp("synthetic")
+    return synthetic.write_fixture(str(root), skus=300, base_rows=20_000, log_rows=1_500, today=TODAY, seed=1)
+
+
+@pytest.fixture(scope="session")
+def df_schedulable(fixture_paths):
+    """2.py の schedule_from_plan と同じ並びの統合前の計画行"""
+    calendar = planner.get_working_days(fixture_paths["workday"], today=TODAY)
+    material_info = planner.get_material_info(fixture_paths["material"])
+    df_log = planner.safe_read_csv(fixture_paths["log"])
+    df_plan = planner.build_plan(df_log, material_info, calendar)
+    df = df_plan.dropna(subset=['最終仕込デッドライン']).sort_values(
+        by=['最終仕込デッドライン', '標準仕込希望日', 'Recipe']
+    )
+    assert len(df) > 100 and df['Recipe'].nunique() > 5
+    return df
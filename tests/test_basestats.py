@@ -0,0 +1,77 @@
+"""basestats（分割読込の品番別統計）: 全件読込 + groupby mean/std（従来の 1.py）と同じ値になること"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dp_scheduler.basestats import (
+    chunk_moments, finalize_moments, frame_to_moments, merge_moments, moments_to_frame,
+    stream_base_moments, stream_base_stats,
+)
+from dp_scheduler.ingest import read_csv_flexible
+
+
+def baseline_stats(content: bytes, start: pd.Timestamp) -> pd.DataFrame:
+    """従来の 1.py: 全件を読み、期間内の行を品番ごとに mean / std（欠損は 0）"""
+    df_base = read_csv_flexible(content)
+    colA, colB, colS = df_base.columns[0], df_base.columns[1], df_base.columns[18]
+    df_base[colA] = pd.to_datetime(df_base[colA], errors="coerce")
+    df_base[colB] = df_base[colB].astype(str).str.strip()
+    df_base3 = df_base[df_base[colA] >= start]
+    df_ma = df_base3.groupby(colB, as_index=False)[colS].mean().rename(columns={colB: "品番", colS: "移動平均"})
+    df_std = df_base3.groupby(colB, as_index=False)[colS].std().rename(
+        columns={colB: "品番", colS: "使用量標準偏差"}).fillna(0)
+    return pd.merge(df_ma, df_std, on="品番", how="left")
+
+
+def assert_same_stats(result: pd.DataFrame, expected: pd.DataFrame):
+    result = result.sort_values("品番").reset_index(drop=True)
+    expected = expected.sort_values("品番").reset_index(drop=True)
+    assert result["品番"].tolist() == expected["品番"].tolist()
+    for col in ["移動平均", "使用量標準偏差"]:
+        np.testing.assert_allclose(result[col].to_numpy(dtype=float), expected[col].to_numpy(dtype=float),
+                                   rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+@pytest.fixture(scope="module")
+def base_content(fixture_paths):
+    with open(fixture_paths["base"], "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("chunksize", [1_000, 7_777, 1_000_000])
+def test_stream_matches_full_read(base_content, chunksize):
+    start = pd.Timestamp("2025-10-15")
+    assert_same_stats(stream_base_stats(base_content, start, chunksize=chunksize), baseline_stats(base_content, start))
+
+
+def test_stream_matches_full_read_with_codes_and_gaps():
+    # 先頭ゼロの品番・数値と文字列の混在・使用量の欠損・品番ごと1件だけの行を含める
+    rows = ["日付," + ",".join(f"c{i}" for i in range(1, 20))]
+    values = [("2025/11/01", "007", "5"), ("2025/11/02", "7", "3"), ("2025/11/03", "A-1", ""),
+              ("2025/11/04", "A-1", "8"), ("2025/11/05", "B", "2.5"), ("2025/09/30", "B", "100"),
+              ("2025/11/06", "007", "9"), ("2025/11/07", "C", "")]
+    for day, code, usage in values:
+        cols = [day, code] + [""] * 16 + [usage]
+        rows.append(",".join(cols))
+    content = ("\n".join(rows) + "\n").encode("utf-8")
+    start = pd.Timestamp("2025-10-01")
+    assert_same_stats(stream_base_stats(content, start, chunksize=3), baseline_stats(content, start))
+
+
+def test_merge_moments_is_order_independent():
+    rng = np.random.default_rng(0)
+    keys = pd.Series(rng.integers(0, 20, 500).astype(str))
+    values = pd.Series(rng.normal(10, 3, 500))
+    whole = chunk_moments(keys, values).sort_index()
+    a = chunk_moments(keys[:200], values[:200])
+    b = chunk_moments(keys[200:], values[200:])
+    for merged in (merge_moments(a, b), merge_moments(b, a)):
+        merged = merged.sort_index()
+        assert merged["n"].tolist() == whole["n"].tolist()
+        np.testing.assert_allclose(merged[["mean", "m2"]].to_numpy(), whole[["mean", "m2"]].to_numpy(), rtol=1e-9)
+
+
+def test_frame_round_trip(base_content):
+    moments = stream_base_moments(base_content, pd.Timestamp("2025-10-15"))
+    assert_same_stats(finalize_moments(frame_to_moments(moments_to_frame(moments))), finalize_moments(moments))
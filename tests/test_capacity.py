@@ -0,0 +1,75 @@
+"""capacity: 期限の早い順に、容量の合う釜と充填ラインの空きへ稼働日単位で割り付けること"""
+import pandas as pd
+
+from dp_scheduler.capacity import REASON_NO_KETTLE, STATUS_NG, STATUS_OK, schedule_capacity
+from dp_scheduler.workcalendar import WorkCalendar
+
+CALENDAR = WorkCalendar(pd.bdate_range("2026-10-01", "2026-10-30"))
+KETTLES = {"釜500": 500.0, "釜1000": 1000.0}
+
+
+def make_lots(*lots) -> pd.DataFrame:
+    """(Recipe, 必要素地量, 標準仕込希望日, 最終仕込デッドライン, [(コード, 充填日), ...]) から scheduler_list の形式"""
+    width = max(len(lot[4]) for lot in lots)
+    rows = []
+    for recipe, amount, pref, deadline, products in lots:
+        row = {"Recipe": recipe, "必要素地量": amount, "標準仕込希望日": pref, "最終仕込デッドライン": deadline}
+        for i in range(1, width + 1):
+            code, day = products[i - 1] if i <= len(products) else ("", "")
+            row.update({f"製品({i})_コード": code, f"製品({i})_商品名": f"製品{code}" if code else "",
+                        f"製品({i})_個数": 10 if code else "", f"製品({i})_充填日": day})
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def schedule(df_lots, kettles=KETTLES, line_of=None, **kwargs):
+    return schedule_capacity(df_lots, CALENDAR, lead_times={"R": 2}, line_of=line_of or {}, kettles=kettles,
+                             default_lead=0, **kwargs)
+
+
+def test_earlier_deadline_gets_the_preferred_day():
+    df_lot, _ = schedule(make_lots(
+        ("A", 800, "2026/10/15", "2026/10/20", [("100000", "2026/10/28")]),
+        ("B", 800, "2026/10/15", "2026/10/15", [("100001", "2026/10/28")]),
+    ), kettles={"釜1000": 1000.0})
+    assert df_lot["仕込日"].tolist() == [pd.Timestamp("2026-10-14"), pd.Timestamp("2026-10-15")]
+    assert df_lot["仕込前倒し日数"].tolist() == [1, 0]
+    assert df_lot["状態"].eq(STATUS_OK).all()
+
+
+def test_smallest_kettle_that_fits_and_no_kettle():
+    df_lot, df_fill = schedule(make_lots(
+        ("A", 400, "2026/10/15", "2026/10/20", [("100000", "2026/10/28")]),
+        ("B", 800, "2026/10/15", "2026/10/20", [("100001", "2026/10/28")]),
+        ("C", 1200, "2026/10/15", "2026/10/20", [("100002", "2026/10/28")]),
+    ))
+    assert df_lot["釜"].tolist() == ["釜500", "釜1000", ""]
+    assert df_lot["仕込日"].iloc[:2].tolist() == [pd.Timestamp("2026-10-15")] * 2
+    assert (df_lot.loc[2, "状態"], df_lot.loc[2, "理由"]) == (STATUS_NG, REASON_NO_KETTLE)
+    assert df_fill["Recipe"].tolist() == ["A", "B"]  # 割り付けられないバッチの充填は出さない
+
+
+def test_split_lots_share_the_booked_fill_day():
+    # 同じ製品・希望充填日に分割されたバッチは、ラインが1枠でも同じ充填日に入る
+    df_lot, df_fill = schedule(make_lots(
+        ("R", 800, "2026/10/13", "2026/10/20", [("100000", "2026/10/16")]),
+        ("R", 800, "2026/10/13", "2026/10/20", [("100000", "2026/10/16")]),
+    ), line_of={"100000": "L1"}, line_slots=1, kettle_slots=2)
+    assert df_lot["状態"].eq(STATUS_OK).all()
+    assert df_fill["充填日"].tolist() == [pd.Timestamp("2026-10-16")] * 2
+    assert df_fill["充填前倒し日数"].tolist() == [0, 0]
+
+
+def test_full_line_spills_fills_and_batches_earlier():
+    df_lot, df_fill = schedule(make_lots(
+        ("R", 400, "2026/10/13", "2026/10/20", [("100000", "2026/10/16")]),
+        ("R", 400, "2026/10/13", "2026/10/20", [("100001", "2026/10/16")]),
+        ("R", 400, "2026/10/13", "2026/10/20", [("100002", "2026/10/16")]),
+    ), kettles={"釜500": 500.0}, line_of={"100000": "L1", "100001": "L1", "100002": "L1"},
+        line_slots=1, kettle_slots=3)
+    fill_day = df_fill.set_index("コード")["充填日"]
+    assert fill_day.tolist() == [pd.Timestamp("2026-10-14"), pd.Timestamp("2026-10-15"), pd.Timestamp("2026-10-16")]
+    assert fill_day.index.tolist() == ["100002", "100001", "100000"]
+    # 3件目は 仕込日 + L/T（2稼働日）が 10/15 だと空きが無いため、仕込を 10/12 に前倒し
+    assert df_lot["仕込日"].tolist() == [pd.Timestamp("2026-10-13")] * 2 + [pd.Timestamp("2026-10-12")]
+    assert df_lot["状態"].eq(STATUS_OK).all()
@@ -0,0 +1,109 @@
+"""consolidate（仕込みバッチ統合）: greedy は従来の consolidate_batches_advanced と同じ結果になること"""
+import pandas as pd
+import pytest
+
+from dp_scheduler.consolidate import MAX_PRODUCTS_PER_BATCH, consolidate
+
+
+def baseline_greedy(df_schedulable: pd.DataFrame) -> pd.DataFrame:
+    """従来（行ごとのキュー処理）の consolidate_batches_advanced"""
+    if df_schedulable.empty:
+        return df_schedulable
+    rows = []
+    for recipe, group in df_schedulable.groupby('Recipe', sort=False):
+        group = group.sort_values(by=['最終仕込デッドライン', '標準仕込希望日']).reset_index(drop=True)
+        max_capacity = group['釜最大容量'].iloc[0]
+        q = [{
+            'code': r['code'],
+            'name': r['productname'],
+            'cell': r['cell'],
+            'fill_date': r['充填日'],
+            'amount': r['必要素地量'],
+            'deadline': r['最終仕込デッドライン'],
+            'preferred': r['標準仕込希望日']
+        } for _, r in group.iterrows()]
+
+        while q:
+            current, cur_amount = [], 0.0
+            i = 0
+            while i < len(q) and len(current) < MAX_PRODUCTS_PER_BATCH:
+                prod = q[i]
+                remain = max_capacity - cur_amount
+                if remain <= 0:
+                    break
+                if prod['amount'] <= remain:
+                    cur_amount += prod['amount']
+                    current.append({**prod, 'is_partial': False})
+                    q.pop(i)
+                else:
+                    absorbed = remain
+                    cur_amount += absorbed
+                    current.append({**prod, 'amount': absorbed, 'is_partial': True})
+                    prod['amount'] -= absorbed
+                    break
+
+            if current:
+                base = current[0]
+                row = {
+                    'Recipe': recipe,
+                    '充填日': base['fill_date'],
+                    '標準仕込希望日': q[0]['preferred'] if q else base['fill_date'],
+                    '最終仕込デッドライン': q[0]['deadline'] if q else base['fill_date'],
+                    '必要素地量': cur_amount,
+                    '釜最大容量': max_capacity,
+                    '余剰液量': max_capacity - cur_amount,
+                    '統合製品数': len(current),
+                    '統合フラグ': '統合済' if len(current) > 1 else '単独',
+                    '仕込回数削減': len(current) - 1
+                }
+                for idx in range(MAX_PRODUCTS_PER_BATCH):
+                    num = idx + 1
+                    p = current[idx] if idx < len(current) else None
+                    row[f'製品({num})_コード'] = p['code'] if p else ''
+                    row[f'製品({num})_商品名'] = p['name'] if p else ''
+                    row[f'製品({num})_個数'] = p['cell'] if p else ''
+                    row[f'製品({num})_充填日'] = p['fill_date'].strftime('%Y-%m-%d') if p else ''
+                    row[f'製品({num})_素地量'] = round(p['amount'], 2) if p else ''
+                    row[f'製品({num})_状態'] = ('部分' if p['is_partial'] else '全量') if p else ''
+                rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def test_greedy_matches_baseline(df_schedulable):
+    pd.testing.assert_frame_equal(consolidate(df_schedulable, strategy="greedy"), baseline_greedy(df_schedulable))
+
+
+def test_greedy_matches_baseline_with_split_products(df_schedulable):
+    # 釜容量を小さくして、分割（部分）と複数バッチへのまたがりを多く含める
+    df = df_schedulable.assign(釜最大容量=df_schedulable['釜最大容量'] / 7)
+    result = consolidate(df, strategy="greedy")
+    assert (result['製品(1)_状態'] == '部分').any()
+    pd.testing.assert_frame_equal(result, baseline_greedy(df))
+
+
+def test_greedy_parallel_matches_serial(df_schedulable, monkeypatch):
+    from dp_scheduler import consolidate as module
+    monkeypatch.setattr(module, "PARALLEL_MIN_ROWS", 1)
+    pd.testing.assert_frame_equal(consolidate(df_schedulable, max_workers=2),
+                                  consolidate(df_schedulable, max_workers=1))
+
+
+@pytest.mark.parametrize("strategy", ["first_fit", "first_fit_decreasing"])
+def test_first_fit_keeps_amounts_within_capacity(df_schedulable, strategy):
+    df = df_schedulable.assign(釜最大容量=df_schedulable['釜最大容量'] / 3)
+    result = consolidate(df, strategy=strategy)
+
+    assert (result['必要素地量'] <= result['釜最大容量'] + 1e-9).all()
+    assert (result['統合製品数'] <= MAX_PRODUCTS_PER_BATCH).all()
+    # 製品ごとの素地量（分割分の合計）は元の必要量と一致する（表示は小数2桁に丸めている）
+    parts = pd.concat([
+        result[[f'製品({i})_コード', f'製品({i})_充填日', f'製品({i})_素地量']].set_axis(['code', 'day', 'amount'], axis=1)
+        for i in range(1, MAX_PRODUCTS_PER_BATCH + 1)
+    ])
+    parts = parts[parts['code'] != '']
+    assert abs(pd.to_numeric(parts['amount']).sum() - df['必要素地量'].sum()) <= 0.005 * len(parts)
+
+
+def test_unknown_strategy_raises(df_schedulable):
+    with pytest.raises(ValueError):
+        consolidate(df_schedulable, strategy="best_fit")
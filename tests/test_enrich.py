@@ -0,0 +1,74 @@
+"""enrich: LogFrom.gs の enrichLogSheetFromMasters と同じ log を作り、変わったセルだけの書込で同じシートになること"""
+import pandas as pd
+
+from dp_scheduler.enrich import LOG_HEADERS, changes_payload, enrich_log
+from dp_scheduler.sheet_sync import col_letter
+
+FORMULATION = pd.DataFrame([
+    ["100000", "S1", "B1", "30", "60", "1.5", "250", "0.2"],
+    ["100001", "S2", "B2", "28", "58", "2", "100.5", "0.1"],
+    ["", "SX", "BX", "0", "0", "9", "9", "9"],           # 品番が空の行は使わない
+    ["100001", "S3", "B3", "27", "57", "4", "300", "0.3"],  # 重複は後の行（Map.set と同じ）
+], columns=["品番", "素地", "バルク", "製品石けん分", "素地石けん分", "素地量", "仕込み量", "バルク液量／個(kg)"])
+MACHINE = pd.DataFrame([["100000", "L1"], ["100002", "L2"], ["100001", "L3"], ["100001", "L4"]],
+                       columns=["品番", "ライン名"])
+LOG = pd.DataFrame([
+    ["a", "100000", "製品A", "3", "2026/10/20", "id1", "t1", "G5"],
+    ["a", "100001", "製品B", "", "2026/10/20", "id2", "t2", "G7"],   # cell が空 → 0
+    ["a", "100002", "製品C", "5", "2026/10/21", "id3", "t3", "H9"],  # formulation に無い（line だけ付く）
+    ["", "", "", "", "", "", "", ""],                                # 全列が空の行は読まない
+    ["a", " 100001 ", "製品B", "2", "2026/10/22", "id4", "t4", "I7"],
+    ["a", "999999", "不明", "1", "2026/10/22", "id5", "t5", "I9"],
+    ["a", "100000", "製品A", "0.5", "2026/10/23", "id6", "t6", "J5"],
+], columns=LOG_HEADERS[:8])
+
+# enrichLogSheetFromMasters を手で追った結果（I～R列）
+EXPECTED_TAIL = [
+    ["S1", "B1", "30", "60", "1.5", "250", "0.2", 4.5, 750, "L1"],
+    ["S3", "B3", "27", "57", "4", "300", "0.3", 0, 0, "L4"],
+    ["", "", "", "", "", "", "", "", "", "L2"],
+    ["S3", "B3", "27", "57", "4", "300", "0.3", 8, 600, "L4"],
+    ["", "", "", "", "", "", "", "", "", ""],
+    ["S1", "B1", "30", "60", "1.5", "250", "0.2", 0.75, 125, "L1"],
+]
+
+
+def expected_rows():
+    base = LOG[(LOG != "").any(axis=1)].values.tolist()
+    return [head + tail for head, tail in zip(base, EXPECTED_TAIL)]
+
+
+def test_matches_enrich_log_sheet_from_masters():
+    out = enrich_log(LOG, FORMULATION, MACHINE)
+    assert list(out.columns) == LOG_HEADERS
+    rows = out.values.tolist()
+    assert rows == expected_rows()
+    # 整数値は int（シートに 750.0 ではなく 750 と書く）
+    assert [type(row[16]) for row in rows] == [int, int, str, int, str, int]
+
+
+def apply(grid: dict, payload) -> dict:
+    """{"range": "A1:B2", "values"} をセル辞書 {(行, 列): 値} に書き込む（None は書き換えない）"""
+    letters = {col_letter(j): j for j in range(1, len(LOG_HEADERS) + 1)}
+    for update in payload:
+        start = update["range"].split(":")[0]
+        col = letters["".join(c for c in start if c.isalpha())]
+        row = int("".join(c for c in start if c.isdigit()))
+        for i, values in enumerate(update["values"]):
+            for j, value in enumerate(values):
+                if value is not None:
+                    grid[(row + i, col + j)] = value
+    return grid
+
+
+def test_payload_turns_sheet_into_enriched_log():
+    # シートには前回付与した古い値（100000 の Recipe）が残っている
+    before = LOG.reindex(columns=LOG_HEADERS).fillna("")
+    before.loc[0, "Recipe"] = "旧S1"
+    after = enrich_log(before, FORMULATION, MACHINE)
+    sheet = {(i + 1, j + 1): v for i, row in enumerate([LOG_HEADERS] + before.values.tolist()) for j, v in enumerate(row)}
+    apply(sheet, changes_payload(before, after))
+    rows = [[sheet.get((i, j), "") for j in range(1, len(LOG_HEADERS) + 1)] for i in range(1, len(before) + 2)]
+    # clear して書き直した場合と同じ（空行が詰まり、最後の行は空欄になる）
+    assert rows == [LOG_HEADERS] + expected_rows() + [[""] * len(LOG_HEADERS)]
+    assert changes_payload(after, after) == []
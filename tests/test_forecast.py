@@ -0,0 +1,35 @@
+"""forecast: 一括の数値抽出が従来の parse_last_number（1セルずつ）と同じ値になり、N ファイルを合算できること"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from dp_scheduler.forecast import combine_forecasts, extract_last_numbers, normalize_forecast
+
+
+def parse_last_number(x):
+    """従来の 1.py の実装（文字列から最後の数値を抽出）"""
+    if pd.isna(x):
+        return np.nan
+    m = re.findall(r'\d+(?:\.\d+)?', str(x).replace(',', ''))
+    return float(m[-1]) if m else np.nan
+
+
+def test_matches_parse_last_number_cell_by_cell():
+    frame = pd.DataFrame({
+        "10月": ["計 1,234", "12.5", None, "", "なし", "1.2.3", "-40", "予 3 / 確 7"],
+        "11月": [1, 2.5, np.nan, -3, 0, 10, 4, 7],
+        "12月": pd.Series([5, None, "6", 7.25, "x9y", "1,000.75", "", np.nan], dtype=object),
+    })
+    expected = frame.apply(lambda col: col.map(parse_last_number))
+    pd.testing.assert_frame_equal(extract_last_numbers(frame), expected.astype(float))
+
+
+def test_combine_sums_files_per_code():
+    labels = ["10月", "11月"]
+    honpo = normalize_forecast(pd.DataFrame({"品番": [" 100000", "100001"], "10月": ["1,000", "5"], "11月": ["2", ""]}), labels)
+    hanbai = normalize_forecast(pd.DataFrame({"品番": ["100000", "100002"], "10月": ["計 30", "7"]}), labels)
+    out = combine_forecasts([honpo, None, hanbai], labels)
+    assert out["品番"].tolist() == ["100000", "100001", "100002"]
+    assert out["10月"].tolist() == [1030.0, 5.0, 7.0]
+    assert out["11月"].tolist() == [2.0, 0.0, 0.0]  # 対象月が無いファイル・空欄は 0
@@ -0,0 +1,50 @@
+"""consolidate_incremental（差分再計算）: 前回の状態から求めた結果が全件の統合と同じになること"""
+from functools import partial
+
+import pandas as pd
+
+from dp_scheduler.consolidate import consolidate
+from dp_scheduler.incremental import RescheduleState, consolidate_incremental
+
+greedy = partial(consolidate, strategy="greedy")
+
+
+def incremental(df, state_dir):
+    state = RescheduleState(str(state_dir), settings={"strategy": "greedy", "amount_dtype": df['必要素地量'].dtype})
+    return consolidate_incremental(df, greedy, state)
+
+
+def edit_log(df: pd.DataFrame) -> pd.DataFrame:
+    """一部の素地で行を変更・削除し、新しい ID の行を追加する"""
+    recipes = df['Recipe'].unique()
+    out = df.copy()
+    changed = out['Recipe'] == recipes[0]
+    out.loc[changed, '必要素地量'] = out.loc[changed, '必要素地量'] * 2
+    out = out[out['Recipe'] != recipes[1]]
+    added = df[df['Recipe'] == recipes[2]].head(3).assign(ID=lambda d: d['ID'].astype(str) + "-new")
+    return pd.concat([out, added]).sort_values(by=['最終仕込デッドライン', '標準仕込希望日', 'Recipe'])
+
+
+def test_first_run_matches_full(df_schedulable, tmp_path):
+    pd.testing.assert_frame_equal(incremental(df_schedulable, tmp_path), greedy(df_schedulable))
+
+
+def test_rerun_after_edits_matches_full(df_schedulable, tmp_path):
+    incremental(df_schedulable, tmp_path)
+    edited = edit_log(df_schedulable)
+    pd.testing.assert_frame_equal(incremental(edited, tmp_path), greedy(edited))
+
+
+def test_rerun_from_disk_matches_full(df_schedulable, tmp_path, monkeypatch):
+    from dp_scheduler import incremental as module
+    incremental(df_schedulable, tmp_path)
+    monkeypatch.setattr(module, "_memory", {})  # 別プロセスで実行した場合と同じく保存した状態から読む
+    edited = edit_log(df_schedulable)
+    pd.testing.assert_frame_equal(incremental(edited, tmp_path), greedy(edited))
+
+
+def test_unchanged_rerun_reuses_every_recipe(df_schedulable, tmp_path, capsys):
+    incremental(df_schedulable, tmp_path)
+    result = incremental(df_schedulable, tmp_path)
+    assert f"再統合 0/{df_schedulable['Recipe'].nunique():,}素地" in capsys.readouterr().out
+    pd.testing.assert_frame_equal(result, greedy(df_schedulable))
@@ -0,0 +1,19 @@
+"""ingest: 既定では何も表示せず、log を渡したときだけ判定結果を1行で知らせること"""
+from dp_scheduler.ingest import read_csv_flexible
+
+CONTENT = "品番\t商品名\n100000\t製品A\n100001\t製品B\n".encode("cp932")
+
+
+def test_silent_by_default(capsys):
+    df = read_csv_flexible(CONTENT)
+    assert df["商品名"].tolist() == ["製品A", "製品B"]
+    assert df.attrs["csv_dialect"]["encoding"] == "cp932"
+    assert df.attrs["csv_dialect"]["sep"] == "\t"
+    assert capsys.readouterr().out == ""
+
+
+def test_log_reports_dialect(capsys):
+    lines = []
+    read_csv_flexible(CONTENT, label="product.csv", log=lines.append)
+    assert len(lines) == 1 and lines[0].startswith("    読込: product.csv (encoding=cp932, sep='\\t'")
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,62 @@
+"""LogStore: log.csv を月別に保存し、再同期では退避前の月を置き換え・退避済みの月は ID で上書き・追加すること"""
+import os
+
+import pandas as pd
+
+from dp_scheduler.logstore import NO_MONTH, LogStore
+
+
+def log_frame(rows):
+    return pd.DataFrame(rows, columns=["ID", "day", "code", "cell"])
+
+
+LOG = log_frame([
+    ["a1", "2026/09/28", "100000", 1],
+    ["a2", "2026/10/01", "100001", 2],
+    ["a3", "不明", "100002", 3],
+    ["a4", "2026/10/15", "100000", 4],
+    ["a5", "2026/09/30", "100003", 5],
+])
+
+
+def test_sync_partitions_by_month_and_reads_horizon(tmp_path):
+    store = LogStore(str(tmp_path))
+    assert store.sync(LOG) == {"months": 3, "rows": 5}
+    assert store.months() == ["2026-09", "2026-10", NO_MONTH]
+    assert os.path.exists(tmp_path / "month=2026-10" / "data.parquet")
+
+    pd.testing.assert_frame_equal(store.read(), LOG)  # log.csv の行順
+    assert store.read("2026-10-01", "2026-10-31")["ID"].tolist() == ["a2", "a4"]
+    assert store.read("2026-09-29", "2026-10-01")["ID"].tolist() == ["a2", "a5"]
+    assert store.read(end="2026-09-29", columns=["ID", "cell"]).columns.tolist() == ["ID", "cell"]
+    # 作り直しても同じ内容を読める
+    assert LogStore(str(tmp_path)).read()["ID"].tolist() == LOG["ID"].tolist()
+
+
+def test_resync_replaces_open_months_and_rewrites_only_changed(tmp_path):
+    store = LogStore(str(tmp_path))
+    store.sync(LOG)
+    changed = LOG[LOG["ID"] != "a4"].assign(cell=lambda d: d["cell"].where(d["ID"] != "a1", 10))
+    assert store.sync(changed) == {"months": 2, "rows": 4}  # 日付不明の月は変わらない
+    out = store.read()
+    assert out["ID"].tolist() == ["a1", "a2", "a3", "a5"]
+    assert out.loc[0, "cell"] == 10
+
+    assert store.sync(changed)["months"] == 0  # 同じ内容なら書き換えない
+
+    # 10月の行が無くなれば月ごと消える（行順が変わった月も書き換える）
+    assert store.sync(changed[changed["day"] != "2026/10/01"])["months"] == 3
+    assert store.months() == ["2026-09", NO_MONTH]
+    assert not os.path.exists(tmp_path / "month=2026-10")
+
+
+def test_archived_months_keep_rows_and_upsert_by_id(tmp_path):
+    LogStore(str(tmp_path)).sync(LOG)
+    store = LogStore(str(tmp_path), archived_through="2026-09")
+    # Archive.gs で 9月の行を log.csv から消し、1行を直して退避した
+    store.sync(LOG[~LOG["day"].str.startswith("2026/09")])
+    assert store.read("2026-09-01", "2026-09-30")["ID"].tolist() == ["a1", "a5"]
+    assert store.append(log_frame([["a5", "2026/09/30", "100003", 50], ["b1", "2026/09/29", "100004", 6]])) == 2
+    september = store.read("2026-09-01", "2026-09-30")
+    assert september["ID"].tolist() == ["a1", "a5", "b1"]  # 退避済みの行 → 追加順
+    assert september.set_index("ID").loc["a5", "cell"] == 50
@@ -0,0 +1,83 @@
+"""monthly: 1回の結合と列単位の計算が、従来の月ごとの結合・1行ずつの計算と同じ値になること"""
+import math
+
+import numpy as np
+import pandas as pd
+
+from dp_scheduler.monthly import OUTPUT_COLUMNS, build_product_frame, month_slices, pretty_num_series, safety_stock
+
+LABELS = ["10月", "11月"]
+
+
+def calc_safety(std, lead, interval=7, factor=1.65):
+    """従来の 1.py の実装（安全在庫を計算）"""
+    if pd.isna(std) or pd.isna(lead) or std == 0:
+        return 0
+    return factor * std * math.sqrt(lead + interval)
+
+
+def pretty_num(x):
+    """従来の 1.py の実装（整数は小数点なし、小数は2桁）"""
+    if pd.isna(x) or x == "":
+        return ""
+    try:
+        f = float(x)
+        return int(f) if f.is_integer() else round(f, 2)
+    except (TypeError, ValueError):
+        return x
+
+
+def masters():
+    df_prod = pd.DataFrame({"品番": ["100000", "100001", "100002", "100003"], "商品名": ["A", "B", "C", "D"],
+                            "発注リードタイム": [5.0, 0.0, 7.0, np.nan]})
+    df_zaiko = pd.DataFrame({"品番": ["100000", "100001", "100002"], "在庫数量": [120.0, 35.5, 0.0]})
+    df_need = pd.DataFrame({"品番": ["100000", "100002", "100003"], "10月日割": [10.0, 2.345, np.nan],
+                            "11月日割": [12.5, 0.0, 3.0]})
+    df_stats = pd.DataFrame({"品番": ["100000", "100001", "100002"], "移動平均": [9.876, 4.0, 0.0],
+                             "使用量標準偏差": [3.2, 1.5, 0.0]})
+    return df_prod, df_zaiko, df_need, df_stats
+
+
+def per_month_rows(df_prod, df_zaiko, df_need, df_stats, label):
+    """従来の 1.py の月ごとのループ（結合 → 1行ずつ安全在庫 → map(pretty_num)）"""
+    col = f"{label}日割"
+    df_out = (df_prod.merge(df_zaiko, on="品番", how="left")
+              .merge(df_need[["品番", col]], on="品番", how="left")
+              .merge(df_stats, on="品番", how="left"))
+    df_out = df_out.rename(columns={col: "日割"})
+    df_out["安全在庫"] = df_out.apply(lambda r: calc_safety(r["使用量標準偏差"], r["発注リードタイム"]), axis=1)
+    for c in ["在庫数量", "日割", "移動平均", "安全在庫"]:
+        df_out[c] = df_out[c].map(pretty_num)
+    return df_out[OUTPUT_COLUMNS].values.tolist()
+
+
+def test_month_slices_match_per_month_loop():
+    frames = masters()
+    slices = month_slices(build_product_frame(*frames, LABELS), LABELS)
+    for label in LABELS:
+        assert slices[label].values.tolist() == per_month_rows(*frames, label)
+
+
+def test_joined_frame_stays_numeric():
+    df = build_product_frame(*masters(), LABELS)
+    for c in ["在庫数量", "移動平均", "安全在庫", "10月日割", "11月日割"]:
+        assert pd.api.types.is_float_dtype(df[c])
+    before = df.copy()
+    part = month_slices(df, LABELS)["10月"]
+    part.loc[0, "在庫数量"] = 999
+    pd.testing.assert_frame_equal(df, before)
+
+
+def test_safety_stock_matches_calc_safety():
+    std = [3.2, 0.0, np.nan, 1.5, 2.0]
+    lead = [5, 3, 4, np.nan, 0]
+    expected = [calc_safety(s, l) for s, l in zip(std, lead)]
+    np.testing.assert_allclose(safety_stock(std, lead), expected)
+    factors = [2.33, 1.0, 1.65, 1.65, 1.28]
+    np.testing.assert_allclose(safety_stock(std, lead, factor=factors),
+                               [calc_safety(s, l, factor=f) for s, l, f in zip(std, lead, factors)])
+
+
+def test_pretty_num_series_matches_pretty_num():
+    s = pd.Series([1.0, 2.345, np.nan, "", "未定", "12", 0.005, -3.0], dtype=object)
+    assert pretty_num_series(s).tolist() == [pretty_num(x) for x in s]
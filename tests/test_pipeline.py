@@ -0,0 +1,51 @@
+"""Pipeline: 入力ファイル・設定値・依存段が同じなら前回の結果を使い、変わった段から計算し直すこと"""
+from dp_scheduler.pipeline import Pipeline
+
+
+def make_pipeline(path, settings, calls):
+    pipeline = Pipeline(verbose=False)
+
+    def read():
+        calls.append("read")
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def plan(text):
+        calls.append("plan")
+        return text[:settings["limit"]]
+
+    pipeline.add("read", read, inputs=[path])
+    pipeline.add("plan", plan, deps=["read"], config=lambda: (settings["limit"],))
+    return pipeline
+
+
+def test_reuses_when_nothing_changed(tmp_path):
+    path = tmp_path / "log.csv"
+    path.write_text("abcdef", encoding="utf-8")
+    calls = []
+    pipeline = make_pipeline(str(path), {"limit": 3}, calls)
+    assert pipeline.run(["plan"]) == {"plan": "abc"}
+    assert pipeline.run(["plan"]) == {"plan": "abc"}
+    assert calls == ["read", "plan"]
+
+
+def test_config_change_recomputes_only_that_stage(tmp_path):
+    path = tmp_path / "log.csv"
+    path.write_text("abcdef", encoding="utf-8")
+    calls, settings = [], {"limit": 3}
+    pipeline = make_pipeline(str(path), settings, calls)
+    pipeline.run(["plan"])
+    settings["limit"] = 5
+    assert pipeline.run(["plan"]) == {"plan": "abcde"}
+    assert calls == ["read", "plan", "plan"]
+
+
+def test_input_change_recomputes_dependents(tmp_path):
+    path = tmp_path / "log.csv"
+    path.write_text("abcdef", encoding="utf-8")
+    calls = []
+    pipeline = make_pipeline(str(path), {"limit": 3}, calls)
+    pipeline.run(["plan"])
+    path.write_text("xyz0123", encoding="utf-8")
+    assert pipeline.run(["plan"]) == {"plan": "xyz"}
+    assert calls == ["read", "plan", "read", "plan"]
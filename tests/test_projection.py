@@ -0,0 +1,51 @@
+"""projection: 在庫推移が calendar.gs（calculateInventory）の数式と同じ値になること"""
+import numpy as np
+import pandas as pd
+
+from dp_scheduler.projection import demand_matrix, fills_from_log, fills_matrix, horizon_days, project_inventory
+from dp_scheduler.workcalendar import WorkCalendar
+
+CALENDAR = WorkCalendar(pd.bdate_range("2026-01-05", "2026-03-31"))
+TODAY = pd.Timestamp("2026-01-14")
+CODES = ["100000", "100001"]
+STOCK = np.array([120.0, 40.0])
+DAILY = {(2026, 1): np.array([2.0, 1.5]), (2026, 2): np.array([3.0, 0.0]), (2026, 3): np.array([1.25, 1.0])}
+# 入庫行に入力した数量（log.csv の cell）。付与前の行は batchsize が空
+LOG = pd.DataFrame({
+    "code": ["100000", "100000", "100001", "100001", "100000", "100001"],
+    "day": ["2026/01/13", "2026/01/14", "2026/01/20", "2026/02/02", "2026/03/10", "2026/03/10"],
+    "cell": [500, 30, 25, 10, 40, 5],
+    "batchsize": ["", 300, "", "", 1200.5, ""],
+})
+
+
+def sheet_formulas(row: int, days: pd.DatetimeIndex) -> list:
+    """月シートの数式を順に評価した在庫行の値（今日の列 =C4、以降 =左 − D + 下の入庫、翌月以降の G 列 = 前月最終列 + 下の入庫）"""
+    fills = LOG[LOG["code"] == CODES[row]].assign(day=lambda d: pd.to_datetime(d["day"]))
+    fill = lambda day: fills.loc[fills["day"] == day, "cell"].sum()  # noqa: E731  N(R[1]C[0])
+    values, value = [], None
+    for n, (key, month_days) in enumerate(pd.Series(days, index=days).groupby([days.year, days.month])):
+        for k, day in enumerate(month_days):
+            if value is None:
+                value = STOCK[row]  # 1枚目のシートの今日の列
+            elif n and k == 0:
+                value = value + fill(day)  # G 列（前月の最終列 + 入庫）
+            else:
+                value = value - DAILY[key][row] + fill(day)
+            values.append(value)
+    return values
+
+
+def test_projection_matches_sheet_formulas():
+    days = horizon_days(CALENDAR, TODAY, pd.Timestamp("2026-03-31"))
+    assert days[0] == TODAY
+    projected = project_inventory(STOCK, demand_matrix(days, DAILY, len(CODES)),
+                                  fills_matrix(days, CODES, fills_from_log(LOG)))
+    for row in range(len(CODES)):
+        np.testing.assert_allclose(projected[row], sheet_formulas(row, days))
+
+
+def test_fills_use_cell_even_when_batchsize_is_blank():
+    fills = fills_from_log(LOG).set_index(["品番", "日付"])["入庫"]
+    assert fills[("100001", pd.Timestamp("2026-01-20"))] == 25
+    assert fills[("100000", pd.Timestamp("2026-03-10"))] == 40
@@ -0,0 +1,89 @@
+"""quota: TokenBucket（時計・待機を差し替えて確認）と split_by_payload"""
+import json
+
+import pytest
+
+from dp_scheduler.quota import TokenBucket, split_by_payload
+
+
+class FakeClock:
+    """sleep すると時刻が進む時計"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_bucket(per_minute=60, burst=3):
+    clock = FakeClock()
+    return TokenBucket(per_minute, burst, clock=clock, sleep=clock.sleep), clock
+
+
+def test_burst_is_available_without_waiting():
+    bucket, clock = make_bucket(burst=3)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert clock.sleeps == []
+
+
+def test_waits_for_refill_at_rate():
+    bucket, clock = make_bucket(per_minute=60, burst=2)
+    bucket.acquire()
+    bucket.acquire()
+    assert bucket.acquire() == pytest.approx(1.0)  # 60回/分 → 1秒で1個
+    assert bucket.acquire() == pytest.approx(1.0)
+    assert clock.now == pytest.approx(2.0)
+
+
+def test_refill_is_capped_at_burst():
+    bucket, clock = make_bucket(per_minute=60, burst=2)
+    bucket.acquire()
+    bucket.acquire()
+    clock.now += 100  # 長く空いても burst 個までしか貯まらない
+    assert [bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(1.0)
+
+
+def test_acquire_many_tokens_waits_for_the_shortfall():
+    bucket, _ = make_bucket(per_minute=120, burst=4)
+    bucket.acquire(3)
+    assert bucket.acquire(3) == pytest.approx(1.0)  # 不足2個 / 2個毎秒
+
+
+def test_drain_empties_the_bucket():
+    bucket, _ = make_bucket(per_minute=30, burst=5)
+    bucket.drain()
+    assert bucket.acquire() == pytest.approx(2.0)
+
+
+def payload_size(chunk) -> int:
+    return len(json.dumps(chunk, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+def test_split_by_payload_respects_limit_and_order():
+    items = [{"range": f"A{i}:F{i}", "values": [["品番", i, "x" * (i % 50)]]} for i in range(200)]
+    chunks = split_by_payload(items, max_bytes=1_000)
+    assert len(chunks) > 1
+    assert [item for chunk in chunks for item in chunk] == items
+    assert all(payload_size(chunk) <= 1_000 for chunk in chunks)
+
+
+def test_split_by_payload_fits_in_one_chunk():
+    items = [{"range": "A1", "values": [[1]]}] * 3
+    assert split_by_payload(items, max_bytes=10_000) == [items]
+
+
+def test_split_by_payload_keeps_oversized_item_alone():
+    big = {"range": "A1", "values": [["x" * 500]]}
+    small = {"range": "A2", "values": [[1]]}
+    assert split_by_payload([small, big, small], max_bytes=100) == [[small], [big], [small]]
+
+
+def test_split_by_payload_empty():
+    assert split_by_payload([]) == []
@@ -0,0 +1,69 @@
+"""sheet_sync: 在庫推移も前回値と比べて変わったセルだけを書き込み、None のセル（入庫行など）は書き換えないこと"""
+from dp_scheduler.fake_sheets import FakeSpreadsheet
+from dp_scheduler.quota import RequestScheduler
+from dp_scheduler.sheet_sync import SheetSnapshot, diff_grid, sync_inventory
+
+START_COL = 7  # G列
+
+
+def test_diff_grid_skips_none_and_offsets_columns():
+    old = [[1, 2, 3], ["x", "y", "z"]]
+    new = [[1, 5, None], [None, None, None]]
+    assert diff_grid(old, new, 3, first_row=4, first_col=START_COL) == [{"range": "H4:H4", "values": [[5]]}]
+
+
+def inventory(values):
+    """製品行 + 入庫行（None）の交互"""
+    grid = []
+    for row in values:
+        grid.append(list(row))
+        grid.append([None] * len(row))
+    return grid
+
+
+def make_sheet():
+    sh = FakeSpreadsheet()
+    ws = sh.add_worksheet("2026/01", rows=100, cols=10)
+    return sh, ws
+
+
+def test_rewrite_sends_only_changed_cells():
+    sh, ws = make_sheet()
+    scheduler = RequestScheduler(6000, 6000)
+    lines = []
+    assert sync_inventory(ws, inventory([[10, 9, 8], [5, 4, 3]]), START_COL, scheduler=scheduler, log=lines.append) == 6
+    ws.cells[(5, START_COL)] = "入庫"  # 入庫行は書き換えない
+    writes = sh.calls["write"]
+
+    assert sync_inventory(ws, inventory([[10, 9, 8], [5, 4, 3]]), START_COL, scheduler=scheduler, log=lines.append) == 0
+    assert sh.calls["write"] == writes
+    assert sync_inventory(ws, inventory([[10, 9, 7], [5, 4, 3]]), START_COL, scheduler=scheduler, log=lines.append) == 1
+    assert ws.cells[(4, START_COL + 2)] == 7
+    assert ws.cells[(5, START_COL)] == "入庫"
+    assert lines[-1] == "    ✓ '2026/01': 在庫推移 2行 × 3日 / 変更 1セル"
+
+
+def test_days_before_start_are_kept():
+    _, ws = make_sheet()
+    ws.cells[(4, START_COL)] = 99
+    sync_inventory(ws, inventory([[None, 9, 8]]), START_COL, log=lambda line: None)
+    assert [ws.cells.get((4, START_COL + j)) for j in range(3)] == [99, 9, 8]
+
+
+def test_removed_products_are_cleared():
+    _, ws = make_sheet()
+    sync_inventory(ws, inventory([[1, 2], [3, 4]]), START_COL, log=lambda line: None)
+    ws.cells[(7, START_COL)] = "入庫"
+    sync_inventory(ws, inventory([[1, 2]]), START_COL, log=lambda line: None)
+    assert [ws.cells.get((6, START_COL + j)) for j in range(2)] == ["", ""]
+    assert ws.cells[(7, START_COL)] == "入庫"
+
+
+def test_snapshot_is_staged_until_commit(tmp_path):
+    _, ws = make_sheet()
+    snapshot = SheetSnapshot(str(tmp_path), "key")
+    grid = inventory([[1, 2]])
+    sync_inventory(ws, grid, START_COL, snapshot=snapshot, use_snapshot=True, log=lambda line: None)
+    assert snapshot.load("2026/01#inventory", ws.id) is None
+    snapshot.commit()
+    assert snapshot.load("2026/01#inventory", ws.id) == grid
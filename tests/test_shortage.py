@@ -0,0 +1,60 @@
+"""shortage: 最終仕込日を今日と比べて手配遅れを決め、期間が今日を含まなければ空の一覧を返すこと"""
+import numpy as np
+import pandas as pd
+
+from dp_scheduler.shortage import SHORTAGE_COLUMNS, STATUS_LATE, STATUS_TODO, detect_shortages, format_shortages
+from dp_scheduler.workcalendar import WorkCalendar
+
+CALENDAR = WorkCalendar(pd.bdate_range("2026-10-01", "2026-11-30"))
+TODAY = pd.Timestamp("2026-10-14", tz="Asia/Tokyo")
+DAYS = pd.bdate_range("2026-10-14", "2026-10-30")
+CODES = ["100000", "100001", "100002"]
+
+
+def projection():
+    """100000: 余裕あり / 100001: 10/29 に安全在庫割れ / 100002: 10/16 に安全在庫割れ・10/23 に欠品"""
+    projected = np.empty((3, len(DAYS)))
+    projected[0] = 500.0
+    projected[1] = 100.0 - 5.0 * np.arange(len(DAYS))
+    projected[2] = 30.0 - 5.0 * np.arange(len(DAYS))
+    return projected
+
+
+def detect(days=DAYS, projected=None, today=TODAY, lines=None):
+    projected = projection() if projected is None else projected
+    return detect_shortages(projected, days, safety=np.array([50.0, 50.0, 25.0]), lead_time=np.array([3, 3, 3]),
+                            calendar=CALENDAR, today=today, codes=CODES, names=["A", "B", "C"],
+                            log=(lines if lines is not None else []).append)
+
+
+def test_status_by_lead_time_from_today():
+    df = detect()
+    assert df["品番"].tolist() == ["100002", "100001"]  # 欠品の早い順
+    late, todo = df.iloc[0], df.iloc[1]
+    assert late["安全在庫割れ日"] == pd.Timestamp("2026-10-16")
+    assert late["欠品日"] == pd.Timestamp("2026-10-23")
+    assert late["最終仕込日"] == pd.Timestamp("2026-10-13")  # 今日より前
+    assert late["状態"] == STATUS_LATE
+    assert todo["最終仕込日"] == pd.Timestamp("2026-10-26")
+    assert todo["状態"] == STATUS_TODO
+    assert pd.isna(todo["欠品日"])
+
+
+def test_late_compares_with_today_not_horizon_start():
+    # 期間の先頭（10/16）より後でも、今日（10/20）より前の最終仕込日は手配遅れ
+    days = pd.bdate_range("2026-10-16", "2026-10-30")
+    projected = np.vstack([np.full(len(days), 500.0), 100.0 - 5.0 * np.arange(len(days)),
+                           np.full(len(days), 500.0)])
+    projected[1, 4:] = 40.0  # 10/22 に安全在庫割れ → 最終仕込日 10/19
+    df = detect(days, projected, today=pd.Timestamp("2026-10-20"))
+    assert df["最終仕込日"].tolist() == [pd.Timestamp("2026-10-19")]
+    assert df["状態"].tolist() == [STATUS_LATE]
+
+
+def test_empty_or_stale_horizon_returns_empty_list():
+    for days, projected in [(pd.DatetimeIndex([]), np.empty((3, 0))), (DAYS, projection())]:
+        lines = []
+        df = detect(days, projected, today=pd.Timestamp("2026-11-10"), lines=lines)
+        assert df.empty and list(df.columns) == SHORTAGE_COLUMNS
+        assert lines and "欠品予測をスキップ" in lines[0]
+        assert format_shortages(df).empty
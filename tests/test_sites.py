@@ -0,0 +1,83 @@
+"""sites: 拠点別の集計を合算した値が全拠点の行をまとめて集計した値と同じになり、拠点ファイルをマニフェストで解決すること"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dp_scheduler import datasource
+from dp_scheduler.basestats import finalize_moments, stream_base_stats
+from dp_scheduler.datasource import LocalDataSource
+from dp_scheduler.sites import ALL_SITES, MAIN_SITE, combine_sites, discover_sites, run_site_jobs, site_stats_table
+
+START = pd.Timestamp("2025-10-01")
+SITES = {
+    MAIN_SITE: [("2025/10/01", "100000", 5), ("2025/10/02", "100000", 9), ("2025/10/02", "100001", 4),
+                ("2025/09/30", "100001", 99)],
+    "k": [("2025/10/03", "100000", 20), ("2025/10/03", "100002", 1), ("2025/10/04", "100002", "")],
+    "m": [("2025/10/05", "100001", 6), ("2025/10/06", "100001", 8), ("2025/10/06", "100000", 1e6 + 3)],
+}
+
+
+def base_content(rows) -> bytes:
+    lines = ["日付," + ",".join(f"c{i}" for i in range(1, 20))]
+    lines += [",".join([day, code] + [""] * 16 + [str(usage)]) for day, code, usage in rows]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def jobs():
+    return [(site, base_content(rows), {"name": f"base_file_{site}.csv"}, START, None) for site, rows in SITES.items()]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_combined_sites_match_one_file(workers):
+    site_frames = run_site_jobs(jobs(), max_workers=workers)
+    assert list(site_frames) == list(SITES)
+    combined = finalize_moments(combine_sites(site_frames)).set_index("品番").sort_index()
+    whole = stream_base_stats(base_content([row for rows in SITES.values() for row in rows]), START)
+    whole = whole.set_index("品番").sort_index()
+    assert combined.index.tolist() == whole.index.tolist()
+    np.testing.assert_allclose(combined.to_numpy(dtype=float), whole.to_numpy(dtype=float), rtol=1e-9)
+
+
+def test_site_stats_table_ends_with_all_sites():
+    table = site_stats_table(run_site_jobs(jobs(), max_workers=1))
+    assert table["拠点"].drop_duplicates().tolist() == [MAIN_SITE, "k", "m", ALL_SITES]
+    total = table[table["拠点"] == ALL_SITES].set_index("品番")["件数"]
+    assert total.to_dict() == {"100000": 4, "100001": 3, "100002": 1}
+
+
+def test_discover_sites_picks_newest_per_site():
+    files = [{"name": "base_file_k.csv", "id": "k1", "modifiedTime": "2025-10-01T00:00:00Z"},
+             {"name": "base_file_k.csv", "id": "k2", "modifiedTime": "2025-10-02T00:00:00Z"},
+             {"name": "base_file.csv", "id": "b"}, {"name": "base_file_old.xlsx", "id": "x"}]
+    assert {site: info["id"] for site, info in discover_sites(files).items()} == {MAIN_SITE: "b", "k": "k2"}
+    assert list(discover_sites(files)) == [MAIN_SITE, "k"]
+
+
+def test_site_files_are_tracked_in_manifest(tmp_path, monkeypatch):
+    root, manifest = tmp_path / "Master", str(tmp_path / "manifest.json")
+    (root / "base").mkdir(parents=True)
+    for site, rows in SITES.items():
+        name = "base_file.csv" if site == MAIN_SITE else f"base_file_{site}.csv"
+        (root / "base" / name).write_bytes(base_content(rows))
+    (root / "product.csv").write_text("品番\n100000\n", encoding="utf-8")
+    hashed = []
+    monkeypatch.setattr(datasource, "file_md5", lambda path: hashed.append(os.path.basename(path)) or path)
+
+    found = LocalDataSource(str(root), manifest).find_all(["base_file"])
+    assert sorted(discover_sites(found)) == sorted(SITES) and all(f["changed"] for f in found)
+    assert len(hashed) == 3
+
+    # 変わっていないファイルは前回の md5Checksum を使い、resolve() の記録で消えない
+    hashed.clear()
+    source = LocalDataSource(str(root), manifest)
+    source.resolve({"product": ["product"]})
+    found = source.find_all(["base_file"])
+    assert hashed == ["product.csv"]
+    assert not any(f["changed"] for f in found) and all(f["md5Checksum"] for f in found)
+
+    (root / "base" / "base_file_k.csv").write_bytes(base_content(SITES["k"] * 2))
+    found = {f["name"]: f for f in LocalDataSource(str(root), manifest).find_all(["base_file"])}
+    assert hashed == ["product.csv", "base_file_k.csv"]
+    assert [name for name, f in found.items() if f["changed"]] == ["base_file_k.csv"]
@@ -0,0 +1,79 @@
+"""UsageStore: 品番×日の累積和から求めた期間の統計が、期間内の行の mean / std と同じになること（月の境目・追記を含む）"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from dp_scheduler.usagestore import UsageStore
+
+ROWS = [
+    ("2025/09/29", "100000", 5), ("2025/09/30", "100000", 7), ("2025/09/30", "100001", 2),
+    ("2025/10/01", "100000", 9), ("2025/10/01", "100001", 4), ("2025/10/04", "100000", 30),  # 土曜
+    ("2025/10/15", "100002", ""), ("2025/10/31", "100000", 11), ("2025/10/31", "100001", 6),
+    ("2025/11/01", "100001", 8), ("2025/11/03", "100002", 3), ("2025/11/03", "100000", 1),
+]
+MORE = [("2025/11/04", "100000", 13), ("2025/11/05", "100003", 2), ("2025/11/05", "100001", 10)]
+
+
+def base_content(rows) -> bytes:
+    lines = ["日付," + ",".join(f"c{i}" for i in range(1, 20))]
+    lines += [",".join([day, code] + [""] * 16 + [str(usage)]) for day, code, usage in rows]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def expected_stats(rows, start, end, weekdays_only=False) -> pd.DataFrame:
+    """期間内（日単位で start 以上・end 以下）の行を品番ごとに mean / std（欠損は 0）"""
+    df = pd.DataFrame(rows, columns=["日付", "品番", "使用量"])
+    day = pd.to_datetime(df["日付"])
+    df["使用量"] = pd.to_numeric(df["使用量"], errors="coerce")
+    keep = pd.Series(True, index=df.index)
+    if start is not None:
+        keep &= day >= pd.Timestamp(start)
+    if end is not None:
+        keep &= day <= pd.Timestamp(end)
+    if weekdays_only:
+        keep &= day.dt.dayofweek < 5
+    g = df[keep].groupby("品番")["使用量"]
+    return pd.DataFrame({"移動平均": g.mean(), "使用量標準偏差": g.std().fillna(0)})
+
+
+def assert_window(store, rows, start, end, weekdays_only=False):
+    result = store.window_stats(start, end, weekdays_only).set_index("品番").sort_index()
+    expected = expected_stats(rows, start, end, weekdays_only)
+    assert result.index.tolist() == expected.index.tolist()
+    np.testing.assert_allclose(result.to_numpy(dtype=float), expected.to_numpy(dtype=float), rtol=1e-9, equal_nan=True)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = UsageStore(str(tmp_path))
+    store.update(base_content(ROWS), {"id": "base", "md5Checksum": "v1"})
+    return store
+
+
+@pytest.mark.parametrize("start, end", [
+    ("2025-10-01", "2025-10-31"),  # 月初・月末の日を含む
+    ("2025-09-30", "2025-10-01"),  # 月をまたぐ2日
+    ("2025-10-31", "2025-11-01"),
+    ("2025-11-01", None),
+    (None, "2025-09-30"),
+    ("2025-10-02", "2025-10-14"),  # 行の無い品番は出さない
+    (None, None),
+])
+def test_window_matches_rows_in_window(store, start, end):
+    assert_window(store, ROWS, start, end)
+
+
+def test_weekdays_only(store):
+    assert_window(store, ROWS, "2025-10-01", "2025-10-31", weekdays_only=True)
+
+
+def test_append_only_reads_new_rows(tmp_path, store):
+    assert store.is_current({"id": "base", "md5Checksum": "v1"})
+    assert store.update(base_content(ROWS + MORE), {"id": "base", "md5Checksum": "v2"}) == len(MORE)
+    assert_window(store, ROWS + MORE, "2025-10-31", None)
+    reopened = UsageStore(store.root)
+    assert_window(reopened, ROWS + MORE, "2025-11-01", "2025-11-30")
+    # 途中の行が変わったら作り直す
+    changed = [("2025/09/29", "100000", 50)] + ROWS[1:] + MORE
+    assert reopened.update(base_content(changed), {"id": "base", "md5Checksum": "v3"}) == len(changed)
+    assert_window(reopened, changed, None, "2025-09-30")
@@ -0,0 +1,48 @@
+"""WorkCalendar: workday.csv（年なしの MM/dd）の年を先頭の月と今日から決め、年をまたいでも続けること"""
+import pandas as pd
+import pytest
+
+from dp_scheduler import workcalendar
+from dp_scheduler.workcalendar import WorkCalendar
+
+
+def workday_frame(start: str, end: str) -> pd.DataFrame:
+    """calendar.gs が出力する形式（MM/dd を1行に並べる・土日は休み）"""
+    days = pd.bdate_range(start, end)
+    return pd.DataFrame([days.strftime("%m/%d")])
+
+
+@pytest.fixture(autouse=True)
+def no_fixed_year(monkeypatch):
+    monkeypatch.setattr(workcalendar, "CALENDAR_START_YEAR", None)
+
+
+@pytest.mark.parametrize("today, year", [
+    ("2026-10-17", 2026),  # 出力した月の途中
+    ("2027-01-10", 2026),  # 年が明けても先頭の 10月 は前年
+    ("2026-09-25", 2026),  # 出力した月の直前
+])
+def test_year_follows_today_across_year_boundary(today, year):
+    calendar = WorkCalendar.from_first_row(workday_frame(f"{year}-10-01", f"{year + 1}-01-29"),
+                                           today=pd.Timestamp(today, tz="Asia/Tokyo"))
+    assert calendar.index[0] == pd.Timestamp(f"{year}-10-01")
+    assert calendar.index[-1] == pd.Timestamp(f"{year + 1}-01-29")
+    assert calendar.month_workdays(year + 1, 1) == len(pd.bdate_range(f"{year + 1}-01-01", f"{year + 1}-01-29"))
+    # 12/31 → 1/1 をまたいで稼働日でずらせる
+    assert calendar.offset(pd.Timestamp(f"{year + 1}-01-01"), -1)[0] == pd.Timestamp(f"{year}-12-31")
+
+
+def test_covers_today():
+    calendar = WorkCalendar.from_first_row(workday_frame("2026-10-01", "2027-01-29"), today=pd.Timestamp("2026-10-17"))
+    assert calendar.covers(pd.Timestamp("2026-10-17 09:30", tz="Asia/Tokyo"))
+    assert calendar.covers(pd.Timestamp("2026-10-18"))  # 日曜（稼働日でなくても期間内）
+    assert not calendar.covers(pd.Timestamp("2027-02-01"))
+    assert not calendar.covers(pd.Timestamp("2026-09-30"))
+
+
+def test_fixed_start_year(monkeypatch):
+    monkeypatch.setattr(workcalendar, "CALENDAR_START_YEAR", 2025)
+    calendar = WorkCalendar.from_first_row(workday_frame("2025-10-01", "2026-01-29"), today=pd.Timestamp("2026-10-17"))
+    assert calendar.index[0] == pd.Timestamp("2025-10-01")
+    assert not calendar.covers(pd.Timestamp("2026-10-17"))
+    assert WorkCalendar.from_first_row(workday_frame("2025-10-01", "2025-10-31"), start_year=2030).index[0].year == 2030